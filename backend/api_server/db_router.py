@@ -0,0 +1,80 @@
+import itertools
+import random
+import threading
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# ##############################################################################################
+#                                   Réplicas de lectura
+# ##############################################################################################
+# Las escrituras van siempre a la base de datos principal ("default") y las lecturas a una de
+# las réplicas (DB_REPLICAS en settings), elegida al azar o por turnos.
+# 1º En cuanto una petición escribe, el resto de sus lecturas van también a la principal
+#    (la réplica puede ir con retraso y no vería lo que se acaba de escribir).
+# 2º Las peticiones POST/PUT/PATCH/DELETE leen de la principal desde el principio.
+# 3º Dentro de una transacción siempre se usa la principal.
+# Sin réplicas configuradas, todo va a "default" como hasta ahora.
+
+PRIMARIA = DEFAULT_DB_ALIAS
+
+# ¿Tiene que leer de la principal lo que queda de esta petición? Es una ContextVar para que cada
+# petición (hilo o tarea de asyncio) tenga su propio valor.
+_usar_primaria = ContextVar("usar_primaria", default=False)
+
+
+def fijar_primaria():
+    _usar_primaria.set(True)
+
+def primaria_fijada():
+    return _usar_primaria.get()
+
+
+class RouterReplicas:
+
+    def __init__(self, replicas=None, seleccion=None):
+        self.replicas = list(settings.DB_REPLICAS_ALIAS if replicas is None else replicas)
+        self.seleccion = seleccion or settings.DB_REPLICAS_SELECCION # "aleatoria" o "rotatoria"
+        self._turno = itertools.cycle(self.replicas)
+        self._lock = threading.Lock()
+
+    def elegir_replica(self):
+        if self.seleccion == "rotatoria":
+            with self._lock:
+                return next(self._turno)
+        return random.choice(self.replicas)
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or primaria_fijada() or connections[PRIMARIA].in_atomic_block:
+            return PRIMARIA
+        return self.elegir_replica()
+
+    def db_for_write(self, model, **hints):
+        fijar_primaria()
+        return PRIMARIA
+
+    # Las réplicas tienen los mismos datos que la principal.
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {PRIMARIA, *self.replicas}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    # Las migraciones solo se aplican en la principal; las réplicas se copian de ella.
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARIA
+
+
+class PrimariaFijaMiddleware:
+    METODOS_LECTURA = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    # Cada petición empieza de cero: leyendo de las réplicas si es de lectura.
+    def __call__(self, request):
+        token = _usar_primaria.set(request.method not in self.METODOS_LECTURA)
+        try:
+            return self.get_response(request)
+        finally:
+            _usar_primaria.reset(token)
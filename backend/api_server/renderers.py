@@ -0,0 +1,64 @@
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+
+# orjson es opcional: sin él se usa el JSON de DRF (json de la librería estándar).
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ##############################################################################################
+#                               JSON rápido (orjson) para DRF
+# ##############################################################################################
+# Se registran en REST_FRAMEWORK (settings.py) en lugar de JSONRenderer y JSONParser.
+# La salida es la misma que la de DRF (compacta, en UTF-8, con las fechas y los Decimal
+# igual que su JSONEncoder) pero orjson serializa bastante más rápido las respuestas grandes
+# (listas de usuarios, resultados de Spotify). Ver benchmarks/bench_json.py.
+# - Si no está orjson, se pide la salida con sangría ("; indent=4") o UNICODE_JSON/COMPACT_JSON
+#   están desactivados, se usa la de DRF.
+# - Los tipos que orjson no conoce (Decimal, fechas, QuerySet, textos traducibles...) se
+#   convierten con el JSONEncoder de DRF.
+
+if orjson is not None:
+    # Las fechas las convierte DRF (milisegundos y "Z" en lugar de "+00:00").
+    # Las claves que no son texto (p. ej. enteros) se convierten a texto, como hace json.
+    OPCIONES_ORJSON = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    _codificador_drf = JSONEncoder()
+
+
+class JSONRapidoRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_codificador_drf.default, option=OPCIONES_ORJSON)
+        except orjson.JSONEncodeError:
+            # Lo que orjson no admite (p. ej. enteros de más de 64 bits) lo serializa DRF.
+            return super().render(data, accepted_media_type, renderer_context)
+        # Igual que DRF: U+2028 y U+2029 se escapan para que la respuesta sea JavaScript válido.
+        if b"\xe2\x80" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
+
+
+class JSONRapidoParser(JSONParser):
+    renderer_class = JSONRapidoRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            contenido = stream.read()
+            if encoding.lower().replace("-", "") != "utf8":
+                contenido = contenido.decode(encoding)
+            return orjson.loads(contenido)
+        except (orjson.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
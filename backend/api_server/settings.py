@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +46,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api_server.db_router.PrimariaFijaMiddleware', # Réplicas de lectura (ver db_router.py)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,13 +78,83 @@ WSGI_APPLICATION = 'api_server.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Se configura desde variables de entorno:
+# - DB_ENGINE: "sqlite" (por defecto) o "mysql".
+# - DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT: datos de conexión (DB_NAME es el fichero en SQLite).
+# - DB_CONN_MAX_AGE: segundos que se reutiliza una conexión entre peticiones (0 = una por petición).
+# - DB_CONN_HEALTH_CHECKS: comprueba que una conexión reutilizada sigue viva antes de usarla.
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite").lower()
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "true").lower() in ("1", "true", "si", "sí")
+
+# PRAGMAs de SQLite para un único servidor (vacío para dejar el valor por defecto de SQLite):
+# - WAL: las lecturas no esperan a las escrituras.
+# - synchronous=NORMAL: con WAL es seguro y evita un fsync en cada commit.
+# - busy_timeout: milisegundos que se espera a un bloqueo antes de dar "database is locked".
+# - mmap_size: bytes del fichero que se leen a través de memoria mapeada.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    'synchronous': os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    'busy_timeout': os.getenv("SQLITE_BUSY_TIMEOUT", "5000"),
+    'mmap_size': os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
 }
 
+if DB_ENGINE == "mysql":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.getenv("DB_NAME", "api_spotify"),
+            'USER': os.getenv("DB_USER", "root"),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': os.getenv("DB_HOST", "127.0.0.1"),
+            'PORT': os.getenv("DB_PORT", "3306"),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            'OPTIONS': {
+                'charset': 'utf8mb4',
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            },
+        }
+    }
+elif DB_ENGINE == "sqlite":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("DB_NAME") or BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            'OPTIONS': {
+                'init_command': ";".join(f"PRAGMA {pragma}={valor}" for pragma, valor in SQLITE_PRAGMAS.items() if valor),
+                # Las transacciones piden el bloqueo de escritura al empezar, así busy_timeout se respeta
+                # en lugar de fallar al pasar de lectura a escritura.
+                'transaction_mode': os.getenv("SQLITE_TRANSACTION_MODE", "IMMEDIATE") or None,
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"DB_ENGINE debe ser 'sqlite' o 'mysql', no '{DB_ENGINE}'")
+
+# Réplicas de lectura (api_server/db_router.py):
+# - DB_REPLICAS: lista separada por comas de ficheros SQLite (con DB_ENGINE=sqlite) o de hosts
+#   de MySQL. Cada una se configura igual que "default" con el alias "replica_1", "replica_2"...
+# - DB_REPLICAS_SELECCION: "aleatoria" (por defecto) o "rotatoria" (por turnos).
+DB_REPLICAS = [replica.strip() for replica in os.getenv("DB_REPLICAS", "").split(",") if replica.strip()]
+DB_REPLICAS_SELECCION = os.getenv("DB_REPLICAS_SELECCION", "aleatoria").lower()
+if DB_REPLICAS_SELECCION not in ("aleatoria", "rotatoria"):
+    raise ImproperlyConfigured(f"DB_REPLICAS_SELECCION debe ser 'aleatoria' o 'rotatoria', no '{DB_REPLICAS_SELECCION}'")
+
+DB_REPLICAS_ALIAS = []
+for numero, replica in enumerate(DB_REPLICAS, start=1):
+    alias = f"replica_{numero}"
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        ('HOST' if DB_ENGINE == "mysql" else 'NAME'): replica,
+        'TEST': {'MIRROR': 'default'}, # En los tests, las réplicas son la base de datos de test.
+    }
+    DB_REPLICAS_ALIAS.append(alias)
+
+DATABASE_ROUTERS = ['api_server.db_router.RouterReplicas']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -117,3 +191,66 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# DRF: JSON con orjson si está instalado (api_server/renderers.py); si no, el de DRF.
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api_server.renderers.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api_server.renderers.JSONRapidoParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Usuarios que se insertan en cada INSERT al crear usuarios en bloque (POST /viewset/users/)
+USUARIOS_BULK_BATCH_SIZE = int(os.getenv("USUARIOS_BULK_BATCH_SIZE", "500"))
+
+# Paginación de GET /viewset/users/ (usuarios por página por defecto y máximo con ?page_size=)
+USUARIOS_PAGE_SIZE = int(os.getenv("USUARIOS_PAGE_SIZE", "100"))
+USUARIOS_PAGE_SIZE_MAX = int(os.getenv("USUARIOS_PAGE_SIZE_MAX", "1000"))
+
+# Usuarios que se leen de la base de datos cada vez al exportar (exportar_usuarios y /users/exportar/)
+EXPORTACION_CHUNK_SIZE = int(os.getenv("EXPORTACION_CHUNK_SIZE", "2000"))
+
+# Caché de las listas de favoritos (viewset_users/favoritos_cache.py). En memoria de cada proceso
+# por defecto; con FAVORITOS_CACHE_DIR se guarda en disco y la comparten todos los workers.
+FAVORITOS_CACHE_TTL = int(os.getenv("FAVORITOS_CACHE_TTL", "300"))
+FAVORITOS_CACHE_DIR = os.getenv("FAVORITOS_CACHE_DIR", "")
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'favoritos': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache' if FAVORITOS_CACHE_DIR
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': FAVORITOS_CACHE_DIR or 'favoritos',
+        'TIMEOUT': FAVORITOS_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("FAVORITOS_CACHE_MAX_ENTRADAS", "10000"))},
+    },
+}
+
+# Avisos del cliente de Spotify (paquete "spotify": reintentos, circuit breaker, token, caché)
+# por la consola, con logging en lugar de print.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'spotify': {
+            'handlers': ['console'],
+            'level': os.getenv("SPOTIFY_LOG_LEVEL", "WARNING"),
+        },
+    },
+}
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+# -------------------------------------------------------------------------------------
+#                                      OBJETIVOS
+#                                     -----------
+# Medir cuántas peticiones por segundo atiende la API con la configuración de base de
+# datos de antes (una conexión nueva por petición, SQLite por defecto) y con la de ahora
+# (conexiones persistentes + PRAGMAs de SQLite).
+# 1º Cada escenario se ejecuta en un proceso aparte, porque settings.py se lee al arrancar.
+# 2º Cada proceso crea su propia base de datos SQLite temporal, la llena y lanza las
+#    peticiones directamente contra la aplicación WSGI (sin servidor HTTP por medio), de modo
+#    que al terminar cada petición se ejecuta la misma limpieza de conexiones que en producción.
+#
+# python benchmarks/bench_conexiones.py --peticiones 3000 --usuarios 1000
+# -------------------------------------------------------------------------------------
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+ESCENARIOS = {
+    "antes": {
+        "DB_CONN_MAX_AGE": "0",
+        "DB_CONN_HEALTH_CHECKS": "false",
+        "SQLITE_JOURNAL_MODE": "",
+        "SQLITE_SYNCHRONOUS": "",
+        "SQLITE_BUSY_TIMEOUT": "",
+        "SQLITE_MMAP_SIZE": "",
+        "SQLITE_TRANSACTION_MODE": "",
+    },
+    "despues": {
+        "DB_CONN_MAX_AGE": "60",
+        "DB_CONN_HEALTH_CHECKS": "true",
+    },
+}
+
+
+# Se ejecuta dentro del proceso de cada escenario.
+def medir(peticiones, usuarios):
+    sys.path.insert(0, str(BACKEND))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api_server.settings")
+    import django
+    django.setup()
+
+    from wsgiref.util import setup_testing_defaults
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.management import call_command
+    from viewset_users.operaciones import crear_usuarios_con_favoritos
+
+    call_command("migrate", verbosity=0)
+    ids = crear_usuarios_con_favoritos([
+        {"nombre": f"Usuario {i}", "cantantes_favoritos": [f"Cantante {i % 50}"], "canciones_favoritas": [f"Canción {i % 80}"]}
+        for i in range(usuarios)
+    ])
+
+    aplicacion = WSGIHandler()
+    rutas = ["/viewset/users/?page_size=20", "/viewset/users/favoritos/?ids=" + ",".join(map(str, ids[:20]))]
+
+    def peticion(ruta):
+        ruta, _, query = ruta.partition("?")
+        environ = {"PATH_INFO": ruta, "QUERY_STRING": query, "SERVER_NAME": "localhost"}
+        setup_testing_defaults(environ)
+        respuesta = aplicacion(environ, lambda status, headers: None)
+        b"".join(respuesta)
+        respuesta.close() # Aquí Django cierra (o conserva) la conexión, como al acabar una petición real.
+
+    for ruta in rutas:
+        peticion(ruta) # Calentamiento
+    inicio = time.perf_counter()
+    for i in range(peticiones):
+        peticion(rutas[i % len(rutas)])
+    segundos = time.perf_counter() - inicio
+    print(json.dumps({"peticiones_por_segundo": peticiones / segundos, "ms_por_peticion": 1000 * segundos / peticiones}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peticiones por segundo antes y después de las conexiones persistentes.")
+    parser.add_argument("--peticiones", type=int, default=2000)
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--escenario", choices=ESCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.escenario:
+        medir(args.peticiones, args.usuarios)
+        return
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        for nombre, variables in ESCENARIOS.items():
+            entorno = {**os.environ, **variables, "DB_ENGINE": "sqlite", "DB_NAME": os.path.join(directorio, f"{nombre}.sqlite3")}
+            salida = subprocess.run(
+                [sys.executable, __file__, "--escenario", nombre, "--peticiones", str(args.peticiones), "--usuarios", str(args.usuarios)],
+                env=entorno, check=True, capture_output=True, text=True,
+            )
+            resultados[nombre] = json.loads(salida.stdout.strip().splitlines()[-1])
+
+    for nombre, resultado in resultados.items():
+        print(f"{nombre:>8}: {resultado['peticiones_por_segundo']:8.0f} peticiones/s  ({resultado['ms_por_peticion']:.2f} ms/petición)")
+    mejora = resultados["despues"]["peticiones_por_segundo"] / resultados["antes"]["peticiones_por_segundo"]
+    print(f"  mejora: x{mejora:.2f}")
+
+
+if __name__ == "__main__":
+    main()
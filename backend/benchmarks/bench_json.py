@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import timeit
+from pathlib import Path
+# -------------------------------------------------------------------------------------
+#                                      OBJETIVOS
+#                                     -----------
+# Comparar el JSONRenderer de DRF (json de la librería estándar) con JSONRapidoRenderer
+# (orjson) en las respuestas de "list" (/users/) y de "artistas_spotify".
+# Las respuestas se construyen con la misma forma que las de la API; no hace falta base de datos.
+#
+# python benchmarks/bench_json.py --usuarios 10000 --artistas 200
+# -------------------------------------------------------------------------------------
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def respuesta_list(usuarios):
+    return {
+        "users": [{"id": i, "nombre": f"Usuario {i}"} for i in range(usuarios)],
+        "next": "WyJVc3VhcmlvIDk5IiwgOTld",
+    }
+
+def respuesta_artistas_spotify(artistas):
+    return {
+        "cantantes_favoritos": [f"Cantante {i}" for i in range(artistas)],
+        "resultado_spotify": [
+            {
+                "gusto_original": f"Cantante {i}",
+                "nombre": f"Cantante {i}",
+                "id": f"4dpARuHxo51G3z768sgnr{i:03d}",
+                "popularidad": i % 100,
+                "seguidores": 1000 * i,
+                "generos": ["pop", "dance pop", "latin pop", "spanish pop"],
+                "spotify_url": f"https://open.spotify.com/artist/4dpARuHxo51G3z768sgnr{i:03d}",
+            }
+            for i in range(artistas)
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONRenderer de DRF frente a JSONRapidoRenderer.")
+    parser.add_argument("--usuarios", type=int, default=10000, help="Usuarios en la respuesta de list.")
+    parser.add_argument("--artistas", type=int, default=200, help="Artistas en la respuesta de artistas_spotify.")
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api_server.settings")
+    import django
+    django.setup()
+    from rest_framework.renderers import JSONRenderer
+    from api_server.renderers import JSONRapidoRenderer, orjson
+
+    if orjson is None:
+        print("orjson no está instalado: JSONRapidoRenderer usa el JSON de DRF.")
+
+    respuestas = {
+        f"list ({args.usuarios} usuarios)": respuesta_list(args.usuarios),
+        f"artistas_spotify ({args.artistas} artistas)": respuesta_artistas_spotify(args.artistas),
+    }
+    for nombre, datos in respuestas.items():
+        assert JSONRenderer().render(datos) == JSONRapidoRenderer().render(datos) # Misma salida.
+        tiempos = {}
+        for renderer in (JSONRenderer(), JSONRapidoRenderer()):
+            segundos = min(timeit.repeat(lambda: renderer.render(datos), number=args.repeticiones, repeat=3))
+            tiempos[type(renderer).__name__] = 1000 * segundos / args.repeticiones
+        print(nombre)
+        for clase, ms in tiempos.items():
+            print(f"  {clase:>20}: {ms:8.3f} ms/respuesta")
+        print(f"  {'mejora':>20}: x{tiempos['JSONRenderer'] / tiempos['JSONRapidoRenderer']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
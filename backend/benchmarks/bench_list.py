@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+# -------------------------------------------------------------------------------------
+#                                      OBJETIVOS
+#                                     -----------
+# Medir cuánto cuesta por fila la lista de usuarios de GET /users/:
+# - antes: un Usuario por fila + UsuarioSerializer(many=True) campo a campo.
+# - ahora: tuplas de values_list("id", "nombre") + usuarios_a_json (sin modelos ni serializer).
+# Se usa una base de datos SQLite temporal con los usuarios que se indiquen.
+#
+# python benchmarks/bench_list.py --filas 10000 100000
+# -------------------------------------------------------------------------------------
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def mejor_tiempo(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coste por fila de la lista de usuarios, antes y ahora.")
+    parser.add_argument("--filas", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        os.environ["DB_NAME"] = os.path.join(directorio, "bench_list.sqlite3")
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api_server.settings")
+        sys.path.insert(0, str(BACKEND))
+        import django
+        django.setup()
+        from django.core.management import call_command
+        from viewset_users.models import Usuario
+        from viewset_users.operaciones import crear_usuarios
+        from viewset_users.serializer import UsuarioSerializer, usuarios_a_json
+
+        call_command("migrate", verbosity=0)
+        creados = 0
+        for filas in sorted(args.filas):
+            crear_usuarios([f"Usuario {i}" for i in range(creados, filas)])
+            creados = filas
+            usuarios = Usuario.objects.order_by("nombre", "id")
+
+            # ".all()": cada vez una consulta nueva (sin la caché del QuerySet).
+            antes = lambda: UsuarioSerializer(list(usuarios.all()), many=True).data
+            ahora = lambda: usuarios_a_json(usuarios.values_list("id", "nombre"))
+            assert list(antes()) == ahora() # Misma salida.
+
+            t_antes = mejor_tiempo(antes, args.repeticiones)
+            t_ahora = mejor_tiempo(ahora, args.repeticiones)
+            print(f"{filas} filas")
+            print(f"   antes: {1e6 * t_antes / filas:6.2f} µs/fila ({1000 * t_antes:8.1f} ms)")
+            print(f"   ahora: {1e6 * t_ahora / filas:6.2f} µs/fila ({1000 * t_ahora:8.1f} ms)")
+            print(f"  mejora: x{t_antes / t_ahora:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+# -------------------------------------------------------------------------------------
+#                                      OBJETIVOS
+#                                     -----------
+# Agrupar búsquedas iguales que se hacen a la vez ("single-flight").
+# Cuando un artista popular está en los favoritos de muchos usuarios, justo después de que
+# caduque su entrada en la caché todas las peticiones lo buscarían en Spotify a la vez.
+# 1º La primera que llega para una clave ("artist:adele") hace la llamada a Spotify.
+# 2º Las que llegan mientras tanto con la misma clave esperan y reciben su resultado.
+# 3º Si la llamada falla, las que esperaban reciben None (igual que una búsqueda fallida).
+# Hay una versión para hilos (cliente síncrono) y otra para asyncio (cliente asíncrono).
+# -------------------------------------------------------------------------------------
+
+
+class AgrupadorPeticiones:
+
+     def __init__(self):
+          self._en_vuelo = {} # clave -> Future con el resultado de la llamada en curso
+          self._lock = threading.Lock()
+          self.agrupadas = 0 # Peticiones que se han ahorrado esperando a otra.
+
+     # Ejecuta "funcion()" solo si no hay ya una llamada en curso para "clave".
+     def ejecutar(self, clave, funcion):
+          with self._lock:
+               futuro = self._en_vuelo.get(clave)
+               esperar = futuro is not None
+               if esperar:
+                    self.agrupadas += 1
+               else:
+                    futuro = Future() # Este hilo es el que hace la llamada.
+                    self._en_vuelo[clave] = futuro
+          if esperar:
+               return futuro.result()
+
+          resultado = None
+          try:
+               resultado = funcion()
+               return resultado
+          finally:
+               with self._lock:
+                    del self._en_vuelo[clave]
+               futuro.set_result(resultado)
+
+
+class AgrupadorPeticionesAsync:
+
+     # Solo se usa desde un event loop (un cliente asíncrono por loop), así que no necesita lock.
+     def __init__(self):
+          self._en_vuelo = {} # clave -> asyncio.Future con el resultado de la llamada en curso
+          self.agrupadas = 0
+
+     # Igual que AgrupadorPeticiones.ejecutar, pero "funcion()" devuelve una corrutina.
+     async def ejecutar(self, clave, funcion):
+          futuro = self._en_vuelo.get(clave)
+          if futuro is not None:
+               self.agrupadas += 1
+               # "shield": si se cancela esta petición, no se cancela la de las demás.
+               return await asyncio.shield(futuro)
+
+          futuro = asyncio.get_running_loop().create_future()
+          self._en_vuelo[clave] = futuro
+          resultado = None
+          try:
+               resultado = await funcion()
+               return resultado
+          finally:
+               del self._en_vuelo[clave]
+               futuro.set_result(resultado)
@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import httpx
+from spotify.spotify_agrupador import AgrupadorPeticionesAsync
+from spotify.spotify_cache import cache_busquedas, clave_busqueda
+from spotify.spotify_limites import (
+     MAX_REINTENTOS,
+     circuito_spotify,
+     es_reintentable,
+     espera_para_reintentar,
+     limitador_spotify,
+)
+from spotify.spotify_request import (
+     MAX_CONCURRENCIA,
+     MAX_IDS_POR_PETICION,
+     POOL_MAXSIZE,
+     URL_ARTISTS,
+     URL_SEARCH,
+     URL_TRACKS,
+     cliente_spotify,
+     trocear,
+)
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------------------------
+#                                      OBJETIVOS
+#                                     -----------
+# Versión asíncrona (asyncio) del cliente de Spotify para las vistas async bajo ASGI.
+# 1º Obtener el token de Spotify sin bloquear el event loop (mismo GestorTokenSpotify que
+#    el cliente síncrono: el token se comparte entre hilos, corrutinas y workers).
+# 2º Buscar canciones (tracks) y cantantes (artist) con "await".
+# 3º Obtener varios cantantes/canciones a la vez por su ID (de 50 en 50).
+# 4º Lanzar muchas búsquedas a la vez con "asyncio.gather" limitadas por un semáforo.
+#
+# Mientras se espera a Spotify, el worker puede seguir atendiendo otras peticiones.
+#
+# Cada petición usa su propio cliente y lo cierra al terminar (un cliente de httpx no se
+# puede compartir entre event loops y, sin ASGI, cada petición tiene un loop nuevo):
+#     async with SpotifyAsyncClient() as spotify:
+#          jsons = await buscar_en_paralelo_async(spotify.search_artist, nombres)
+# Todas las búsquedas de la petición reutilizan las conexiones de su pool.
+# -------------------------------------------------------------------------------------
+
+class SpotifyAsyncClient:
+
+     def __init__(self, tokens=None, max_connections=POOL_MAXSIZE, timeout=10, cache=cache_busquedas,
+                  limitador=limitador_spotify, circuito=circuito_spotify, max_reintentos=MAX_REINTENTOS):
+          # Gestor del token (por defecto, el del cliente síncrono compartido).
+          self.tokens = tokens if tokens is not None else cliente_spotify.tokens
+          # Caché de búsquedas (la misma que usa el cliente síncrono).
+          self.cache = cache
+          # Limitador y circuit breaker compartidos con el cliente síncrono.
+          self.limitador = limitador
+          self.circuito = circuito
+          self.max_reintentos = max_reintentos
+          # Búsquedas iguales a la vez: solo una llega a Spotify.
+          self.agrupador = AgrupadorPeticionesAsync()
+
+          # Cliente HTTP compartido con su pool de conexiones (keep-alive).
+          self.http = httpx.AsyncClient(
+               limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+               ),
+               timeout=timeout,
+          )
+
+     async def aclose(self):
+          await self.http.aclose()
+
+     async def __aenter__(self):
+          return self
+
+     async def __aexit__(self, *exc_info):
+          await self.aclose()
+
+     # 1) Obtener un token válido.
+     #    Lo normal es que esté en memoria (lo renueva un hilo en segundo plano) y se devuelve
+     #    sin esperar. Si hay que pedirlo, se hace en un hilo para no bloquear el event loop.
+     async def get_token(self, force_refresh: bool = False, token_caducado=None):
+          self.tokens.asegurar_hilo()
+          if not force_refresh:
+               token = self.tokens.token_vigente()
+               if token:
+                    return token
+          return await asyncio.to_thread(self.tokens.get_token, force_refresh, token_caducado)
+
+     # 2) Búsqueda genérica en Spotify ("track" o "artist")
+     async def _search(self, query, tipo):
+          # Si la búsqueda ya está en caché, no se llama a Spotify.
+          clave = clave_busqueda(tipo, query)
+          json_data = await self._cache_get(clave)
+          if json_data is not None:
+               return json_data
+
+          # Si otra corrutina ya está haciendo esta misma búsqueda, se espera a su resultado.
+          return await self.agrupador.ejecutar(clave, lambda: self._buscar(clave, query, tipo))
+
+     # Búsqueda en Spotify (solo la hace una corrutina a la vez para cada clave).
+     async def _buscar(self, clave, query, tipo):
+          # Mientras se esperaba, otra corrutina puede haberla dejado en caché.
+          json_data = await self._cache_get(clave)
+          if json_data is not None:
+               return json_data
+
+          params = {
+               "q"       : query,
+               "type"    : tipo,
+               "limit"   : 1 # Devuelve solo 1 resultados de la búsqueda
+          }
+          json_data = await self._get(URL_SEARCH, params)
+          if json_data is not None:
+               await self._cache_set(clave, json_data)
+          return json_data
+
+     # Acceso a la caché sin bloquear el event loop: la memoria se consulta directamente y
+     #    lo que toca disco (SQLite, si la caché es "CacheEnCapas") se hace en otro hilo.
+     async def _cache_get(self, clave):
+          if self.cache is None:
+               return None
+          disco = getattr(self.cache, "disco", None)
+          if disco is None:
+               return self.cache.get(clave)
+          json_data = self.cache.memoria.get(clave)
+          if json_data is not None:
+               return json_data
+          return await asyncio.to_thread(self.cache.get, clave)
+
+     async def _cache_set(self, clave, json_data):
+          if self.cache is None:
+               return
+          if getattr(self.cache, "disco", None) is None:
+               self.cache.set(clave, json_data)
+          else:
+               await asyncio.to_thread(self.cache.set, clave, json_data)
+
+     # GET autenticado a la API de Spotify. Si el token ha caducado (401), se renueva una vez.
+     #    Mismo limitador, circuit breaker y reintentos que el cliente síncrono, pero las
+     #    esperas se hacen con "asyncio.sleep" para no bloquear el event loop.
+     async def _get(self, url, params):
+          token = await self.get_token()
+          if not token:
+               return None
+          header = {
+               "Authorization": f"Bearer {token}"
+          }
+          token_renovado = False
+          intento = 0
+
+          while True:
+               # Si Spotify nos está limitando, se falla al momento en lugar de insistir.
+               if not self.circuito.permitir():
+                    logger.warning("Spotify está limitando las peticiones: se omite la llamada")
+                    return None
+               espera = self.limitador.reservar()
+               if espera is None:
+                    self.circuito.liberar()
+                    logger.warning("Demasiadas peticiones a Spotify en cola: se omite la llamada")
+                    return None
+               if espera:
+                    await asyncio.sleep(espera)
+
+               try:
+                    response = await self.http.get(url, params=params, headers=header)
+               except httpx.HTTPError:
+                    logger.warning("No se ha podido conectar con Spotify")
+                    espera = espera_para_reintentar(self.circuito, intento, max_reintentos=self.max_reintentos)
+                    if espera is None:
+                         return None
+                    intento += 1
+                    await asyncio.sleep(espera)
+                    continue
+
+               # Se renueva el token (una sola vez)
+               if response.status_code == 401 and not token_renovado:
+                    self.circuito.liberar()
+                    token = await self.get_token(force_refresh=True, token_caducado=token)
+                    if not token:
+                         return None
+                    header["Authorization"] = f"Bearer {token}"
+                    token_renovado = True
+                    continue
+
+               # 429 (nos limitan) o 5xx: se espera y se reintenta.
+               if es_reintentable(response.status_code):
+                    espera = espera_para_reintentar(
+                         self.circuito, intento, response.status_code,
+                         response.headers.get("Retry-After"), max_reintentos=self.max_reintentos,
+                    )
+                    if espera is None:
+                         logger.warning("Spotify ha respondido %s: se omite la llamada", response.status_code)
+                         return None
+                    intento += 1
+                    await asyncio.sleep(espera)
+                    continue
+
+               self.circuito.registrar_exito()
+               try:
+                    # Aparece un error si el código es distinto de 200 (OK)
+                    response.raise_for_status()
+                    return response.json()
+               except (httpx.HTTPError, ValueError):
+                    logger.warning("No se ha podido conectar con Spotify")
+                    return None
+
+     # 3) Información de varios artistas/canciones a la vez por su ID (de 50 en 50).
+     async def _get_varios(self, url, clave, ids):
+          ids = list(ids)
+          trozos = trocear(ids, MAX_IDS_POR_PETICION)
+
+          async def pedir(trozo):
+               return await self._get(url, {"ids": ",".join(trozo)})
+
+          respuestas = await buscar_en_paralelo_async(pedir, trozos)
+          resultado = []
+          for trozo, json_data in zip(trozos, respuestas):
+               elementos = (json_data or {}).get(clave) or []
+               # Si la respuesta no trae un elemento por ID, se descarta el trozo entero.
+               if len(elementos) != len(trozo):
+                    elementos = [None] * len(trozo)
+               resultado.extend(elementos)
+          return resultado
+
+     async def get_artists(self, ids):
+          return await self._get_varios(URL_ARTISTS, "artists", ids)
+
+     async def get_tracks(self, ids):
+          return await self._get_varios(URL_TRACKS, "tracks", ids)
+
+     # Se encarga de buscar canciones en Spotify por el nombre de la canción
+     async def search_track_song(self, query):
+          return await self._search(query, "track")
+
+     # Se encarga de buscar cantantes en Spotify por el nombre del cantante
+     async def search_artist(self, query):
+          return await self._search(query, "artist")
+
+
+#4) Lanzar varias búsquedas a la vez (fan-out asíncrono)
+#  Ejecuta "funcion_busqueda" (corrutina) para cada consulta con, como mucho,
+#  "max_concurrencia" búsquedas en vuelo. Los resultados se devuelven en el mismo orden
+#  que las consultas y, si una búsqueda falla, su resultado es None sin afectar al resto.
+async def buscar_en_paralelo_async(funcion_busqueda, consultas, max_concurrencia=MAX_CONCURRENCIA):
+     semaforo = asyncio.Semaphore(max(1, max_concurrencia))
+
+     async def buscar(consulta):
+          async with semaforo:
+               try:
+                    return await funcion_busqueda(consulta)
+               except Exception:
+                    logger.warning("Ha fallado la búsqueda en Spotify de '%s'", consulta, exc_info=True)
+                    return None
+
+     # "gather" conserva el orden de las consultas.
+     return await asyncio.gather(*(buscar(consulta) for consulta in consultas))
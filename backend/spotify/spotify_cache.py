@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------------------------
+#                                      OBJETIVOS
+#                                     -----------
+# Caché en memoria de las búsquedas en Spotify para no repetir las mismas peticiones
+# ("Adele", "Melendi"...) en cada llamada y para cada usuario.
+# 1º Las claves son el tipo de búsqueda ("artist" / "track") + la consulta normalizada.
+# 2º Cada entrada caduca pasado un tiempo (TTL).
+# 3º Como mucho se guardan "max_entradas"; si se llena, se expulsa la menos usada (LRU).
+# 4º Se cuentan aciertos, fallos y expulsiones para poder ver si la caché sirve.
+# 5º Debajo de la caché en memoria hay una caché en disco (SQLite) que comparten todos los
+#    workers del servidor y que sobrevive a los reinicios y despliegues.
+# -------------------------------------------------------------------------------------
+
+# Configuración (se puede cambiar desde el .env)
+load_dotenv()
+CACHE_TTL = int(os.getenv("SPOTIFY_CACHE_TTL", "3600"))                  # segundos
+CACHE_MAX_ENTRADAS = int(os.getenv("SPOTIFY_CACHE_MAX_ENTRADAS", "2048"))
+# Fichero SQLite de la caché en disco. Si se deja vacío, solo se usa la caché en memoria.
+CACHE_SQLITE = os.getenv(
+     "SPOTIFY_CACHE_SQLITE",
+     str(Path(__file__).resolve().parent.parent / "spotify_cache.sqlite3"),
+)
+CACHE_SQLITE_TTL = int(os.getenv("SPOTIFY_CACHE_SQLITE_TTL", "86400"))   # segundos
+CACHE_SQLITE_PURGA = int(os.getenv("SPOTIFY_CACHE_SQLITE_PURGA", "300")) # cada cuántos segundos se borran las caducadas
+
+
+# "  ADELE " y "adele" son la misma búsqueda.
+def normalizar_consulta(query):
+     return " ".join(str(query).split()).casefold()
+
+def clave_busqueda(tipo, query):
+     return f"{tipo}:{normalizar_consulta(query)}"
+
+
+class CacheTTL:
+
+     def __init__(self, max_entradas=CACHE_MAX_ENTRADAS, ttl=CACHE_TTL, reloj=time.monotonic):
+          self.max_entradas = max_entradas
+          self.ttl = ttl
+          self._reloj = reloj
+          self._entradas = OrderedDict() # clave -> (caduca_en, valor)
+          self._lock = threading.Lock()
+          self.aciertos = 0
+          self.fallos = 0
+          self.expulsiones = 0
+          self.caducadas = 0
+
+     @property
+     def activa(self):
+          return self.max_entradas > 0 and self.ttl > 0
+
+     # Devuelve el valor guardado o None si no está (o ha caducado).
+     def get(self, clave):
+          with self._lock:
+               entrada = self._entradas.get(clave)
+               if entrada is None:
+                    self.fallos += 1
+                    return None
+               caduca_en, valor = entrada
+               if self._reloj() >= caduca_en:
+                    del self._entradas[clave]
+                    self.caducadas += 1
+                    self.fallos += 1
+                    return None
+               # Se marca como la más reciente (LRU).
+               self._entradas.move_to_end(clave)
+               self.aciertos += 1
+               return valor
+
+     def set(self, clave, valor, ttl=None):
+          if not self.activa or valor is None:
+               return
+          caduca_en = self._reloj() + (ttl if ttl is not None else self.ttl)
+          with self._lock:
+               self._entradas[clave] = (caduca_en, valor)
+               self._entradas.move_to_end(clave)
+               while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False) # Se expulsa la menos usada.
+                    self.expulsiones += 1
+
+     def delete(self, clave):
+          with self._lock:
+               self._entradas.pop(clave, None)
+
+     def clear(self):
+          with self._lock:
+               self._entradas.clear()
+
+     def estadisticas(self):
+          with self._lock:
+               consultas = self.aciertos + self.fallos
+               return {
+                    "entradas": len(self._entradas),
+                    "max_entradas": self.max_entradas,
+                    "ttl": self.ttl,
+                    "aciertos": self.aciertos,
+                    "fallos": self.fallos,
+                    "expulsiones": self.expulsiones,
+                    "caducadas": self.caducadas,
+                    "ratio_aciertos": (self.aciertos / consultas) if consultas else 0.0,
+               }
+
+
+# Caché en disco (SQLite) compartida por todos los procesos que usan el mismo fichero.
+# - El fichero está en modo WAL: muchos lectores a la vez y un escritor sin bloquearlos.
+# - Cada hilo (y cada proceso) abre su propia conexión.
+# - Las entradas caducadas se borran cada "intervalo_purga" segundos al escribir.
+# Si SQLite falla (disco lleno, fichero bloqueado...), se comporta como un fallo de caché.
+class CacheSQLite:
+
+     def __init__(self, ruta=CACHE_SQLITE, ttl=CACHE_SQLITE_TTL,
+                  intervalo_purga=CACHE_SQLITE_PURGA, busy_timeout_ms=2000):
+          self.ruta = str(ruta)
+          self.ttl = ttl
+          self.intervalo_purga = intervalo_purga
+          self.busy_timeout_ms = busy_timeout_ms
+          self._local = threading.local()
+          self._proxima_purga = 0
+          self._lock = threading.Lock()
+          self.aciertos = 0
+          self.fallos = 0
+          self.errores = 0
+          self.purgadas = 0
+
+     @property
+     def activa(self):
+          return self.ttl > 0
+
+     def _conexion(self):
+          conexion = getattr(self._local, "conexion", None)
+          # Tras un "fork" (gunicorn) no se reutiliza la conexión del proceso padre.
+          if conexion is not None and self._local.pid == os.getpid():
+               return conexion
+          conexion = sqlite3.connect(self.ruta, timeout=self.busy_timeout_ms / 1000,
+                                     isolation_level=None, check_same_thread=False)
+          conexion.execute("PRAGMA journal_mode=WAL")
+          conexion.execute("PRAGMA synchronous=NORMAL")
+          conexion.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+          conexion.execute(
+               "CREATE TABLE IF NOT EXISTS busquedas ("
+               " clave TEXT PRIMARY KEY,"
+               " valor TEXT NOT NULL,"
+               " caduca_en REAL NOT NULL)"
+          )
+          conexion.execute("CREATE INDEX IF NOT EXISTS busquedas_caduca_en ON busquedas (caduca_en)")
+          self._local.conexion = conexion
+          self._local.pid = os.getpid()
+          return conexion
+
+     def _contar(self, contador):
+          with self._lock:
+               setattr(self, contador, getattr(self, contador) + 1)
+
+     # Devuelve (valor, segundos que le quedan) o (None, 0) si no está o ha caducado.
+     def get_con_ttl(self, clave):
+          ahora = time.time()
+          try:
+               fila = self._conexion().execute(
+                    "SELECT valor, caduca_en FROM busquedas WHERE clave = ? AND caduca_en > ?",
+                    (clave, ahora),
+               ).fetchone()
+          except sqlite3.Error as error:
+               logger.warning("No se ha podido leer la caché de Spotify: %s", error)
+               self._contar("errores")
+               fila = None
+          if fila is None:
+               self._contar("fallos")
+               return None, 0
+          self._contar("aciertos")
+          return json.loads(fila[0]), fila[1] - ahora
+
+     def get(self, clave):
+          return self.get_con_ttl(clave)[0]
+
+     def set(self, clave, valor, ttl=None):
+          if not self.activa or valor is None:
+               return
+          ahora = time.time()
+          try:
+               conexion = self._conexion()
+               conexion.execute(
+                    "INSERT OR REPLACE INTO busquedas (clave, valor, caduca_en) VALUES (?, ?, ?)",
+                    (clave, json.dumps(valor), ahora + (ttl if ttl is not None else self.ttl)),
+               )
+               if ahora >= self._proxima_purga:
+                    self._proxima_purga = ahora + self.intervalo_purga
+                    self.purgar(ahora)
+          except sqlite3.Error as error:
+               logger.warning("No se ha podido escribir en la caché de Spotify: %s", error)
+               self._contar("errores")
+
+     # Borra del fichero las entradas caducadas.
+     def purgar(self, ahora=None):
+          ahora = time.time() if ahora is None else ahora
+          cursor = self._conexion().execute("DELETE FROM busquedas WHERE caduca_en <= ?", (ahora,))
+          with self._lock:
+               self.purgadas += max(cursor.rowcount, 0)
+
+     def delete(self, clave):
+          try:
+               self._conexion().execute("DELETE FROM busquedas WHERE clave = ?", (clave,))
+          except sqlite3.Error:
+               self._contar("errores")
+
+     def clear(self):
+          try:
+               self._conexion().execute("DELETE FROM busquedas")
+          except sqlite3.Error:
+               self._contar("errores")
+
+     def estadisticas(self):
+          with self._lock:
+               consultas = self.aciertos + self.fallos
+               return {
+                    "ruta": self.ruta,
+                    "ttl": self.ttl,
+                    "aciertos": self.aciertos,
+                    "fallos": self.fallos,
+                    "errores": self.errores,
+                    "purgadas": self.purgadas,
+                    "ratio_aciertos": (self.aciertos / consultas) if consultas else 0.0,
+               }
+
+
+# Caché en dos niveles: primero memoria (rápida, solo este proceso) y después disco
+# (compartida entre workers). Lo que se encuentra en disco se sube a memoria.
+class CacheEnCapas:
+
+     def __init__(self, memoria, disco):
+          self.memoria = memoria
+          self.disco = disco
+
+     def get(self, clave):
+          valor = self.memoria.get(clave)
+          if valor is not None:
+               return valor
+          valor, ttl_restante = self.disco.get_con_ttl(clave)
+          if valor is not None:
+               # En memoria no puede durar más de lo que le queda en disco.
+               self.memoria.set(clave, valor, ttl=min(self.memoria.ttl, ttl_restante))
+          return valor
+
+     def set(self, clave, valor, ttl=None):
+          self.memoria.set(clave, valor, ttl=ttl)
+          self.disco.set(clave, valor, ttl=ttl)
+
+     def delete(self, clave):
+          self.memoria.delete(clave)
+          self.disco.delete(clave)
+
+     def clear(self):
+          self.memoria.clear()
+          self.disco.clear()
+
+     def estadisticas(self):
+          return {
+               "memoria": self.memoria.estadisticas(),
+               "disco": self.disco.estadisticas(),
+          }
+
+
+# Caché compartida por el cliente síncrono y el asíncrono de todo el proceso.
+if CACHE_SQLITE:
+     cache_busquedas = CacheEnCapas(CacheTTL(), CacheSQLite(CACHE_SQLITE))
+else:
+     cache_busquedas = CacheTTL()
@@ -0,0 +1,167 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from dotenv import load_dotenv
+# -------------------------------------------------------------------------------------
+#                                      OBJETIVOS
+#                                     -----------
+# Protección frente a los límites de Spotify (HTTP 429 + "Retry-After").
+# 1º Limitador "token bucket" compartido por todos los hilos: como mucho "tasa" peticiones
+#    por segundo, con ráfagas de hasta "capacidad".
+# 2º Reintentos acotados que respetan "Retry-After" y, si no lo hay, esperan con backoff
+#    exponencial con jitter (para que no reintenten todos a la vez).
+# 3º Circuit breaker: si Spotify nos está limitando o falla seguido, las peticiones fallan
+#    al momento durante un tiempo en lugar de acumularse y empeorarlo.
+# -------------------------------------------------------------------------------------
+
+# Configuración (se puede cambiar desde el .env)
+load_dotenv()
+LIMITE_POR_SEGUNDO = float(os.getenv("SPOTIFY_LIMITE_POR_SEGUNDO", "10"))
+LIMITE_RAFAGA = int(os.getenv("SPOTIFY_LIMITE_RAFAGA", "20"))
+MAX_REINTENTOS = int(os.getenv("SPOTIFY_MAX_REINTENTOS", "3"))
+ESPERA_MAXIMA = float(os.getenv("SPOTIFY_ESPERA_MAXIMA", "10"))       # segundos que una petición puede esperar como mucho
+CIRCUITO_UMBRAL = int(os.getenv("SPOTIFY_CIRCUITO_UMBRAL", "5"))     # fallos seguidos para abrir el circuito
+CIRCUITO_PAUSA = float(os.getenv("SPOTIFY_CIRCUITO_PAUSA", "30"))     # segundos que el circuito está abierto
+
+
+class LimitadorTokenBucket:
+
+     def __init__(self, tasa=LIMITE_POR_SEGUNDO, capacidad=LIMITE_RAFAGA, reloj=time.monotonic):
+          self.tasa = tasa
+          self.capacidad = capacidad
+          self._reloj = reloj
+          self._tokens = float(capacidad)
+          self._ultimo = reloj()
+          self._lock = threading.Lock()
+
+     # Reserva un hueco y devuelve cuántos segundos hay que esperar para usarlo
+     # (0 si se puede usar ya). Si la espera supera "espera_maxima", no reserva y devuelve None.
+     # No duerme: así sirve tanto para hilos (time.sleep) como para asyncio (asyncio.sleep).
+     def reservar(self, espera_maxima=ESPERA_MAXIMA):
+          if self.tasa <= 0:
+               return 0.0 # Limitador desactivado.
+          with self._lock:
+               ahora = self._reloj()
+               self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+               self._ultimo = ahora
+               espera = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.tasa
+               if espera > espera_maxima:
+                    return None
+               self._tokens -= 1
+               return espera
+
+
+class CircuitBreaker:
+     CERRADO = "cerrado"
+     ABIERTO = "abierto"
+     SEMIABIERTO = "semiabierto"
+
+     def __init__(self, umbral=CIRCUITO_UMBRAL, pausa=CIRCUITO_PAUSA, reloj=time.monotonic):
+          self.umbral = umbral
+          self.pausa = pausa
+          self._reloj = reloj
+          self._lock = threading.Lock()
+          self.estado = self.CERRADO
+          self.fallos_seguidos = 0
+          self._abierto_hasta = 0.0
+          self._pausa_hasta = 0.0   # Hasta cuándo ha pedido Spotify que no volvamos ("Retry-After").
+          self._prueba_en_curso = False
+          self.rechazadas = 0
+
+     # ¿Se puede hacer una petición ahora?
+     def permitir(self):
+          with self._lock:
+               ahora = self._reloj()
+               if ahora < self._pausa_hasta:
+                    self.rechazadas += 1
+                    return False
+               if self.estado == self.ABIERTO:
+                    if ahora < self._abierto_hasta:
+                         self.rechazadas += 1
+                         return False
+                    self.estado = self.SEMIABIERTO # Pasado el tiempo, se deja pasar una petición de prueba.
+                    self._prueba_en_curso = False
+               if self.estado == self.SEMIABIERTO:
+                    if self._prueba_en_curso:
+                         self.rechazadas += 1
+                         return False
+                    self._prueba_en_curso = True
+               return True
+
+     # Segundos que quedan hasta poder volver a llamar a Spotify (0 si ya se puede).
+     def espera_restante(self):
+          with self._lock:
+               ahora = self._reloj()
+               hasta = max(self._pausa_hasta, self._abierto_hasta if self.estado == self.ABIERTO else 0)
+               return max(0.0, hasta - ahora)
+
+     def registrar_exito(self):
+          with self._lock:
+               self.estado = self.CERRADO
+               self.fallos_seguidos = 0
+               self._prueba_en_curso = False
+
+     # Un 429 (con su "Retry-After") o un error 5xx de Spotify.
+     def registrar_fallo(self, retry_after=None):
+          with self._lock:
+               ahora = self._reloj()
+               self.fallos_seguidos += 1
+               self._prueba_en_curso = False
+               if retry_after:
+                    self._pausa_hasta = max(self._pausa_hasta, ahora + retry_after)
+               if self.estado == self.SEMIABIERTO or self.fallos_seguidos >= self.umbral:
+                    self.estado = self.ABIERTO
+                    self._abierto_hasta = ahora + max(self.pausa, retry_after or 0)
+
+     # Libera la petición de prueba si ha terminado sin respuesta de Spotify (p. ej. 401).
+     def liberar(self):
+          with self._lock:
+               self._prueba_en_curso = False
+
+
+# Lee la cabecera "Retry-After" (segundos o fecha HTTP). None si no está o no se entiende.
+def leer_retry_after(valor):
+     if not valor:
+          return None
+     try:
+          return max(0.0, float(valor))
+     except ValueError:
+          pass
+     try:
+          return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+     except (TypeError, ValueError):
+          return None
+
+# Cuánto esperar antes del reintento número "intento" (0, 1, 2...).
+# - Con "Retry-After": lo que pide Spotify más un poco de jitter.
+# - Sin él: backoff exponencial con "full jitter" (entre 0 y base * 2^intento).
+def calcular_espera(intento, retry_after=None, base=0.5, maximo=ESPERA_MAXIMA):
+     if retry_after is not None:
+          return retry_after + random.uniform(0, base)
+     return random.uniform(0, min(maximo, base * (2 ** intento)))
+
+
+# ¿Merece la pena reintentar esta respuesta? (429: nos limitan; 5xx: error de Spotify)
+def es_reintentable(status_code):
+     return status_code == 429 or status_code >= 500
+
+# Tras un 429/5xx o un error de conexión (status_code=None): registra el fallo en el circuito
+# y devuelve cuántos segundos esperar antes de reintentar, o None si no hay que reintentar
+# (se han agotado los reintentos o Spotify pide esperar más de lo razonable).
+def espera_para_reintentar(circuito, intento, status_code=None, cabecera_retry_after=None,
+                           max_reintentos=MAX_REINTENTOS, espera_maxima=ESPERA_MAXIMA):
+     retry_after = leer_retry_after(cabecera_retry_after) if status_code == 429 else None
+     circuito.registrar_fallo(retry_after)
+     if intento >= max_reintentos:
+          return None
+     espera = calcular_espera(intento, retry_after, maximo=espera_maxima)
+     if espera > espera_maxima:
+          return None
+     return espera
+
+
+# Limitador y circuito compartidos por el cliente síncrono y el asíncrono de todo el proceso.
+limitador_spotify = LimitadorTokenBucket()
+circuito_spotify = CircuitBreaker()
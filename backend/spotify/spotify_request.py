@@ -1,13 +1,47 @@
+import logging
 import os
-import time 
+import time
 import requests
-import json
-from dotenv import load_dotenv 
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from spotify.spotify_agrupador import AgrupadorPeticiones
+from spotify.spotify_cache import cache_busquedas, clave_busqueda
+from spotify.spotify_limites import (
+     MAX_REINTENTOS,
+     circuito_spotify,
+     es_reintentable,
+     espera_para_reintentar,
+     limitador_spotify,
+)
+from spotify.spotify_token import TOKEN_FICHERO, URL_TOKEN, GestorTokenSpotify
+
+logger = logging.getLogger(__name__)
+
 # Se cargan variables del .env
 load_dotenv()
 
 CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
+
+# Configuración del pool de conexiones HTTP (se puede cambiar desde el .env)
+# - SPOTIFY_POOL_CONNECTIONS: número de hosts distintos que se mantienen en el pool
+#                             (accounts.spotify.com y api.spotify.com).
+# - SPOTIFY_POOL_MAXSIZE:     número máximo de conexiones abiertas por cada host.
+# - SPOTIFY_POOL_BLOCK:       si es "true", cuando se llega al máximo se espera a que
+#                             quede una conexión libre en vez de abrir una nueva.
+# - SPOTIFY_KEEP_ALIVE:       si es "false", se cierra la conexión después de cada petición.
+POOL_CONNECTIONS = int(os.getenv("SPOTIFY_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("SPOTIFY_POOL_MAXSIZE", "20"))
+POOL_BLOCK = os.getenv("SPOTIFY_POOL_BLOCK", "false").lower() == "true"
+KEEP_ALIVE = os.getenv("SPOTIFY_KEEP_ALIVE", "true").lower() == "true"
+# Número máximo de búsquedas a Spotify en paralelo por petición.
+MAX_CONCURRENCIA = int(os.getenv("SPOTIFY_MAX_CONCURRENCIA", "8"))
+
+URL_SEARCH = "https://api.spotify.com/v1/search"
+URL_ARTISTS = "https://api.spotify.com/v1/artists"
+URL_TRACKS = "https://api.spotify.com/v1/tracks"
+MAX_IDS_POR_PETICION = 50 # Máximo de IDs que aceptan /v1/artists y /v1/tracks
 # -------------------------------------------------------------------------------------
 #                                      OBJETIVOS
 #                                     -----------
@@ -15,134 +49,252 @@ CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 # 2º Comprobar si se puede reutilizar el Token o no.
 # 3º Usar Token para buscar canciones (tracks)
 # 4º Usar Token para buscar cantantes (artist)
+# 5º Usar Token para obtener varios cantantes/canciones a la vez por su ID (de 50 en 50)
+#
+# Todas las peticiones pasan por un único "requests.Session" (SpotifyClient), de forma
+# que las conexiones TCP + TLS con Spotify se reutilizan entre búsquedas (keep-alive)
+# en lugar de abrir una conexión nueva en cada llamada. Además, respetan el límite de
+# peticiones de Spotify (429 + "Retry-After") con un limitador y un circuit breaker.
 # -------------------------------------------------------------------------------------
 
-_HAY_TOKEN_ACTUAL_ = {
-     "access_token": None,
-     "expires_at": 0,
-}
-# 1) Solicitar un Token a Spotify para poder realizar búsquedas con dicho token.
-def get_token(force_refresh: bool = False):
+class SpotifyClient:
 
-     # Devuelve un token válido.
-     # - Si hay un token existente, se reutiliza.
-     # - Si el token está caducado, se solicita un nuevo token.
-     #
-     ahora = int(time.time()) # Devuelve el tiempo actual (segundos)
-     if(not force_refresh and 
-        _HAY_TOKEN_ACTUAL_["access_token"] is not None and 
-        ahora < _HAY_TOKEN_ACTUAL_["expires_at"]):
-          return _HAY_TOKEN_ACTUAL_["access_token"]
-
-     url = "https://accounts.spotify.com/api/token"
-     data = {"grant_type": "client_credentials"}
-     auth = (CLIENT_ID, CLIENT_SECRET)
-     try:
-          response = requests.post(url=url,data=data,auth=auth, timeout=10)
-          # Aparece un error si el código es distinto de 200 (OK)
-          response.raise_for_status() 
-          json_data = response.json() # Serializa el objeto a formato JSON
-     #     print(f"Loaded data: {json_data}")
-
-          access_token = json_data["access_token"]
-          expires_in = int(json_data.get("expires_in", 3600))
-
-          ahora = int(time.time()) # Devuelve el tiempo actual (segundos)
-          # Se guarda el TOKEN en memoria.
-          _HAY_TOKEN_ACTUAL_["access_token"] = access_token 
-          _HAY_TOKEN_ACTUAL_["expires_at"] = ahora + expires_in - 30 
-          return access_token
-     
-     except requests.exceptions.RequestException:
-          print("No se ha podido conectar con Spotify")
-          return None
+     def __init__(self, client_id=None, client_secret=None,
+                  pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                  pool_block=POOL_BLOCK, keep_alive=KEEP_ALIVE, timeout=10,
+                  cache=cache_busquedas, ruta_token=TOKEN_FICHERO, limitador=limitador_spotify,
+                  circuito=circuito_spotify, max_reintentos=MAX_REINTENTOS):
+          self.client_id = client_id if client_id is not None else CLIENT_ID
+          self.client_secret = client_secret if client_secret is not None else CLIENT_SECRET
+          self.timeout = timeout
+          # Caché de búsquedas (TTL + LRU) delante de Spotify.
+          self.cache = cache
+          # Límite de peticiones por segundo, circuit breaker y reintentos (ver spotify_limites.py).
+          self.limitador = limitador
+          self.circuito = circuito
+          self.max_reintentos = max_reintentos
+          # Búsquedas iguales a la vez: solo una llega a Spotify.
+          self.agrupador = AgrupadorPeticiones()
 
-#2) Usar Token para buscar canciones (tracks)
-#  Se encarga de buscar canciones en Spotify por el nombre de la canción
-def search_track_song(query):
-     token = get_token()
-     if not token:
-          return None 
-     url = "https://api.spotify.com/v1/search"
-     params = {
-          "q"       : query,
-          "type"    : "track",
-          "limit"   : 1 # Devuelve solo 1 resultados de la búsqueda
-     }
-     header = {
-          "Authorization": f"Bearer {token}"
-     }
-
-     try:
-          response = requests.get(url,params=params, headers=header, timeout=10)
-          
-          # Se renueva el token
-          if response.status_code == 401:
-               token = get_token(force_refresh=True)
-               if not token :
-                    return None
-               header["Authorization"] = f"Bearer {token}"
-               response = requests.get(url,params=params, headers=header, timeout=10)
+          # Sesión compartida por todas las peticiones con su pool de conexiones.
+          self.session = requests.Session()
+          adapter = HTTPAdapter(
+               pool_connections=pool_connections,
+               pool_maxsize=pool_maxsize,
+               pool_block=pool_block,
+          )
+          self.session.mount("https://", adapter)
+          if not keep_alive:
+               self.session.headers["Connection"] = "close"
+
+          # Token compartido entre hilos y workers (ver spotify_token.py).
+          self.tokens = GestorTokenSpotify(
+               self.client_id, self.client_secret, session=self.session,
+               ruta=ruta_token, timeout=timeout,
+          )
 
-     # Aparece un error si el código es distinto de 200 (OK)
-          response.raise_for_status() 
-          json_data = response.json()
-     #    print(f"Loaded data: {json_data}")
+     def close(self):
+          self.tokens.parar()
+          self.session.close()
 
-     # Poner que la visualización sea más agradable a la vista: ese diccionario se convierta a JSON 
-          data_pretty = json.dumps(json_data, indent=4) # Serializa el objeto a formato JSON
-          print(f"Pretty Printed Data: {data_pretty}")
+     # 1) Solicitar un Token a Spotify para poder realizar búsquedas con dicho token.
+     #    Lo gestiona GestorTokenSpotify: se reutiliza mientras sea válido, se renueva en
+     #    segundo plano antes de caducar y solo un hilo/proceso lo pide a la vez.
+     def get_token(self, force_refresh: bool = False, token_caducado=None):
+          return self.tokens.get_token(force_refresh=force_refresh, token_caducado=token_caducado)
+
+     # 2) y 3) Búsqueda genérica en Spotify ("track" o "artist")
+     def _search(self, query, tipo):
+          # Si la búsqueda ya está en caché, no se llama a Spotify.
+          clave = clave_busqueda(tipo, query)
+          if self.cache is not None:
+               json_data = self.cache.get(clave)
+               if json_data is not None:
+                    return json_data
+
+          # Si otro hilo ya está haciendo esta misma búsqueda, se espera a su resultado.
+          return self.agrupador.ejecutar(clave, lambda: self._buscar(clave, query, tipo))
+
+     # Búsqueda en Spotify (solo la hace un hilo a la vez para cada clave).
+     def _buscar(self, clave, query, tipo):
+          # Mientras se esperaba, otro hilo puede haberla dejado en caché.
+          if self.cache is not None:
+               json_data = self.cache.get(clave)
+               if json_data is not None:
+                    return json_data
+
+          params = {
+               "q"       : query,
+               "type"    : tipo,
+               "limit"   : 1 # Devuelve solo 1 resultados de la búsqueda
+          }
+          json_data = self._get(URL_SEARCH, params)
+          if json_data is None:
+               return None
+
+          if self.cache is not None:
+               self.cache.set(clave, json_data)
           return json_data
-     except requests.exceptions.RequestException:
-          print("No se ha podido conectar con Spotify")
-          return None
 
+     # GET autenticado a la API de Spotify. Si el token ha caducado (401), se renueva una vez.
+     #    Antes de cada petición se pasa por el circuit breaker y el limitador; los 429 y 5xx se
+     #    reintentan (como mucho "max_reintentos") respetando "Retry-After".
+     def _get(self, url, params):
+          token = self.get_token()
+          if not token:
+               return None
+          header = {
+               "Authorization": f"Bearer {token}"
+          }
+          token_renovado = False
+          intento = 0
+
+          while True:
+               # Si Spotify nos está limitando, se falla al momento en lugar de insistir.
+               if not self.circuito.permitir():
+                    logger.warning("Spotify está limitando las peticiones: se omite la llamada")
+                    return None
+               espera = self.limitador.reservar()
+               if espera is None:
+                    self.circuito.liberar()
+                    logger.warning("Demasiadas peticiones a Spotify en cola: se omite la llamada")
+                    return None
+               if espera:
+                    time.sleep(espera)
+
+               try:
+                    response = self.session.get(url, params=params, headers=header, timeout=self.timeout)
+               except requests.exceptions.RequestException:
+                    logger.warning("No se ha podido conectar con Spotify")
+                    espera = espera_para_reintentar(self.circuito, intento, max_reintentos=self.max_reintentos)
+                    if espera is None:
+                         return None
+                    intento += 1
+                    time.sleep(espera)
+                    continue
+
+               # Se renueva el token (una sola vez)
+               if response.status_code == 401 and not token_renovado:
+                    self.circuito.liberar()
+                    token = self.get_token(force_refresh=True, token_caducado=token)
+                    if not token :
+                         return None
+                    header["Authorization"] = f"Bearer {token}"
+                    token_renovado = True
+                    continue
 
+               # 429 (nos limitan) o 5xx: se espera y se reintenta.
+               if es_reintentable(response.status_code):
+                    espera = espera_para_reintentar(
+                         self.circuito, intento, response.status_code,
+                         response.headers.get("Retry-After"), max_reintentos=self.max_reintentos,
+                    )
+                    if espera is None:
+                         logger.warning("Spotify ha respondido %s: se omite la llamada", response.status_code)
+                         return None
+                    intento += 1
+                    time.sleep(espera)
+                    continue
 
+               self.circuito.registrar_exito()
+               try:
+               # Aparece un error si el código es distinto de 200 (OK)
+                    response.raise_for_status()
+                    return response.json()
+               except (requests.exceptions.RequestException, ValueError):
+                    logger.warning("No se ha podido conectar con Spotify")
+                    return None
+
+     # 4) Información de varios artistas/canciones a la vez a partir de sus IDs de Spotify.
+     #    Spotify acepta como mucho 50 IDs por petición, así que se trocea la lista y los
+     #    trozos se piden en paralelo. Devuelve un elemento por ID, en el mismo orden
+     #    (None si Spotify no lo encuentra o la petición falla).
+     def _get_varios(self, url, clave, ids):
+          ids = list(ids)
+          trozos = trocear(ids, MAX_IDS_POR_PETICION)
+          respuestas = buscar_en_paralelo(
+               lambda trozo: self._get(url, {"ids": ",".join(trozo)}), trozos
+          )
+          resultado = []
+          for trozo, json_data in zip(trozos, respuestas):
+               elementos = (json_data or {}).get(clave) or []
+               # Si la respuesta no trae un elemento por ID, se descarta el trozo entero.
+               if len(elementos) != len(trozo):
+                    elementos = [None] * len(trozo)
+               resultado.extend(elementos)
+          return resultado
+
+     def get_artists(self, ids):
+          return self._get_varios(URL_ARTISTS, "artists", ids)
+
+     def get_tracks(self, ids):
+          return self._get_varios(URL_TRACKS, "tracks", ids)
+
+     # Se encarga de buscar canciones en Spotify por el nombre de la canción
+     def search_track_song(self, query):
+          return self._search(query, "track")
+
+     # Se encarga de buscar cantantes en Spotify por el nombre del cantante
+     def search_artist(self, query):
+          return self._search(query, "artist")
+
+
+# Cliente compartido por todo el proceso (un único pool de conexiones).
+cliente_spotify = SpotifyClient()
+
+
+# Funciones del módulo: se mantienen para no cambiar a quien ya las importa.
+def get_token(force_refresh: bool = False):
+     return cliente_spotify.get_token(force_refresh=force_refresh)
 
 #2) Usar Token para buscar canciones (tracks)
 #  Se encarga de buscar canciones en Spotify por el nombre de la canción
+def search_track_song(query):
+     return cliente_spotify.search_track_song(query)
+
+#3) Usar Token para buscar cantantes (artist)
+#  Se encarga de buscar cantantes en Spotify por el nombre del cantante
 def search_artist(query):
-     token = get_token()
-     if not token:
-          return None 
-     url = "https://api.spotify.com/v1/search"
-     params = {
-          "q"       : query,
-          "type"    : "artist",
-          "limit"   : 1 # Devuelve solo 1 resultados de la búsqueda
-     }
-     header = {
-          "Authorization": f"Bearer {token}"
-     }
-     try:
-          response = requests.get(url,params=params, headers=header, timeout=10)
-
-          # Se renueva el token
-          if response.status_code == 401:
-               token = get_token(force_refresh=True)
-               if not token :
-                    return None
-               header["Authorization"] = f"Bearer {token}"
-               response = requests.get(url,params=params, headers=header, timeout=10)
-               
-     # Aparece un error si el código es distinto de 200 (OK)
-          response.raise_for_status() 
-          json_data = response.json()
-     #    print(f"Loaded data: {json_data}")
-
-     # Poner que la visualización sea más agradable a la vista: ese diccionario se convierta a JSON 
-          data_pretty = json.dumps(json_data, indent=4) # Serializa el objeto a formato JSON
-          print(f"Pretty Printed Data: {data_pretty}")
-          return json_data
-     except requests.exceptions.RequestException:
-          print("No se ha podido conectar con Spotify")
-          return None
+     return cliente_spotify.search_artist(query)
+
+#5) Obtener varios cantantes/canciones a la vez por su ID de Spotify
+#  Se hacen peticiones de 50 IDs como mucho: 200 favoritos son 4 peticiones en vez de 200.
+def get_artists(ids):
+     return cliente_spotify.get_artists(ids)
+
+def get_tracks(ids):
+     return cliente_spotify.get_tracks(ids)
+
+
+# Divide una lista en trozos de como mucho "tamano" elementos.
+def trocear(lista, tamano):
+     return [lista[i:i + tamano] for i in range(0, len(lista), tamano)]
+
 
+#6) Lanzar varias búsquedas a la vez (fan-out)
+#  Ejecuta "funcion_busqueda" para cada consulta en un pool de hilos con, como mucho,
+#  "max_concurrencia" búsquedas en vuelo. Los resultados se devuelven en el mismo orden
+#  que las consultas y, si una búsqueda falla, su resultado es None sin afectar al resto.
+def buscar_en_paralelo(funcion_busqueda, consultas, max_concurrencia=MAX_CONCURRENCIA):
+     consultas = list(consultas)
+     if not consultas:
+          return []
 
+     def buscar(consulta):
+          try:
+               return funcion_busqueda(consulta)
+          except Exception:
+               logger.warning("Ha fallado la búsqueda en Spotify de '%s'", consulta, exc_info=True)
+               return None
 
+     hilos = max(1, min(max_concurrencia, len(consultas)))
+     if hilos == 1:
+          return [buscar(consulta) for consulta in consultas]
+     with ThreadPoolExecutor(max_workers=hilos) as executor:
+          # "map" conserva el orden de las consultas.
+          return list(executor.map(buscar, consultas))
 
 
 if __name__ == "__main__":
     search_track_song("La bachata")
-#    search_artist("Adele")
\ No newline at end of file
+#    search_artist("Adele")
@@ -0,0 +1,245 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+import requests
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------------------------
+#                                      OBJETIVOS
+#                                     -----------
+# Gestor del token de Spotify (client credentials) compartido por hilos y procesos.
+# 1º Solo un hilo a la vez pide un token nuevo (lock del proceso) y solo un proceso a la
+#    vez (bloqueo sobre un fichero). El resto espera y reutiliza el token que se ha pedido.
+# 2º El token se guarda en un fichero local para que todos los workers lo compartan.
+# 3º Un hilo en segundo plano renueva el token "margen" segundos antes de que caduque,
+#    de forma que ninguna petición tenga que esperar a Spotify para obtenerlo.
+# 4º Tras un 401 solo se renueva si el token que ha fallado sigue siendo el actual.
+# 5º Si Spotify falla, el hilo reintenta con backoff exponencial; si rechaza las credenciales
+#    (4xx) o no las hay, el hilo se para: reintentar no lo arreglaría.
+# -------------------------------------------------------------------------------------
+
+URL_TOKEN = "https://accounts.spotify.com/api/token"
+
+# Configuración (se puede cambiar desde el .env)
+load_dotenv()
+# Fichero donde se comparte el token entre workers. Si se deja vacío, cada proceso tiene el suyo.
+TOKEN_FICHERO = os.getenv(
+     "SPOTIFY_TOKEN_FICHERO",
+     str(Path(__file__).resolve().parent.parent / "spotify_token.json"),
+)
+TOKEN_MARGEN = int(os.getenv("SPOTIFY_TOKEN_MARGEN", "300")) # segundos antes de caducar en los que se renueva
+# Si Spotify no responde, el hilo reintenta a los 5 s, 10 s, 20 s... como mucho cada TOKEN_ESPERA_MAXIMA.
+TOKEN_ESPERA_MAXIMA = float(os.getenv("SPOTIFY_TOKEN_ESPERA_MAXIMA", "300"))
+
+
+# Bloqueo exclusivo entre procesos sobre un fichero ("<ruta>.lock").
+@contextmanager
+def bloqueo_fichero(ruta):
+     with open(ruta, "a+b") as fichero:
+          if os.name == "nt":
+               import msvcrt
+               fichero.seek(0)
+               msvcrt.locking(fichero.fileno(), msvcrt.LK_LOCK, 1)
+               try:
+                    yield
+               finally:
+                    fichero.seek(0)
+                    msvcrt.locking(fichero.fileno(), msvcrt.LK_UNLCK, 1)
+          else:
+               import fcntl
+               fcntl.flock(fichero.fileno(), fcntl.LOCK_EX)
+               try:
+                    yield
+               finally:
+                    fcntl.flock(fichero.fileno(), fcntl.LOCK_UN)
+
+
+class GestorTokenSpotify:
+
+     def __init__(self, client_id, client_secret, session=None, ruta=TOKEN_FICHERO,
+                  margen=TOKEN_MARGEN, timeout=10, refresco_en_segundo_plano=True,
+                  espera_maxima=TOKEN_ESPERA_MAXIMA):
+          self.client_id = client_id
+          self.client_secret = client_secret
+          self.session = session if session is not None else requests.Session()
+          self.ruta = str(ruta) if ruta else None
+          self.margen = margen
+          self.timeout = timeout
+          self.refresco_en_segundo_plano = refresco_en_segundo_plano
+          self.espera_maxima = espera_maxima
+
+          self._token = None
+          self._expires_at = 0
+          self._lock = threading.Lock()
+          self._hilo = None
+          self._pid_hilo = None
+          self._parar = threading.Event()
+          self.renovaciones = 0 # Número de veces que se ha pedido un token a Spotify.
+          self.credenciales_rechazadas = False # Faltan o Spotify las ha rechazado (4xx).
+
+     # ------------------------------------------------------------------------------
+     # Token en memoria
+     # ------------------------------------------------------------------------------
+     @staticmethod
+     def _vigente(token, expires_at, margen=0):
+          return token is not None and time.time() < expires_at - margen
+
+     # ¿Sirve este token? Si "token_caducado" es el que ha dado 401, sirve cualquier otro.
+     def _aceptable(self, token, expires_at, margen, token_caducado, forzar):
+          if not self._vigente(token, expires_at, margen):
+               return False
+          if token_caducado is not None:
+               return token != token_caducado
+          return not forzar
+
+     # Token en memoria si sigue siendo válido (no hace ninguna petición).
+     def token_vigente(self):
+          token, expires_at = self._token, self._expires_at
+          return token if self._vigente(token, expires_at) else None
+
+     # ------------------------------------------------------------------------------
+     # Fichero compartido entre workers
+     # ------------------------------------------------------------------------------
+     def _leer_compartido(self):
+          if not self.ruta:
+               return None
+          try:
+               with open(self.ruta, encoding="utf-8") as fichero:
+                    datos = json.load(fichero)
+          except (OSError, ValueError):
+               return None
+          # Un token de otras credenciales no sirve.
+          if datos.get("client_id") != self.client_id:
+               return None
+          return datos.get("access_token"), float(datos.get("expires_at", 0))
+
+     def _escribir_compartido(self, token, expires_at):
+          if not self.ruta:
+               return
+          directorio = os.path.dirname(self.ruta) or "."
+          try:
+               descriptor, temporal = tempfile.mkstemp(dir=directorio, prefix=".spotify_token_")
+               with os.fdopen(descriptor, "w", encoding="utf-8") as fichero:
+                    json.dump({"client_id": self.client_id, "access_token": token, "expires_at": expires_at}, fichero)
+               os.chmod(temporal, 0o600)
+               os.replace(temporal, self.ruta) # Escritura atómica: nadie lee un fichero a medias.
+          except OSError as error:
+               logger.warning("No se ha podido guardar el token de Spotify: %s", error)
+
+     # ------------------------------------------------------------------------------
+     # Petición a Spotify
+     # ------------------------------------------------------------------------------
+     def _pedir_token(self):
+          if not self.client_id or not self.client_secret:
+               self.credenciales_rechazadas = True
+               logger.warning("Faltan las credenciales de Spotify")
+               return None
+          data = {"grant_type": "client_credentials"}
+          auth = (self.client_id, self.client_secret)
+          try:
+               response = self.session.post(url=URL_TOKEN, data=data, auth=auth, timeout=self.timeout)
+               # 4xx (salvo 429): Spotify rechaza las credenciales, no sirve reintentar.
+               if 400 <= response.status_code < 500 and response.status_code != 429:
+                    self.credenciales_rechazadas = True
+                    logger.warning("Spotify ha rechazado las credenciales (HTTP %s)", response.status_code)
+                    return None
+               # Aparece un error si el código es distinto de 200 (OK)
+               response.raise_for_status()
+               json_data = response.json()
+               expires_in = int(json_data.get("expires_in", 3600))
+               self.renovaciones += 1
+               self.credenciales_rechazadas = False
+               return json_data["access_token"], time.time() + expires_in - 30
+          except (requests.exceptions.RequestException, KeyError, ValueError):
+               logger.warning("No se ha podido conectar con Spotify")
+               return None
+
+     # Renueva el token si nadie lo ha hecho ya (single-flight entre hilos y procesos).
+     def _refrescar(self, margen=0, token_caducado=None, forzar=False):
+          with self._lock:
+               # 1. ¿Otro hilo de este proceso lo ha renovado mientras se esperaba?
+               if self._aceptable(self._token, self._expires_at, margen, token_caducado, forzar):
+                    return self._token
+
+               bloqueo = bloqueo_fichero(self.ruta + ".lock") if self.ruta else nullcontext()
+               with bloqueo:
+                    # 2. ¿Otro proceso lo ha renovado y lo ha dejado en el fichero?
+                    compartido = self._leer_compartido()
+                    if compartido and self._aceptable(*compartido, margen, token_caducado, forzar):
+                         self._token, self._expires_at = compartido
+                         return self._token
+
+                    # 3. Se pide un token nuevo a Spotify y se comparte.
+                    nuevo = self._pedir_token()
+                    if nuevo is None:
+                         # Si Spotify falla, se sigue usando el actual mientras no caduque.
+                         return self.token_vigente()
+                    self._token, self._expires_at = nuevo
+                    self._escribir_compartido(*nuevo)
+                    return self._token
+
+     # ------------------------------------------------------------------------------
+     # Renovación en segundo plano
+     # ------------------------------------------------------------------------------
+     # Arranca el hilo de renovación si no está en marcha en este proceso. Lo llama get_token y
+     # también el cliente asíncrono, que usa token_vigente() sin pasar por get_token.
+     def asegurar_hilo(self):
+          # Con las credenciales rechazadas no se vuelve a arrancar (se pararía al momento).
+          if not self.refresco_en_segundo_plano or self.credenciales_rechazadas:
+               return
+          # Los hilos no sobreviven a un "fork": cada worker arranca el suyo.
+          if self._hilo is not None and self._pid_hilo == os.getpid() and self._hilo.is_alive():
+               return
+          with self._lock:
+               if self._hilo is not None and self._pid_hilo == os.getpid() and self._hilo.is_alive():
+                    return
+               self._parar.clear()
+               self._hilo = threading.Thread(target=self._bucle_refresco, name="spotify-token", daemon=True)
+               self._pid_hilo = os.getpid()
+               self._hilo.start()
+
+     # Segundos hasta el siguiente intento tras "fallos" intentos fallidos seguidos (5, 10, 20...).
+     def espera_tras_fallos(self, fallos):
+          return min(self.espera_maxima, 5 * 2 ** (fallos - 1))
+
+     def _bucle_refresco(self):
+          fallos = 0
+          while not self._parar.is_set():
+               espera = self._expires_at - self.margen - time.time()
+               if self._token is not None and espera > 0:
+                    self._parar.wait(min(espera, 60))
+                    continue
+               if self._refrescar(margen=self.margen) is not None and self._vigente(self._token, self._expires_at, self.margen):
+                    fallos = 0
+                    continue
+               if self.credenciales_rechazadas:
+                    logger.warning("Se deja de renovar el token de Spotify en segundo plano")
+                    return
+               # Spotify no responde: se vuelve a intentar cada vez más tarde.
+               fallos += 1
+               self._parar.wait(self.espera_tras_fallos(fallos))
+
+     def parar(self):
+          self._parar.set()
+
+     # ------------------------------------------------------------------------------
+     # API pública
+     # ------------------------------------------------------------------------------
+     def get_token(self, force_refresh: bool = False, token_caducado=None):
+          # Devuelve un token válido.
+          # - Si hay un token en memoria, se reutiliza (lo normal: lo renueva el hilo).
+          # - Si no, se busca en el fichero compartido o se pide uno nuevo (solo uno a la vez).
+          # - "force_refresh" con "token_caducado": solo se renueva si ese token sigue siendo el actual.
+          self.asegurar_hilo()
+          if not force_refresh:
+               token = self.token_vigente()
+               if token:
+                    return token
+          return self._refrescar(token_caducado=token_caducado, forzar=force_refresh)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ViewsetUsersConfig(AppConfig):
     name = 'viewset_users'
+
+    def ready(self):
+        # Conecta las señales que invalidan la caché de favoritos.
+        from . import favoritos_cache
@@ -0,0 +1,145 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import status
+from .enriquecimiento import (
+    actualizar_artistas,
+    actualizar_canciones,
+    es_verdadero,
+    guardar_artistas,
+    guardar_canciones,
+    info_artista,
+    info_cancion,
+    resueltos,
+)
+from .models import Usuario, CancionFavorita, CantanteFavorito
+from spotify.spotify_async import SpotifyAsyncClient, buscar_en_paralelo_async
+
+# ##############################################################################################
+#                               Vistas asíncronas (ASGI) de Spotify
+# ##############################################################################################
+# Mismas respuestas que "artistas_spotify" y "canciones_spotify" de UsuarioViewSet, pero
+# las búsquedas en Spotify se hacen con "await": bajo uvicorn, un único worker puede tener
+# cientos de peticiones esperando a Spotify sin ocupar un hilo por cada una.
+# Cada petición abre su cliente de Spotify con "async with" y lo cierra al terminar.
+
+
+# ----------------------------------------------------------------------------------------------
+#                                           GET
+# endpoint: /users/<id>/artistas_spotify_async
+# ----------------------------------------------------------------------------------------------
+async def get_info_artistas_spotify_async(request, pk):
+
+    # 1. Comprobar que el usuario existe
+    if not await Usuario.objects.filter(pk=pk).aexists():
+        return JsonResponse(
+                            {"message": f"Usuario '{pk}' no encontrado"},
+                            status=status.HTTP_404_NOT_FOUND
+                            )
+
+    # 2. Obtener los cantantes favoritos del usuario (del catálogo) junto con su artista de Spotify
+    favoritos = [
+        favorito.cantante async for favorito in
+        CantanteFavorito.objects.filter(usuario_id=pk).select_related("cantante__artista_spotify").order_by("id")
+    ]
+
+    async with SpotifyAsyncClient() as spotify:
+        # 3. Solo se buscan en Spotify (a la vez) los cantantes que todavía no se han resuelto.
+        pendientes = [favorito for favorito in favoritos if favorito.artista_spotify_id is None]
+        if pendientes:
+            jsons_artistas = await buscar_en_paralelo_async(
+                spotify.search_artist, [favorito.nombre for favorito in pendientes]
+            )
+            await sync_to_async(guardar_artistas)(pendientes, jsons_artistas)
+
+        # 3.1 Con "?refrescar=true" se actualizan los artistas ya resueltos (por ID, de 50 en 50).
+        if es_verdadero(request.GET.get("refrescar")):
+            artistas = resueltos(favoritos, "artista_spotify")
+            if artistas:
+                elementos = await spotify.get_artists([artista.spotify_id for artista in artistas])
+                await sync_to_async(actualizar_artistas)(favoritos, artistas, elementos)
+
+    resultado_spotify = []
+    cantantes_favoritos = []
+
+    # 4. Obtenemos información de cada artista
+    for favorito in favoritos:
+        if favorito.artista_spotify_id is not None:
+            info = info_artista(favorito)
+            resultado_spotify.append(info)
+            cantantes_favoritos.append(info["nombre"])
+
+    if not resultado_spotify:
+        mensaje = f"No se han encontrado artistas en Spotify para los gustos del usuario '{pk}'"
+    else:
+        mensaje = f"Usuario '{pk}' ha encontrado información en Spotify acerca de cantantes favoritos."
+
+    return JsonResponse(
+        {
+            "message": mensaje,
+            "cantantes_favoritos": cantantes_favoritos,
+            "resultado_spotify": resultado_spotify,
+        },
+        status=status.HTTP_200_OK,
+        json_dumps_params={"ensure_ascii": False}
+    )
+
+
+# ----------------------------------------------------------------------------------------------
+#                                           GET
+# endpoint: /users/<id>/canciones_spotify_async
+# ----------------------------------------------------------------------------------------------
+async def get_info_canciones_spotify_async(request, pk):
+
+    # 1. Comprobar que el usuario existe
+    if not await Usuario.objects.filter(pk=pk).aexists():
+        return JsonResponse(
+                            {"message": f"Usuario '{pk}' no encontrado"},
+                            status=status.HTTP_404_NOT_FOUND
+                            )
+
+    # 2. Obtener las canciones favoritas del usuario (del catálogo) junto con su canción de Spotify
+    favoritos = [
+        favorito.cancion async for favorito in
+        CancionFavorita.objects.filter(usuario_id=pk).select_related("cancion__cancion_spotify").order_by("id")
+    ]
+
+    async with SpotifyAsyncClient() as spotify:
+        # 3. Solo se buscan en Spotify (a la vez) las canciones que todavía no se han resuelto.
+        pendientes = [favorito for favorito in favoritos if favorito.cancion_spotify_id is None]
+        if pendientes:
+            jsons_canciones = await buscar_en_paralelo_async(
+                spotify.search_track_song, [favorito.nombre for favorito in pendientes]
+            )
+            await sync_to_async(guardar_canciones)(pendientes, jsons_canciones)
+
+        # 3.1 Con "?refrescar=true" se actualizan las canciones ya resueltas (por ID, de 50 en 50).
+        if es_verdadero(request.GET.get("refrescar")):
+            canciones = resueltos(favoritos, "cancion_spotify")
+            if canciones:
+                elementos = await spotify.get_tracks([cancion.spotify_id for cancion in canciones])
+                await sync_to_async(actualizar_canciones)(favoritos, canciones, elementos)
+
+    resultado_spotify = []
+    canciones_favoritas = []
+
+    # 4. Obtenemos información de cada canción
+    for favorito in favoritos:
+        if favorito.cancion_spotify_id is not None:
+            info = info_cancion(favorito)
+            resultado_spotify.append(info)
+            canciones_favoritas.append(info["nombre"])
+
+    if not resultado_spotify:
+        mensaje = f"No se han encontrado canciones en Spotify para los gustos del usuario '{pk}'"
+    else:
+        mensaje = f"Usuario '{pk}' ha encontrado información en Spotify acerca de canciones favoritas."
+
+    return JsonResponse(
+        {
+            "message": mensaje,
+            "canciones_favoritas": canciones_favoritas,
+            "resultado_spotify": resultado_spotify,
+        },
+        status=status.HTTP_200_OK,
+        json_dumps_params={"ensure_ascii": False}
+    )
@@ -0,0 +1,191 @@
+from django.utils import timezone
+from .models import ArtistaSpotify, Cancion, CancionSpotify, Cantante
+
+# ##############################################################################################
+#                           Información de Spotify de los favoritos
+# ##############################################################################################
+# La primera vez que se busca un cantante/canción del catálogo en Spotify, el resultado se
+# guarda en ArtistaSpotify/CancionSpotify y el cantante/canción queda enlazado a él (para todos
+# los usuarios que lo tengan como favorito). A partir de ahí, "artistas_spotify" y
+# "canciones_spotify" leen de la base de datos y solo buscan en Spotify los nombres que
+# todavía no se han resuelto.
+
+
+# "?refrescar=true" / "?refrescar=1" en la URL (vistas síncronas y asíncronas).
+def es_verdadero(valor):
+    return str(valor).lower() in ("1", "true", "si", "sí")
+
+
+# Campos de ArtistaSpotify a partir del primer artista devuelto por una búsqueda (o None).
+def datos_artista(json_artistas):
+    if not json_artistas: # Si es None no continua
+        return None
+    contenido_artista = json_artistas.get("artists", {}).get("items", [])
+    if not contenido_artista:
+        return None
+    # Devuelve el primer elemento de Spotify
+    return datos_de_artista(contenido_artista[0])
+
+# Campos de ArtistaSpotify a partir de un artista de Spotify (búsqueda o /v1/artists).
+def datos_de_artista(artista):
+    if not artista or not artista.get("id"):
+        return None
+    return {
+        "spotify_id": artista.get("id"),
+        "nombre": artista.get("name") or "",
+        "popularidad": artista.get("popularity"),
+        "seguidores": (artista.get("followers") or {}).get("total"),
+        "generos": artista.get("genres") or [],
+        "spotify_url": (artista.get("external_urls") or {}).get("spotify") or "",
+    }
+
+# Campos de CancionSpotify a partir de la primera canción devuelta por una búsqueda (o None).
+def datos_cancion(json_canciones):
+    if not json_canciones: # Si es None no continua
+        return None
+    contenido_cancion = json_canciones.get("tracks", {}).get("items", [])
+    if not contenido_cancion:
+        return None
+    return datos_de_cancion(contenido_cancion[0])
+
+# Campos de CancionSpotify a partir de una canción de Spotify (búsqueda o /v1/tracks).
+def datos_de_cancion(canc):
+    if not canc or not canc.get("id"):
+        return None
+    album = canc.get("album") or {}
+
+    cantantes_nombres = []
+    for art in canc.get("artists", []):
+        cantantes_nombres.append(art.get("name"))
+
+    return {
+        "spotify_id": canc.get("id"),
+        "nombre": canc.get("name") or "",
+        "nombre_album": album.get("name") or "",
+        "tipo_album": album.get("album_type") or "",
+        "cantantes": cantantes_nombres,
+        "popularidad": canc.get("popularity"),
+        "numero_cancion": canc.get("track_number"),
+        "duracion": canc.get("duration_ms"),
+        "fecha_lanzamiento": album.get("release_date") or "",
+        "spotify_url": (canc.get("external_urls") or {}).get("spotify") or "",
+    }
+
+
+# Guarda (o actualiza) los resultados de Spotify y enlaza el catálogo con ellos.
+# - "favoritos": cantantes/canciones del catálogo sin resolver (Cantante o Cancion).
+# - "jsons": respuesta de Spotify para cada favorito, en el mismo orden.
+# Se hace con un número fijo de consultas y sin "update_conflicts" (MySQL no admite indicar
+# "unique_fields"): se leen los que ya existen, se actualizan con un bulk_update, se insertan
+# los nuevos (ignorando los que otra petición haya insertado a la vez) y se vuelven a leer.
+def _guardar_resueltos(modelo_spotify, campo_favorito, modelo_catalogo, extraer_datos, favoritos, jsons):
+    datos_por_id = {}
+    favoritos_por_id = {}
+    for favorito, json_spotify in zip(favoritos, jsons):
+        datos = extraer_datos(json_spotify)
+        if datos is None:
+            continue # Sin resultado en Spotify: se volverá a intentar en la próxima petición.
+        datos_por_id[datos["spotify_id"]] = datos
+        favoritos_por_id.setdefault(datos["spotify_id"], []).append(favorito)
+
+    if not datos_por_id:
+        return
+
+    campos = [campo for campo in next(iter(datos_por_id.values())) if campo != "spotify_id"]
+    existentes = modelo_spotify.objects.in_bulk(list(datos_por_id), field_name="spotify_id")
+    if existentes:
+        ahora = timezone.now() # "auto_now" no se aplica en bulk_update.
+        for spotify_id, objeto in existentes.items():
+            for campo in campos:
+                setattr(objeto, campo, datos_por_id[spotify_id][campo])
+            objeto.actualizado = ahora
+        modelo_spotify.objects.bulk_update(list(existentes.values()), campos + ["actualizado"])
+    nuevos = [modelo_spotify(**datos) for spotify_id, datos in datos_por_id.items() if spotify_id not in existentes]
+    if nuevos:
+        modelo_spotify.objects.bulk_create(nuevos, ignore_conflicts=True)
+        por_spotify_id = modelo_spotify.objects.in_bulk(list(datos_por_id), field_name="spotify_id")
+    else:
+        por_spotify_id = existentes
+
+    enlazados = []
+    for spotify_id, favoritos_id in favoritos_por_id.items():
+        for favorito in favoritos_id:
+            setattr(favorito, campo_favorito, por_spotify_id[spotify_id])
+            enlazados.append(favorito)
+    modelo_catalogo.objects.bulk_update(enlazados, [campo_favorito])
+
+def guardar_artistas(favoritos, jsons):
+    _guardar_resueltos(ArtistaSpotify, "artista_spotify", Cantante, datos_artista, favoritos, jsons)
+
+def guardar_canciones(favoritos, jsons):
+    _guardar_resueltos(CancionSpotify, "cancion_spotify", Cancion, datos_cancion, favoritos, jsons)
+
+
+# Artistas/canciones de Spotify (sin repetir) enlazados a los favoritos, para refrescarlos.
+def resueltos(favoritos, campo_favorito):
+    por_id = {}
+    for favorito in favoritos:
+        objeto = getattr(favorito, campo_favorito)
+        if objeto is not None:
+            por_id.setdefault(objeto.spotify_id, objeto)
+    return list(por_id.values())
+
+# Actualiza los artistas/canciones con la información nueva de Spotify ("elementos" en el
+# mismo orden que "objetos") en una sola consulta y los vuelve a enlazar a los favoritos.
+def _actualizar_resueltos(modelo_spotify, campo_favorito, extraer_datos, favoritos, objetos, elementos):
+    ahora = timezone.now()
+    actualizados = {}
+    campos = None
+    for objeto, elemento in zip(objetos, elementos):
+        datos = extraer_datos(elemento)
+        if datos is None:
+            continue # Spotify no lo ha devuelto: se deja la información que había.
+        for campo, valor in datos.items():
+            setattr(objeto, campo, valor)
+        objeto.actualizado = ahora
+        actualizados[objeto.spotify_id] = objeto
+        campos = [campo for campo in datos if campo != "spotify_id"]
+
+    if not actualizados:
+        return
+    modelo_spotify.objects.bulk_update(list(actualizados.values()), campos + ["actualizado"])
+    for favorito in favoritos:
+        objeto = getattr(favorito, campo_favorito)
+        if objeto is not None and objeto.spotify_id in actualizados:
+            setattr(favorito, campo_favorito, actualizados[objeto.spotify_id])
+
+def actualizar_artistas(favoritos, artistas, elementos):
+    _actualizar_resueltos(ArtistaSpotify, "artista_spotify", datos_de_artista, favoritos, artistas, elementos)
+
+def actualizar_canciones(favoritos, canciones, elementos):
+    _actualizar_resueltos(CancionSpotify, "cancion_spotify", datos_de_cancion, favoritos, canciones, elementos)
+
+
+# Respuesta de "artistas_spotify" para un cantante (del catálogo) ya resuelto.
+def info_artista(favorito):
+    artista = favorito.artista_spotify
+    return {
+        "gusto_original": favorito.nombre,
+        "nombre": artista.nombre,
+        "id": artista.spotify_id,
+        "popularidad": artista.popularidad,
+        "seguidores": artista.seguidores,
+        "generos": artista.generos,
+        "spotify_url": artista.spotify_url or None,
+    }
+
+# Respuesta de "canciones_spotify" para una canción (del catálogo) ya resuelta.
+def info_cancion(favorito):
+    canc = favorito.cancion_spotify
+    return {
+        "nombre": favorito.nombre,
+        "nombre_album": canc.nombre_album or None,
+        "tipo_album": canc.tipo_album or None,
+        "cantantes": canc.cantantes,
+        "id": canc.spotify_id,
+        "popularidad": canc.popularidad,
+        "numero_cancion": canc.numero_cancion,
+        "duracion": canc.duracion,
+        "fecha_lanzamiento": canc.fecha_lanzamiento or None,
+        "spotify_url": canc.spotify_url or None,
+    }
@@ -0,0 +1,44 @@
+import json
+from django.conf import settings
+from django.db.models import Prefetch
+from .models import CancionFavorita, CantanteFavorito, Usuario
+
+# ##############################################################################################
+#                                   Exportación en NDJSON
+# ##############################################################################################
+# Un usuario por línea, con sus favoritos:
+#   {"id": 6, "nombre": "Paula", "cantantes_favoritos": ["Adele"], "canciones_favoritas": ["Hello"]}
+#
+# Los usuarios se leen de "chunk_size" en "chunk_size" con QuerySet.iterator(): en memoria
+# solo hay un bloque a la vez (y sus favoritos, que se cargan con 2 consultas por bloque),
+# así que da igual lo grande que sea la tabla y las primeras líneas salen enseguida.
+
+
+# Añade a una consulta de usuarios la carga de sus favoritos (una consulta por cada tipo).
+def con_favoritos(usuarios):
+    return usuarios.prefetch_related(
+        Prefetch("cantantefavorito_set", queryset=CantanteFavorito.objects.select_related("cantante").order_by("id")),
+        Prefetch("cancionfavorita_set", queryset=CancionFavorita.objects.select_related("cancion").order_by("id")),
+    )
+
+# Usuario (con los favoritos ya cargados por "con_favoritos") como diccionario.
+def usuario_con_favoritos(usuario):
+    return {
+        "id": usuario.id,
+        "nombre": usuario.nombre,
+        "cantantes_favoritos": [fav.cantante.nombre for fav in usuario.cantantefavorito_set.all()],
+        "canciones_favoritas": [fav.cancion.nombre for fav in usuario.cancionfavorita_set.all()],
+    }
+
+
+def usuarios_con_favoritos(chunk_size=None):
+    chunk_size = chunk_size or settings.EXPORTACION_CHUNK_SIZE
+    usuarios = con_favoritos(Usuario.objects.order_by("id"))
+    for usuario in usuarios.iterator(chunk_size=chunk_size):
+        yield usuario_con_favoritos(usuario)
+
+
+# Líneas NDJSON (texto, terminadas en "\n").
+def lineas_ndjson(chunk_size=None):
+    for usuario in usuarios_con_favoritos(chunk_size):
+        yield json.dumps(usuario, ensure_ascii=False) + "\n"
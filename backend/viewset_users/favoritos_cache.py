@@ -0,0 +1,125 @@
+import threading
+import time
+from django.core.cache import caches
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .models import CancionFavorita, CantanteFavorito, Usuario
+from .operaciones import nombres_favoritos
+from .signals import favoritos_modificados
+
+# ##############################################################################################
+#                               Caché de las listas de favoritos
+# ##############################################################################################
+# Los favoritos se leen muchas más veces de las que cambian. Los GET de cantantes_favoritos y
+# canciones_favoritas leen la lista de la caché "favoritos" (CACHES en settings) y solo van a
+# la base de datos si no está.
+# 1º Cada entrada guarda la versión del usuario con la que se leyó. Si el usuario ya tiene
+#    otra versión (ha cambiado algo), la entrada está obsoleta y se vuelve a leer. La versión es
+#    aleatoria (models.nueva_version), así que tampoco vale para otro usuario con el mismo ID.
+# 2º Cualquier escritura invalida la lista por señales: "post_save" de los favoritos,
+#    "post_save"/"post_delete" del usuario, "m2m_changed" (usuario.cantantes_favoritos.add...)
+#    y "favoritos_modificados" para las escrituras y borrados en bloque. No hay "post_delete"
+#    de los favoritos: con él, Django ya no borra en bloque (lee cada fila y envía una señal
+#    por fila); al borrar el usuario, su "post_delete" invalida sus dos listas.
+# 3º Se cuentan aciertos, fallos, obsoletas e invalidaciones, y la edad de lo que se sirve
+#    desde la caché, para ver si sirve y lo desactualizada que puede llegar a estar.
+
+
+class CacheFavoritos:
+
+    def __init__(self, alias="favoritos"):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.obsoletas = 0       # Estaban en la caché, pero con una versión anterior del usuario.
+        self.invalidaciones = 0
+        self._edad_total = 0.0   # Segundos que llevaban en la caché las entradas servidas.
+        self.edad_maxima = 0.0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def clave(self, modelo, usuario_id):
+        return f"{modelo._meta.model_name}:{usuario_id}"
+
+    # Lista de nombres favoritos ("modelo": CantanteFavorito o CancionFavorita) del usuario.
+    def leer(self, modelo, usuario):
+        clave = self.clave(modelo, usuario.pk)
+        entrada = self.cache.get(clave)
+        if entrada is not None:
+            version, guardada_en, nombres = entrada
+            if version == usuario.version:
+                edad = time.time() - guardada_en
+                with self._lock:
+                    self.aciertos += 1
+                    self._edad_total += edad
+                    self.edad_maxima = max(self.edad_maxima, edad)
+                return nombres
+        with self._lock:
+            if entrada is None:
+                self.fallos += 1
+            else:
+                self.obsoletas += 1
+
+        nombres = nombres_favoritos(modelo, usuario)
+        self.cache.set(clave, (usuario.version, time.time(), nombres))
+        return nombres
+
+    def invalidar(self, modelo, usuario_ids):
+        claves = [self.clave(modelo, pk) for pk in usuario_ids]
+        if not claves:
+            return
+        self.cache.delete_many(claves)
+        with self._lock:
+            self.invalidaciones += len(claves)
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos + self.obsoletas
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "obsoletas": self.obsoletas,
+                "invalidaciones": self.invalidaciones,
+                "ratio_aciertos": (self.aciertos / consultas) if consultas else 0.0,
+                "edad_media": (self._edad_total / self.aciertos) if self.aciertos else 0.0,
+                "edad_maxima": self.edad_maxima,
+            }
+
+
+# Caché compartida por todas las peticiones del proceso.
+cache_favoritos = CacheFavoritos()
+
+
+# ----------------------------------------------------------------------------------------------
+#                                   Invalidación por señales
+# ----------------------------------------------------------------------------------------------
+@receiver(post_save, sender=CantanteFavorito)
+@receiver(post_save, sender=CancionFavorita)
+def _favorito_guardado(sender, instance, **kwargs):
+    cache_favoritos.invalidar(sender, [instance.usuario_id])
+
+# usuario.cantantes_favoritos.add(...) / .create(...) / .remove(...) / .clear() y al revés
+# (cantante.fans...). "sender" es la tabla intermedia: CantanteFavorito o CancionFavorita.
+@receiver(m2m_changed, sender=CantanteFavorito)
+@receiver(m2m_changed, sender=CancionFavorita)
+def _favoritos_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            cache_favoritos.invalidar(sender, [instance.pk])
+    elif action in ("post_add", "post_remove"):
+        cache_favoritos.invalidar(sender, pk_set)
+    elif action == "pre_clear":
+        cache_favoritos.invalidar(sender, list(instance.fans.values_list("id", flat=True)))
+
+# Usuario nuevo, modificado o eliminado: sus dos listas.
+@receiver([post_save, post_delete], sender=Usuario)
+def _usuario_guardado_o_eliminado(sender, instance, **kwargs):
+    for modelo in (CantanteFavorito, CancionFavorita):
+        cache_favoritos.invalidar(modelo, [instance.pk])
+
+@receiver(favoritos_modificados)
+def _favoritos_modificados_en_bloque(sender, usuario_ids, **kwargs):
+    cache_favoritos.invalidar(sender, usuario_ids)
@@ -0,0 +1,28 @@
+import sys
+from django.core.management.base import BaseCommand
+from viewset_users.exportacion import lineas_ndjson
+
+# ----------------------------------------------------------------------------------------------
+# python manage.py exportar_usuarios > usuarios.ndjson
+# python manage.py exportar_usuarios --salida usuarios.ndjson --chunk-size 5000
+# ----------------------------------------------------------------------------------------------
+class Command(BaseCommand):
+    help = "Exporta los usuarios con sus favoritos en NDJSON (un usuario por línea)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--salida", help="Fichero de salida (por defecto, la salida estándar).")
+        parser.add_argument("--chunk-size", type=int, help="Usuarios que se leen de la base de datos cada vez.")
+
+    def handle(self, *args, **options):
+        total = 0
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as fichero:
+                for linea in lineas_ndjson(options["chunk_size"]):
+                    fichero.write(linea)
+                    total += 1
+            self.stderr.write(f"{total} usuarios exportados en '{options['salida']}'")
+        else:
+            for linea in lineas_ndjson(options["chunk_size"]):
+                self.stdout.write(linea, ending="")
+                total += 1
+            self.stderr.write(f"{total} usuarios exportados")
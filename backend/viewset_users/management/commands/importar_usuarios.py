@@ -0,0 +1,152 @@
+import csv
+import json
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from viewset_users.models import ProgresoImportacion
+from viewset_users.operaciones import crear_usuarios_con_favoritos
+from viewset_users.serializer import FilaImportacionSerializer
+
+# ----------------------------------------------------------------------------------------------
+# python manage.py importar_usuarios usuarios.ndjson
+# python manage.py importar_usuarios usuarios.csv --batch-size 5000 --checkpoint importacion-octubre
+# cat usuarios.ndjson | python manage.py importar_usuarios -
+# ----------------------------------------------------------------------------------------------
+# Formatos (el mismo que genera "exportar_usuarios"):
+# - NDJSON: {"nombre": "Pepe", "cantantes_favoritos": ["Adele"], "canciones_favoritas": ["Hello"]}
+# - CSV:    nombre,cantantes_favoritos,canciones_favoritas
+#           Pepe,Adele|Melendi,Hello
+#
+# 1º El fichero se lee como un stream: en memoria solo hay un bloque de filas.
+# 2º Cada fila se valida con las mismas reglas que la API; las que no son válidas se
+#    indican y se saltan.
+# 3º Cada bloque de "--batch-size" filas se guarda en una transacción (en bloque).
+# 4º Con "--checkpoint <nombre>", en la misma transacción que cada bloque se apunta en la base
+#    de datos (ProgresoImportacion) cuántas filas se han procesado: si la importación se
+#    interrumpe, al volver a lanzarla continúa desde ahí sin repetir ni saltarse ningún bloque.
+# ----------------------------------------------------------------------------------------------
+
+SEPARADOR_CSV = "|" # Separa los favoritos dentro de una columna del CSV.
+
+
+def leer_ndjson(fichero):
+    for numero, linea in enumerate(fichero, start=1):
+        if not linea.strip():
+            continue
+        try:
+            yield numero, json.loads(linea)
+        except ValueError:
+            yield numero, None
+
+def leer_csv(fichero):
+    for numero, fila in enumerate(csv.DictReader(fichero), start=2): # La línea 1 es la cabecera.
+        yield numero, {
+            "nombre": fila.get("nombre"),
+            "cantantes_favoritos": [v for v in (fila.get("cantantes_favoritos") or "").split(SEPARADOR_CSV) if v],
+            "canciones_favoritas": [v for v in (fila.get("canciones_favoritas") or "").split(SEPARADOR_CSV) if v],
+        }
+
+
+class Command(BaseCommand):
+    help = "Importa usuarios con sus favoritos desde un fichero NDJSON o CSV (o desde la entrada estándar)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("fichero", help="Fichero a importar ('-' para la entrada estándar).")
+        parser.add_argument("--formato", choices=["ndjson", "csv"],
+                            help="Formato del fichero (por defecto, según la extensión; NDJSON para '-').")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Filas que se guardan en cada transacción.")
+        parser.add_argument("--checkpoint", help="Nombre con el que se guarda el progreso en la base de datos para poder continuar.")
+
+    def handle(self, *args, **options):
+        ruta = options["fichero"]
+        formato = options["formato"] or ("csv" if ruta.lower().endswith(".csv") else "ndjson")
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size debe ser mayor que 0")
+
+        # 1. ¿Se continúa una importación anterior?
+        checkpoint = options["checkpoint"]
+        progreso = self._leer_checkpoint(checkpoint, ruta)
+        ya_procesadas = progreso.filas if progreso else 0
+        if ya_procesadas:
+            self.stderr.write(f"Se continúa desde la fila {ya_procesadas + 1} (checkpoint '{checkpoint}')")
+
+        if ruta == "-":
+            fichero = sys.stdin
+        else:
+            try:
+                fichero = open(ruta, encoding="utf-8", newline="")
+            except OSError as error:
+                raise CommandError(f"No se puede abrir '{ruta}': {error}")
+
+        lector = leer_csv if formato == "csv" else leer_ndjson
+        inicio = time.monotonic()
+        procesadas = ya_procesadas
+        importadas = 0
+        invalidas = 0
+        bloque = []
+
+        try:
+            for indice, (numero, fila) in enumerate(lector(fichero)):
+                if indice < ya_procesadas:
+                    continue # Ya se importó antes de la interrupción.
+                bloque.append((numero, fila))
+                if len(bloque) >= batch_size:
+                    guardadas, erroneas = self._guardar_bloque(bloque, batch_size, progreso)
+                    importadas += guardadas
+                    invalidas += erroneas
+                    procesadas += len(bloque)
+                    bloque = []
+                    self._informar(importadas, invalidas, inicio)
+            if bloque:
+                guardadas, erroneas = self._guardar_bloque(bloque, batch_size, progreso)
+                importadas += guardadas
+                invalidas += erroneas
+                procesadas += len(bloque)
+        finally:
+            if fichero is not sys.stdin:
+                fichero.close()
+
+        self._informar(importadas, invalidas, inicio)
+        self.stdout.write(f"{importadas} usuarios importados ({invalidas} filas no válidas)")
+
+    # Valida un bloque de filas y guarda las válidas y el progreso en una sola transacción.
+    def _guardar_bloque(self, bloque, batch_size, progreso=None):
+        datos = [fila if isinstance(fila, dict) else {} for _, fila in bloque]
+        serializer = FilaImportacionSerializer(data=datos, many=True)
+        if serializer.is_valid():
+            validas = serializer.validated_data
+        else:
+            # Se guardan las válidas y se indican las demás.
+            validas = []
+            for (numero, fila), errores in zip(bloque, serializer.errors):
+                if errores or not isinstance(fila, dict):
+                    self.stderr.write(f"Fila {numero} no válida: {errores or 'no es un objeto JSON'}")
+                else:
+                    validas.append(FilaImportacionSerializer().to_internal_value(fila))
+        with transaction.atomic():
+            if validas:
+                crear_usuarios_con_favoritos(validas, batch_size)
+            if progreso is not None:
+                progreso.filas += len(bloque)
+                progreso.save(update_fields=["filas"])
+        return len(validas), len(bloque) - len(validas)
+
+    def _informar(self, importadas, invalidas, inicio):
+        segundos = max(time.monotonic() - inicio, 1e-9)
+        self.stderr.write(
+            f"{importadas} usuarios importados, {invalidas} no válidos "
+            f"({importadas / segundos:.0f} filas/s)"
+        )
+
+    # ------------------------------------------------------------------------------------------
+    # Checkpoint: una fila de ProgresoImportacion por nombre (fichero que se importa + filas).
+    # ------------------------------------------------------------------------------------------
+    def _leer_checkpoint(self, checkpoint, ruta):
+        if not checkpoint:
+            return None
+        progreso, _ = ProgresoImportacion.objects.get_or_create(nombre=checkpoint, defaults={"fichero": ruta})
+        if progreso.fichero != ruta:
+            raise CommandError(f"El checkpoint '{checkpoint}' es de otro fichero ('{progreso.fichero}')")
+        return progreso
@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-17 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewset_users', '0002_cancionfavorita_cantantefavorito_usuario_delete_user_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtistaSpotify',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spotify_id', models.CharField(max_length=64, unique=True)),
+                ('nombre', models.CharField(max_length=255)),
+                ('popularidad', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('seguidores', models.PositiveIntegerField(blank=True, null=True)),
+                ('generos', models.JSONField(blank=True, default=list)),
+                ('spotify_url', models.URLField(blank=True, default='', max_length=500)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CancionSpotify',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spotify_id', models.CharField(max_length=64, unique=True)),
+                ('nombre', models.CharField(max_length=255)),
+                ('nombre_album', models.CharField(blank=True, default='', max_length=255)),
+                ('tipo_album', models.CharField(blank=True, default='', max_length=32)),
+                ('cantantes', models.JSONField(blank=True, default=list)),
+                ('popularidad', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('numero_cancion', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('duracion', models.PositiveIntegerField(blank=True, null=True)),
+                ('fecha_lanzamiento', models.CharField(blank=True, default='', max_length=10)),
+                ('spotify_url', models.URLField(blank=True, default='', max_length=500)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='cancionfavorita',
+            unique_together={('usuario', 'nombre')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='cantantefavorito',
+            unique_together={('usuario', 'nombre')},
+        ),
+        migrations.AddField(
+            model_name='cantantefavorito',
+            name='artista_spotify',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='viewset_users.artistaspotify'),
+        ),
+        migrations.AddField(
+            model_name='cancionfavorita',
+            name='cancion_spotify',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='viewset_users.cancionspotify'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-17 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewset_users', '0003_artistaspotify_cancionspotify_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['nombre', 'id'], name='usuario_nombre_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-17 19:20
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewset_users', '0004_usuario_nombre_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cancionfavorita',
+            index=models.Index(fields=['usuario', 'id'], name='cancionfav_usuario_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cantantefavorito',
+            index=models.Index(fields=['usuario', 'id'], name='cantantefav_usuario_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(django.db.models.functions.text.Lower('nombre'), name='usuario_nombre_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,160 @@
+# Generated by Django 6.0 on 2026-10-17 19:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# (favorito, catálogo, campo del favorito, campo de Spotify)
+RELACIONES = [
+    ("CantanteFavorito", "Cantante", "cantante", "artista_spotify"),
+    ("CancionFavorita", "Cancion", "cancion", "cancion_spotify"),
+]
+
+
+# El catálogo distingue los nombres exactamente ("Rosalía" y "rosalía" son dos filas), igual
+# que el código que lo consulta. En MySQL la colación por defecto no distingue mayúsculas, así
+# que se fija una binaria; SQLite ya compara en binario.
+def colacion_binaria(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    for tabla in ("viewset_users_cantante", "viewset_users_cancion"):
+        schema_editor.execute(
+            f"ALTER TABLE {tabla} MODIFY nombre VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL"
+        )
+
+
+# Se crea una fila del catálogo por cada nombre distinto y se enlazan los favoritos a ella.
+# Si algún favorito ya estaba resuelto en Spotify, el catálogo se queda con ese resultado.
+def llenar_catalogo(apps, schema_editor):
+    for nombre_favorito, nombre_catalogo, campo, campo_spotify in RELACIONES:
+        Favorito = apps.get_model("viewset_users", nombre_favorito)
+        Catalogo = apps.get_model("viewset_users", nombre_catalogo)
+
+        spotify_por_nombre = {}
+        for nombre, spotify_id in Favorito.objects.order_by("id").values_list("nombre", f"{campo_spotify}_id"):
+            if spotify_por_nombre.get(nombre) is None:
+                spotify_por_nombre[nombre] = spotify_id
+        Catalogo.objects.bulk_create(
+            [Catalogo(nombre=nombre, **{f"{campo_spotify}_id": spotify_id})
+             for nombre, spotify_id in spotify_por_nombre.items()],
+            batch_size=500,
+        )
+
+        ids = dict(Catalogo.objects.values_list("nombre", "id"))
+        favoritos = list(Favorito.objects.only("id", "nombre"))
+        for favorito in favoritos:
+            setattr(favorito, f"{campo}_id", ids[favorito.nombre])
+        Favorito.objects.bulk_update(favoritos, [campo], batch_size=500)
+
+
+# Vuelta atrás: cada favorito recupera su copia del nombre y del resultado de Spotify.
+def vaciar_catalogo(apps, schema_editor):
+    for nombre_favorito, nombre_catalogo, campo, campo_spotify in RELACIONES:
+        Favorito = apps.get_model("viewset_users", nombre_favorito)
+        favoritos = list(Favorito.objects.select_related(campo))
+        for favorito in favoritos:
+            catalogo = getattr(favorito, campo)
+            favorito.nombre = catalogo.nombre
+            setattr(favorito, f"{campo_spotify}_id", getattr(catalogo, f"{campo_spotify}_id"))
+        Favorito.objects.bulk_update(favoritos, ["nombre", campo_spotify], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewset_users', '0005_indices_favoritos_y_nombre'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cantante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255, unique=True)),
+                ('artista_spotify', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='viewset_users.artistaspotify')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Cancion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255, unique=True)),
+                ('cancion_spotify', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='viewset_users.cancionspotify')),
+            ],
+        ),
+        migrations.RunPython(colacion_binaria, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='cantantefavorito',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cancionfavorita',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='cantantefavorito',
+            name='cantante',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='favoritos', to='viewset_users.cantante'),
+        ),
+        migrations.AddField(
+            model_name='cancionfavorita',
+            name='cancion',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='favoritas', to='viewset_users.cancion'),
+        ),
+        migrations.RunPython(llenar_catalogo, vaciar_catalogo),
+        # Con valor por defecto para poder volver atrás (se vuelven a rellenar en vaciar_catalogo).
+        migrations.AlterField(
+            model_name='cantantefavorito',
+            name='nombre',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='cancionfavorita',
+            name='nombre',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RemoveField(
+            model_name='cantantefavorito',
+            name='nombre',
+        ),
+        migrations.RemoveField(
+            model_name='cantantefavorito',
+            name='artista_spotify',
+        ),
+        migrations.RemoveField(
+            model_name='cancionfavorita',
+            name='nombre',
+        ),
+        migrations.RemoveField(
+            model_name='cancionfavorita',
+            name='cancion_spotify',
+        ),
+        migrations.AlterField(
+            model_name='cantantefavorito',
+            name='cantante',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favoritos', to='viewset_users.cantante'),
+        ),
+        migrations.AlterField(
+            model_name='cancionfavorita',
+            name='cancion',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favoritas', to='viewset_users.cancion'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cantantefavorito',
+            unique_together={('usuario', 'cantante')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='cancionfavorita',
+            unique_together={('usuario', 'cancion')},
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='cantantes_favoritos',
+            field=models.ManyToManyField(related_name='fans', through='viewset_users.CantanteFavorito', to='viewset_users.cantante'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='canciones_favoritas',
+            field=models.ManyToManyField(related_name='fans', through='viewset_users.CancionFavorita', to='viewset_users.cancion'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-17 20:30
+
+from django.db import migrations, models
+import viewset_users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewset_users', '0006_catalogo_cantantes_canciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='version',
+            field=models.CharField(default=viewset_users.models.nueva_version, max_length=32),
+        ),
+    ]
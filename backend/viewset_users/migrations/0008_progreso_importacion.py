@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewset_users', '0007_usuario_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgresoImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255, unique=True)),
+                ('fichero', models.CharField(max_length=1024)),
+                ('filas', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
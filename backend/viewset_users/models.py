@@ -1,8 +1,23 @@
+import uuid
 from django.db import models
+from django.db.models.functions import Lower
+
+
+# Versión nueva de un usuario: un valor aleatorio, no un contador. Así no se repite aunque se
+# borre el usuario y su ID se reutilice (SQLite vuelve a dar el último ID) y las cachés de otros
+# workers o el ETag que guarda un cliente no pueden confundir al usuario nuevo con el anterior.
+def nueva_version():
+    return uuid.uuid4().hex
 
 # Create your models here.
 class Usuario(models.Model):
     nombre = models.CharField(max_length=255)
+    # Cambia en cada escritura del usuario o de sus favoritos (ver operaciones.py).
+    # Con ella se construye el ETag de los GET: si no cambia, se responde 304 sin leer los favoritos.
+    version = models.CharField(max_length=32, default=nueva_version)
+    # Favoritos del usuario (las tablas intermedias son CantanteFavorito y CancionFavorita).
+    cantantes_favoritos = models.ManyToManyField("Cantante", through="CantanteFavorito", related_name="fans")
+    canciones_favoritas = models.ManyToManyField("Cancion", through="CancionFavorita", related_name="fans")
 
     def __str__(self): # Printar los usuarios
         return self.username
@@ -11,23 +26,106 @@ class Usuario(models.Model):
         # Podemos añadir subcomportamientos 
         # Cuando me devuelva la información el modelo, los últimos nombres añadidos, aparezcan al principio
         ordering = ['nombre']
+        indexes = [
+            # Paginación por cursor: ORDER BY nombre, id (ver pagination.py)
+            models.Index(fields=["nombre", "id"], name="usuario_nombre_id_idx"),
+            # Búsqueda por nombre sin distinguir mayúsculas: /users/?nombre=paula
+            models.Index(Lower("nombre"), name="usuario_nombre_lower_idx"),
+        ]
+
+# Artista de Spotify ya resuelto: se guarda la información para no volver a buscarlo.
+class ArtistaSpotify(models.Model):
+    spotify_id = models.CharField(max_length=64, unique=True)
+    nombre = models.CharField(max_length=255)
+    popularidad = models.PositiveSmallIntegerField(null=True, blank=True)
+    seguidores = models.PositiveIntegerField(null=True, blank=True)
+    generos = models.JSONField(default=list, blank=True)
+    spotify_url = models.URLField(max_length=500, blank=True, default="")
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self): # Printar los artistas de Spotify
+        return f"{self.spotify_id} - {self.nombre}"
+
+# Canción de Spotify ya resuelta: se guarda la información para no volver a buscarla.
+class CancionSpotify(models.Model):
+    spotify_id = models.CharField(max_length=64, unique=True)
+    nombre = models.CharField(max_length=255)
+    nombre_album = models.CharField(max_length=255, blank=True, default="")
+    tipo_album = models.CharField(max_length=32, blank=True, default="")
+    cantantes = models.JSONField(default=list, blank=True)
+    popularidad = models.PositiveSmallIntegerField(null=True, blank=True)
+    numero_cancion = models.PositiveSmallIntegerField(null=True, blank=True)
+    duracion = models.PositiveIntegerField(null=True, blank=True) # Milisegundos
+    fecha_lanzamiento = models.CharField(max_length=10, blank=True, default="") # "2017", "2017-03" o "2017-03-03"
+    spotify_url = models.URLField(max_length=500, blank=True, default="")
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self): # Printar las canciones de Spotify
+        return f"{self.spotify_id} - {self.nombre}"
+
+# ##############################################################################################
+#                                   Catálogo de cantantes y canciones
+# ##############################################################################################
+# Cada cantante/canción se guarda una sola vez (aunque lo tengan muchos usuarios) y los
+# favoritos son solo la relación usuario <-> cantante/canción. Así se puede saber quién
+# tiene un cantante como favorito con una búsqueda por índice:
+#     Cantante.objects.get(nombre="Adele").fans.all()
+
+class Cantante(models.Model):
+    # Distingue mayúsculas y acentos (colación binaria en MySQL, ver la migración 0006).
+    nombre = models.CharField(max_length=255, unique=True)
+    # Artista de Spotify que corresponde a "nombre" (vacío hasta que se busca en Spotify).
+    artista_spotify = models.ForeignKey(ArtistaSpotify, null=True, blank=True, on_delete=models.SET_NULL)
+
+    def __str__(self): # Printar los cantantes
+        return self.nombre
+
+class Cancion(models.Model):
+    # Distingue mayúsculas y acentos (colación binaria en MySQL, ver la migración 0006).
+    nombre = models.CharField(max_length=255, unique=True)
+    # Canción de Spotify que corresponde a "nombre" (vacía hasta que se busca en Spotify).
+    cancion_spotify = models.ForeignKey(CancionSpotify, null=True, blank=True, on_delete=models.SET_NULL)
+
+    def __str__(self): # Printar las canciones
+        return self.nombre
 
 class CantanteFavorito(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
-    nombre = models.CharField(max_length=255)
+    cantante = models.ForeignKey(Cantante, on_delete=models.CASCADE, related_name="favoritos")
     class Meta:
-        unique_together = ("usuario", "nombre")
+        unique_together = ("usuario", "cantante")
+        # unique_together ya crea el índice (usuario, cantante) para buscar un favorito concreto.
+        # Este sirve para leer los favoritos de un usuario en orden (ORDER BY id) sin ordenar.
+        indexes = [
+            models.Index(fields=["usuario", "id"], name="cantantefav_usuario_id_idx"),
+        ]
         
     def __str__(self): # Printar los cantantes favoritos
-        return f"{self.usuario_id} - {self.nombre}"
+        return f"{self.usuario_id} - {self.cantante_id}"
 
 class CancionFavorita(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
-    nombre = models.CharField(max_length=255)
+    cancion = models.ForeignKey(Cancion, on_delete=models.CASCADE, related_name="favoritas")
     class Meta:
-        unique_together = ("usuario", "nombre")
+        unique_together = ("usuario", "cancion")
+        # unique_together ya crea el índice (usuario, cancion) para buscar un favorito concreto.
+        # Este sirve para leer los favoritos de un usuario en orden (ORDER BY id) sin ordenar.
+        indexes = [
+            models.Index(fields=["usuario", "id"], name="cancionfav_usuario_id_idx"),
+        ]
 
     def __str__(self): # Printar las canciones favoritas
-        return f"{self.usuario_id} - {self.nombre}"
+        return f"{self.usuario_id} - {self.cancion_id}"
+
+# Progreso de "importar_usuarios --checkpoint <nombre>": cuántas filas del fichero se han
+# procesado. Se guarda en la misma transacción que cada bloque, así que nunca indica un bloque
+# que no se ha guardado ni se olvida de uno que sí.
+class ProgresoImportacion(models.Model):
+    nombre = models.CharField(max_length=255, unique=True)
+    fichero = models.CharField(max_length=1024)
+    filas = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.fichero}): {self.filas} filas"
 
 #Serializers obtener información más sencilla del modelo.
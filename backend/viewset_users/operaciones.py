@@ -0,0 +1,187 @@
+from django.conf import settings
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import Max
+from .models import Cancion, CancionFavorita, Cantante, CantanteFavorito, Usuario, nueva_version
+from .signals import favoritos_modificados
+
+# ##############################################################################################
+#                                   Escrituras en bloque
+# ##############################################################################################
+# Operaciones que escriben muchas filas a la vez. Cada una se hace dentro de una única
+# transacción: o se guarda todo o no se guarda nada.
+
+
+# Crea un usuario por cada nombre y devuelve sus IDs en el mismo orden.
+# - Se insertan de "batch_size" en "batch_size" (USUARIOS_BULK_BATCH_SIZE en settings).
+# - Si la base de datos no devuelve los IDs de un INSERT múltiple (p. ej. MySQL), se insertan
+#   igualmente en bloque y los IDs se leen después, dentro de la misma transacción: son los
+#   mayores que el último ID que había antes de insertar.
+def crear_usuarios(nombres, batch_size=None):
+    batch_size = batch_size or settings.USUARIOS_BULK_BATCH_SIZE
+    alias = router.db_for_write(Usuario)
+    usuarios = Usuario.objects.using(alias)
+    with transaction.atomic(using=alias):
+        if connections[alias].features.can_return_rows_from_bulk_insert:
+            creados = usuarios.bulk_create([Usuario(nombre=nombre) for nombre in nombres], batch_size=batch_size)
+            ids = [usuario.id for usuario in creados]
+        else:
+            ultimo_id = usuarios.aggregate(ultimo=Max("id"))["ultimo"] or 0
+            usuarios.bulk_create([Usuario(nombre=nombre) for nombre in nombres], batch_size=batch_size)
+            filas = list(usuarios.filter(id__gt=ultimo_id).order_by("id").values_list("id", "nombre"))
+            # Si se cuela algún usuario de otra transacción, no se puede saber cuáles son los nuestros.
+            if [nombre for _, nombre in filas] != list(nombres):
+                raise DatabaseError("No se han podido leer los IDs de los usuarios creados")
+            ids = [pk for pk, _ in filas]
+    # Por si algún ID se reutiliza, no deben quedar en la caché listas de un usuario anterior.
+    for modelo in (CantanteFavorito, CancionFavorita):
+        favoritos_modificados.send(sender=modelo, usuario_ids=ids)
+    return ids
+
+
+# Cada escritura sobre un usuario o sus favoritos le da una versión nueva (ETag de los GET).
+def cambiar_version(usuario):
+    Usuario.objects.filter(pk=usuario.pk).update(version=nueva_version())
+
+
+# Tabla de favoritos -> (catálogo, campo que apunta al catálogo)
+CATALOGOS = {
+    CantanteFavorito: (Cantante, "cantante"),
+    CancionFavorita: (Cancion, "cancion"),
+}
+
+
+# Nombres de los favoritos de un usuario, en el orden en que se añadieron.
+def nombres_favoritos(modelo, usuario):
+    campo = CATALOGOS[modelo][1]
+    return list(
+        modelo.objects.filter(usuario=usuario).order_by("id").values_list(f"{campo}__nombre", flat=True)
+    )
+
+
+# IDs del catálogo para "nombres" ({nombre: id}); se crean los que todavía no existen.
+# Son dos consultas (INSERT en bloque + SELECT) sin importar cuántos nombres haya
+#   (con muchos nombres, el SELECT se hace por bloques para no pasar del límite de parámetros).
+def ids_del_catalogo(catalogo, nombres, batch_size=500):
+    if not nombres:
+        return {}
+    catalogo.objects.bulk_create([catalogo(nombre=nombre) for nombre in nombres], ignore_conflicts=True, batch_size=batch_size)
+    ids = {}
+    for inicio in range(0, len(nombres), batch_size):
+        bloque = nombres[inicio:inicio + batch_size]
+        ids.update(catalogo.objects.filter(nombre__in=bloque).values_list("nombre", "id"))
+    return ids
+
+
+# Enlaza al usuario con los nombres del catálogo (ya sabiendo que no los tiene).
+def _enlazar(modelo, usuario, nombres):
+    catalogo, campo = CATALOGOS[modelo]
+    ids = ids_del_catalogo(catalogo, nombres)
+    modelo.objects.bulk_create(
+        [modelo(usuario=usuario, **{f"{campo}_id": ids[nombre]}) for nombre in nombres],
+        ignore_conflicts=True,
+    )
+    favoritos_modificados.send(sender=modelo, usuario_ids=[usuario.pk])
+
+
+# Quita favoritos al usuario con un solo DELETE (sin señales por fila, ver favoritos_cache.py).
+def _desenlazar(modelo, usuario, **filtro):
+    borrados, _ = modelo.objects.filter(usuario=usuario, **filtro).delete()
+    if borrados:
+        favoritos_modificados.send(sender=modelo, usuario_ids=[usuario.pk])
+    return borrados
+
+
+# Añade a un usuario los favoritos ("modelo": CantanteFavorito o CancionFavorita) que todavía
+# no tiene. Devuelve (agregados, existentes, lista_final) sin volver a leer la tabla.
+# - Una consulta para los que ya tiene, dos para el catálogo y un INSERT en bloque.
+# - "ignore_conflicts": si otra petición añade el mismo favorito a la vez, no hay IntegrityError.
+def anyadir_favoritos(modelo, usuario, nombres):
+    with transaction.atomic():
+        # 1. Favoritos que ya tiene el usuario (en el orden en que se añadieron).
+        lista_final = nombres_favoritos(modelo, usuario)
+        ya_estan = set(lista_final)
+
+        # 2. Nuevos y repetidos (un nombre repetido en la propia lista solo se añade una vez).
+        agregados = []
+        existentes = []
+        for nombre in nombres:
+            if nombre in ya_estan:
+                existentes.append(nombre)
+            else:
+                agregados.append(nombre)
+                ya_estan.add(nombre)
+
+        # 3. Se insertan todos los nuevos de una vez.
+        if agregados:
+            _enlazar(modelo, usuario, agregados)
+            cambiar_version(usuario)
+    return agregados, existentes, lista_final + agregados
+
+
+# Reemplaza los favoritos de un usuario por "nombres" tocando solo lo que cambia:
+# un DELETE en bloque para los que sobran y un INSERT en bloque para los que faltan.
+# Los que se mantienen conservan su fila (y su ID), y nadie ve la lista vacía a medias.
+# Devuelve la lista final sin volver a leer la tabla.
+def reemplazar_favoritos(modelo, usuario, nombres):
+    campo = CATALOGOS[modelo][1]
+    nuevos = list(dict.fromkeys(nombres)) # Sin repetidos, en el orden recibido.
+    with transaction.atomic():
+        # Dos PUT a la vez sobre el mismo usuario se hacen uno detrás de otro.
+        list(Usuario.objects.select_for_update().filter(pk=usuario.pk).values_list("pk", flat=True))
+        actuales = list(
+            modelo.objects.filter(usuario=usuario).order_by("id").values_list("id", f"{campo}__nombre")
+        )
+        quedan = set(nuevos)
+        sobran = [pk for pk, nombre in actuales if nombre not in quedan]
+        ya_estan = {nombre for _, nombre in actuales}
+        faltan = [nombre for nombre in nuevos if nombre not in ya_estan]
+
+        if sobran:
+            _desenlazar(modelo, usuario, pk__in=sobran)
+        if faltan:
+            _enlazar(modelo, usuario, faltan)
+        if sobran or faltan:
+            cambiar_version(usuario)
+    return nuevos # En el orden del cuerpo de la petición.
+
+
+# Quita un favorito al usuario. Devuelve False si no lo tenía.
+def eliminar_favorito(modelo, usuario, nombre):
+    campo = CATALOGOS[modelo][1]
+    with transaction.atomic():
+        borrados = _desenlazar(modelo, usuario, **{f"{campo}__nombre": nombre})
+        if not borrados:
+            return False
+        cambiar_version(usuario)
+    return True
+
+
+# Actualiza los datos del usuario (serializer ya validado) y le da una versión nueva.
+def actualizar_usuario(serializer):
+    with transaction.atomic():
+        usuario = serializer.save()
+        cambiar_version(usuario)
+    return usuario
+
+
+# Crea usuarios con sus favoritos ("filas" ya validadas con FilaImportacionSerializer) en una
+# sola transacción y devuelve sus IDs. El número de consultas no depende de cuántas filas
+# haya: usuarios, catálogo y favoritos se insertan en bloque.
+def crear_usuarios_con_favoritos(filas, batch_size=None):
+    with transaction.atomic():
+        ids = crear_usuarios([fila["nombre"] for fila in filas], batch_size)
+        for modelo, clave in ((CantanteFavorito, "cantantes_favoritos"), (CancionFavorita, "canciones_favoritas")):
+            catalogo, campo = CATALOGOS[modelo]
+            nombres = list(dict.fromkeys(nombre for fila in filas for nombre in fila.get(clave, [])))
+            ids_catalogo = ids_del_catalogo(catalogo, nombres)
+            modelo.objects.bulk_create(
+                [
+                    modelo(usuario_id=pk, **{f"{campo}_id": ids_catalogo[nombre]})
+                    for pk, fila in zip(ids, filas)
+                    for nombre in dict.fromkeys(fila.get(clave, []))
+                ],
+                batch_size=batch_size or settings.USUARIOS_BULK_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            favoritos_modificados.send(sender=modelo, usuario_ids=ids)
+    return ids
@@ -0,0 +1,80 @@
+import base64
+import json
+from django.conf import settings
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+# ##############################################################################################
+#                               Paginación por cursor (keyset)
+# ##############################################################################################
+# Los usuarios se recorren en orden (nombre, id). En lugar de "OFFSET", cada página empieza
+# justo después del último usuario de la anterior:
+#     WHERE nombre > 'Paula' OR (nombre = 'Paula' AND id > 7) ORDER BY nombre, id LIMIT n
+# Con el índice (nombre, id) cualquier página cuesta lo mismo que la primera.
+#
+# ?page_size=<n>  --> usuarios por página (USUARIOS_PAGE_SIZE, como mucho USUARIOS_PAGE_SIZE_MAX)
+# ?cursor=<...>   --> valor de "next" de la página anterior (opaco para el cliente)
+#
+# {
+#  "users": [ {"id": 6, "nombre": "Jasmine"}, {"id": 7, "nombre": "Paula"} ],
+#  "next": "WyJQYXVsYSIsIDdd"      <-- null en la última página
+# }
+
+
+def codificar_cursor(nombre, pk):
+    return base64.urlsafe_b64encode(json.dumps([nombre, pk]).encode()).decode()
+
+def decodificar_cursor(cursor):
+    try:
+        nombre, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(nombre, str) or not isinstance(pk, int):
+            raise ValueError
+        return nombre, pk
+    except (ValueError, TypeError):
+        raise ParseError({"message": "El parámetro 'cursor' no es válido"})
+
+
+class PaginacionUsuarios(BasePagination):
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get("page_size")
+        if page_size is None:
+            return settings.USUARIOS_PAGE_SIZE
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            raise ParseError({"message": "El parámetro 'page_size' debe ser un número"})
+        if page_size < 1:
+            raise ParseError({"message": "El parámetro 'page_size' debe ser mayor que 0"})
+        return min(page_size, settings.USUARIOS_PAGE_SIZE_MAX)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by("nombre", "id")
+
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            nombre, pk = decodificar_cursor(cursor)
+            queryset = queryset.filter(Q(nombre__gt=nombre) | Q(nombre=nombre, id__gt=pk))
+
+        # Se pide uno más para saber si hay página siguiente.
+        usuarios = list(queryset[:page_size + 1])
+        self.next = None
+        if len(usuarios) > page_size:
+            usuarios = usuarios[:page_size]
+            self.next = codificar_cursor(*self.clave_cursor(usuarios[-1]))
+        return usuarios
+
+    # (nombre, id) del último usuario de la página: un Usuario o una fila (id, nombre) de
+    # values_list("id", "nombre"), que es lo que usa UsuarioViewSet.list.
+    def clave_cursor(self, usuario):
+        if isinstance(usuario, tuple):
+            pk, nombre = usuario
+            return nombre, pk
+        return usuario.nombre, usuario.id
+
+    def get_paginated_response(self, data):
+        return Response({"users": data, "next": self.next}, status=status.HTTP_200_OK)
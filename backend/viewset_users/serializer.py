@@ -28,6 +28,12 @@ class UsuarioSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("El campo 'nombre' es obligatorio.")
         return value 
 
+# Lectura rápida de muchos usuarios (GET /users/): las filas son tuplas de
+# values_list("id", "nombre"), así que no se crea un Usuario por fila ni se pasa por cada campo
+# del serializer. Devuelve lo mismo que UsuarioSerializer(usuarios, many=True).data.
+def usuarios_a_json(filas):
+    return [{"id": pk, "nombre": nombre} for pk, nombre in filas]
+
 # ListaUsuariosSerializer: comprueba un CONJUNTO de usuarios
 # {
 #   "users": [
@@ -71,4 +77,15 @@ class CancionesFavoritasSerializer(serializers.Serializer):
                 "Se debe enviar una lista 'canciones_favoritas' con canciones"
             )
         return value
-        
\ No newline at end of file
+        
+
+
+# FilaImportacionSerializer: comprueba una fila de "importar_usuarios" con las mismas reglas
+# que UsuarioSerializer y los serializers de favoritos.
+# { "nombre": "Pepe", "cantantes_favoritos": ["Adele"], "canciones_favoritas": ["Hello"] }
+class FilaImportacionSerializer(serializers.Serializer):
+    nombre = serializers.CharField(max_length=255)
+    cantantes_favoritos = serializers.ListField(child=serializers.CharField(max_length=255), required=False, default=list)
+    canciones_favoritas = serializers.ListField(child=serializers.CharField(max_length=255), required=False, default=list)
+
+    validate_nombre = UsuarioSerializer.validate_nombre
@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+# Se envía tras las escrituras en bloque de favoritos (bulk_create no envía "post_save" y los
+# DELETE en bloque no envían "post_delete" por fila).
+#     favoritos_modificados.send(sender=CantanteFavorito, usuario_ids=[7, 8])
+# La recibe la caché de favoritos (favoritos_cache.py) para invalidar las listas de esos usuarios.
+favoritos_modificados = Signal()
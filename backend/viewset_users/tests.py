@@ -5,7 +5,7 @@ from django.test import TestCase
 # Create your tests here.
 import pytest
 from rest_framework.test import APIClient
-from viewset_users.models import CancionFavorita, CantanteFavorito, Usuario
+from viewset_users.models import Cancion, CancionFavorita, Cantante, CantanteFavorito, Usuario
 
 pytestmark = pytest.mark.django_db
 
@@ -37,6 +37,47 @@ def test_get_usuarios_devuelve_usuarios_y_devuelve_200():
     assert isinstance(data["users"], list) # Es una lista
     assert len(data["users"]) == 2 # El tamaño de la lista sea "2"
 
+#-------------------------------------------------------------------------------------------
+#                   TEST_GET_USUARIOS_PAGINA_CON_CURSOR_POR_NOMBRE_E_ID
+# Se comprueba que la lista de usuarios se recorre por páginas con el cursor "next", sin
+# repetir ni saltarse usuarios (aunque tengan el mismo nombre).
+#-------------------------------------------------------------------------------------------
+def test_get_usuarios_pagina_con_cursor_por_nombre_e_id():
+    for nombre in ["Paula", "Ana", "Paula", "Luis", "Ana"]:
+        Usuario.objects.create(nombre=nombre)
+    client = APIClient()
+
+    paginas = []
+    url = "/viewset/users/?page_size=2"
+    while url:
+        data = client.get(url).json()
+        paginas.append(data["users"])
+        url = f"/viewset/users/?page_size=2&cursor={data['next']}" if data["next"] else None
+
+    # Se verifica...
+    assert [len(pagina) for pagina in paginas] == [2, 2, 1]
+    usuarios = [(u["nombre"], u["id"]) for pagina in paginas for u in pagina]
+    assert usuarios == sorted(Usuario.objects.values_list("nombre", "id"))
+    assert client.get("/viewset/users/?cursor=no-valido").status_code == 400
+
+#-------------------------------------------------------------------------------------------
+#                   TEST_GET_USUARIOS_DEVUELVE_LO_MISMO_QUE_EL_SERIALIZER
+# Se comprueba que la lista (leída con values_list, sin crear un Usuario por fila) es
+# exactamente la que daría UsuarioSerializer.
+#-------------------------------------------------------------------------------------------
+def test_get_usuarios_devuelve_lo_mismo_que_el_serializer():
+    from viewset_users.serializer import UsuarioSerializer
+
+    for nombre in ["Paula", "Ana ñ", "  Luis  "]:
+        Usuario.objects.create(nombre=nombre)
+
+    respuesta = APIClient().get("/viewset/users/")
+
+    # Se verifica...
+    esperado = UsuarioSerializer(Usuario.objects.order_by("nombre", "id"), many=True).data
+    assert respuesta.json()["users"] == esperado
+    assert respuesta.content.startswith(b'{"users":[{"id":') # Mismo orden de campos.
+
 #-------------------------------------------------------------------------------------------
 #                           TEST_POST_USUARIOS_CREA_USUARIOS_Y_DEVUELVE_IDS:
 # Se comprueba que se añadan usuarios y devuelva correctamenete la información.
@@ -77,6 +118,48 @@ def test_post_usuarios_sin_usuarios_y_devuelve_400():
     # Se verifica
     assert respuesta.status_code == 400
 
+#-------------------------------------------------------------------------------------------
+#                   TEST_POST_USUARIOS_INSERTA_EN_BLOQUES_Y_CONSERVA_EL_ORDEN
+# Se comprueba que muchos usuarios se insertan en bloques (no una consulta por usuario) y
+# que los IDs se devuelven en el mismo orden que los nombres.
+#-------------------------------------------------------------------------------------------
+def test_post_usuarios_inserta_en_bloques_y_conserva_el_orden(settings, django_assert_max_num_queries):
+    settings.USUARIOS_BULK_BATCH_SIZE = 100
+    client = APIClient()
+    nombres = [f"Usuario {i}" for i in range(250)]
+    payload = {"users": [{"nombre": nombre} for nombre in nombres]}
+
+    # 3 INSERT (100 + 100 + 50) + SAVEPOINT/RELEASE de la transacción
+    with django_assert_max_num_queries(5):
+        respuesta = client.post("/viewset/users/", payload, format="json")
+
+    # Se verifica...
+    assert respuesta.status_code == 201
+    ids = respuesta.json()["ids"]
+    assert [Usuario.objects.get(pk=pk).nombre for pk in ids] == nombres
+
+#-------------------------------------------------------------------------------------------
+#          TEST_POST_USUARIOS_EN_BLOQUE_SIN_IDS_DEL_INSERT_LOS_LEE_DESPUES
+# Se comprueba que, si la base de datos no devuelve los IDs de un INSERT múltiple (como
+# MySQL), los usuarios se siguen insertando en bloques y los IDs se leen en una consulta.
+#-------------------------------------------------------------------------------------------
+def test_post_usuarios_en_bloque_sin_ids_del_insert_los_lee_despues(settings, monkeypatch, django_assert_max_num_queries):
+    from django.db import connection
+
+    settings.USUARIOS_BULK_BATCH_SIZE = 100
+    monkeypatch.setattr(type(connection.features), "can_return_rows_from_bulk_insert", False)
+    Usuario.objects.create(nombre="Ya existía")
+    nombres = [f"Usuario {i}" for i in range(250)]
+
+    # MAX(id) + 3 INSERT (100 + 100 + 50) + SELECT de los IDs + SAVEPOINT/RELEASE
+    with django_assert_max_num_queries(7):
+        respuesta = APIClient().post("/viewset/users/", {"users": [{"nombre": n} for n in nombres]}, format="json")
+
+    # Se verifica...
+    assert respuesta.status_code == 201
+    ids = respuesta.json()["ids"]
+    assert [Usuario.objects.get(pk=pk).nombre for pk in ids] == nombres
+
 #-------------------------------------------------------------------------------------------
 # TEST_PUT_USUARIO_CON_AUTORIZACION_ACTUALIZA_Y_DEVUELVE_200
 # Se comprueba que el endpoint PUT /users/<id>/ actualiza el usuario si tiene
@@ -188,8 +271,8 @@ def test_get_cantantes_favoritos_devuelve_lista_y_200():
     usuario = Usuario.objects.create(nombre="Lola")
 
     # Se añaden dos cantantes favoritos para el usuario.
-    CantanteFavorito.objects.create(usuario=usuario, nombre="Adele")
-    CantanteFavorito.objects.create(usuario=usuario, nombre="Melendi")
+    usuario.cantantes_favoritos.create(nombre="Adele")
+    usuario.cantantes_favoritos.create(nombre="Melendi")
 
     client = APIClient()
 
@@ -259,6 +342,36 @@ def test_post_cantantes_favoritos_anyadir_con_autorizacion_y_devuelve_201():
     assert CantanteFavorito.objects.filter(usuario=usuario).count() == 2 # Hay dos cantantes favoritos para el usuario.
 
 
+#-------------------------------------------------------------------------------------------
+#          TEST_POST_CANTANTES_FAVORITOS_ANYADE_EN_BLOQUE_CON_CONSULTAS_FIJAS
+# Se comprueba que añadir muchos cantantes cuesta las mismas consultas que añadir uno y que
+# la respuesta separa los añadidos de los que ya estaban.
+#-------------------------------------------------------------------------------------------
+def test_post_cantantes_favoritos_anyade_en_bloque_con_consultas_fijas(django_assert_max_num_queries):
+    usuario = Usuario.objects.create(nombre="Lola")
+    usuario.cantantes_favoritos.create(nombre="Adele")
+    client = APIClient()
+    nuevos = [f"Cantante {i}" for i in range(300)]
+    payload = {"cantantes_favoritos": ["Adele"] + nuevos + ["Cantante 0"]}
+
+    # Usuario + favoritos existentes + catálogo (INSERT + SELECT) + INSERT + versión + SAVEPOINT/RELEASE
+    with django_assert_max_num_queries(8):
+        respuesta = client.post(
+            f"/viewset/users/{usuario.id}/cantantes_favoritos/anyadir/",
+            payload,
+            format="json",
+            HTTP_AUTHORIZATION="1234"
+        )
+
+    # Se verifica...
+    assert respuesta.status_code == 201
+    data = respuesta.json()
+    assert data["cantantes_agregados"] == nuevos
+    assert data["cantantes_existentes"] == ["Adele", "Cantante 0"]
+    assert data["cantantes_favoritos"] == ["Adele"] + nuevos
+    assert CantanteFavorito.objects.filter(usuario=usuario).count() == 301
+
+
 #-------------------------------------------------------------------------------------------
 #          TEST_MODIFICA_CANTANTES_FAVORITO_REEMPLAZA_LISTA_Y_DEVUELVE_200:
 # Se modifica la información de los cantantes favoritos de un usuario.
@@ -267,8 +380,9 @@ def test_put_cantantes_favoritos_reemplaza_lista_y_devuelve_200():
     # Se crea un usuario.
     usuario = Usuario.objects.create(nombre="Lola")
     
-    # Se añade un cantante favorito para el usuario.
-    CantanteFavorito.objects.create(usuario=usuario, nombre="Ed Sheeran")
+    # Se añaden dos cantantes favoritos para el usuario.
+    usuario.cantantes_favoritos.create(nombre="Ed Sheeran")
+    usuario.cantantes_favoritos.create(nombre="Melendi")
     client = APIClient()
 
     # Body
@@ -284,8 +398,93 @@ def test_put_cantantes_favoritos_reemplaza_lista_y_devuelve_200():
 
     # Se verifica...
     assert respuesta.status_code == 200, respuesta.content
-    nombres = list(CantanteFavorito.objects.filter(usuario=usuario).values_list("nombre", flat=True))
+    nombres = list(CantanteFavorito.objects.filter(usuario=usuario).values_list("cantante__nombre", flat=True))
     assert sorted(nombres) == ["Melendi", "Shakira"]
+    assert respuesta.json()["cantantes_favoritos"] == ["Shakira", "Melendi"] # En el orden del body, aunque "Melendi" ya estaba.
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_PUT_CANTANTES_FAVORITOS_SOLO_TOCA_LAS_FILAS_QUE_CAMBIAN
+# Se comprueba que, al cambiar un cantante de una lista de 500, solo se borra una fila y se
+# inserta otra: el resto conserva su ID.
+#-------------------------------------------------------------------------------------------
+def test_put_cantantes_favoritos_solo_toca_las_filas_que_cambian(django_assert_max_num_queries):
+    usuario = Usuario.objects.create(nombre="Lola")
+    nombres = [f"Cantante {i}" for i in range(500)]
+    cantantes = Cantante.objects.bulk_create([Cantante(nombre=n) for n in nombres])
+    CantanteFavorito.objects.bulk_create([CantanteFavorito(usuario=usuario, cantante=c) for c in cantantes])
+    ids_antes = dict(CantanteFavorito.objects.filter(usuario=usuario).values_list("cantante__nombre", "id"))
+    client = APIClient()
+    payload = {"cantantes_favoritos": nombres[1:] + ["Adele"]}
+
+    # Usuario + bloqueo + favoritos actuales + DELETE en bloque + catálogo (INSERT + SELECT) +
+    # INSERT + versión + SAVEPOINT/RELEASE
+    with django_assert_max_num_queries(10):
+        respuesta = client.put(
+            f"/viewset/users/{usuario.id}/cantantes_favoritos/modificar/",
+            payload,
+            format="json",
+            HTTP_AUTHORIZATION="1234"
+        )
+
+    # Se verifica...
+    assert respuesta.status_code == 200
+    assert respuesta.json()["cantantes_favoritos"] == nombres[1:] + ["Adele"]
+    ids_despues = dict(CantanteFavorito.objects.filter(usuario=usuario).values_list("cantante__nombre", "id"))
+    assert "Cantante 0" not in ids_despues
+    assert all(ids_despues[n] == ids_antes[n] for n in nombres[1:]) # No se han vuelto a crear.
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_CANTANTES_FAVORITOS_SE_GUARDAN_UNA_VEZ_EN_EL_CATALOGO
+# Se comprueba que un cantante que tienen varios usuarios se guarda una sola vez y que se
+# puede saber quién lo tiene como favorito.
+#-------------------------------------------------------------------------------------------
+def test_cantantes_favoritos_se_guardan_una_vez_en_el_catalogo():
+    lola = Usuario.objects.create(nombre="Lola")
+    pepe = Usuario.objects.create(nombre="Pepe")
+    client = APIClient()
+
+    for usuario, cantantes in [(lola, ["Adele", "Melendi"]), (pepe, ["Adele"])]:
+        client.post(
+            f"/viewset/users/{usuario.id}/cantantes_favoritos/anyadir/",
+            {"cantantes_favoritos": cantantes},
+            format="json",
+            HTTP_AUTHORIZATION="1234"
+        )
+
+    # Se verifica...
+    assert Cantante.objects.count() == 2
+    assert sorted(Cantante.objects.get(nombre="Adele").fans.values_list("nombre", flat=True)) == ["Lola", "Pepe"]
+    assert list(pepe.cantantes_favoritos.values_list("nombre", flat=True)) == ["Adele"]
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_CATALOGO_DISTINGUE_NOMBRES_QUE_SOLO_CAMBIAN_EN_MAYUSCULAS
+# Se comprueba que "Rosalía" y "rosalía" son dos cantantes distintos del catálogo y que en
+# MySQL la migración fija una colación binaria para que la base de datos opine lo mismo.
+#-------------------------------------------------------------------------------------------
+def test_catalogo_distingue_nombres_que_solo_cambian_en_mayusculas():
+    import importlib
+    from types import SimpleNamespace
+
+    usuario = Usuario.objects.create(nombre="Lola")
+    respuesta = APIClient().post(
+        f"/viewset/users/{usuario.id}/cantantes_favoritos/anyadir/",
+        {"cantantes_favoritos": ["Rosalía", "rosalía"]},
+        format="json",
+        HTTP_AUTHORIZATION="1234"
+    )
+
+    sentencias = []
+    mysql = SimpleNamespace(connection=SimpleNamespace(vendor="mysql"), execute=sentencias.append)
+    importlib.import_module("viewset_users.migrations.0006_catalogo_cantantes_canciones").colacion_binaria(None, mysql)
+
+    # Se verifica...
+    assert respuesta.status_code == 201
+    assert sorted(Cantante.objects.values_list("nombre", flat=True)) == ["Rosalía", "rosalía"]
+    assert sorted(usuario.cantantes_favoritos.values_list("nombre", flat=True)) == ["Rosalía", "rosalía"]
+    assert len(sentencias) == 2 and all("COLLATE utf8mb4_bin" in sql for sql in sentencias)
 
 
 #-------------------------------------------------------------------------------------------
@@ -297,8 +496,8 @@ def test_delete_cantante_favorito_elimina_y_devuelve_200():
     usuario = Usuario.objects.create(nombre="Lola")
 
     # Se añaden dos cantantes favoritos para el usuario.
-    CantanteFavorito.objects.create(usuario=usuario, nombre="Ed Sheeran")
-    CantanteFavorito.objects.create(usuario=usuario, nombre="Melendi")
+    usuario.cantantes_favoritos.create(nombre="Ed Sheeran")
+    usuario.cantantes_favoritos.create(nombre="Melendi")
     client = APIClient()
 
     # Se realiza petición "DELETE" para eliminar el cantante "Ed Sheeran" de sus cantantes favoritos.
@@ -309,11 +508,134 @@ def test_delete_cantante_favorito_elimina_y_devuelve_200():
 
     # Se verifica...
     assert respuesta.status_code == 200
-    assert not CantanteFavorito.objects.filter(usuario=usuario, nombre="Ed Sheeran").exists() # "Ed Sheeran" no es su cantante favorito.
-    assert CantanteFavorito.objects.filter(usuario=usuario, nombre="Melendi").exists()# "Melendi" es su cantante favorito.
+    assert not CantanteFavorito.objects.filter(usuario=usuario, cantante__nombre="Ed Sheeran").exists() # "Ed Sheeran" no es su cantante favorito.
+    assert CantanteFavorito.objects.filter(usuario=usuario, cantante__nombre="Melendi").exists()# "Melendi" es su cantante favorito.
     assert CantanteFavorito.objects.count() == 1 # Solo existe un cantante favorito.
 
 
+#-------------------------------------------------------------------------------------------
+#          TEST_GET_CANTANTES_FAVORITOS_CON_ETAG_DEVUELVE_304_SI_NO_HA_CAMBIADO
+# Se comprueba que, con el ETag de la última respuesta, se responde 304 con una sola consulta
+# y que, tras un cambio en la lista, el ETag anterior ya no vale.
+#-------------------------------------------------------------------------------------------
+def test_get_cantantes_favoritos_con_etag_devuelve_304_si_no_ha_cambiado(django_assert_num_queries):
+    usuario = Usuario.objects.create(nombre="Lola")
+    usuario.cantantes_favoritos.create(nombre="Melendi")
+    client = APIClient()
+    url = f"/viewset/users/{usuario.id}/cantantes_favoritos/"
+
+    respuesta = client.get(url)
+    etag = respuesta.headers["ETag"]
+
+    # Nada ha cambiado: solo se lee la versión del usuario.
+    with django_assert_num_queries(1):
+        no_modificada = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    client.post(
+        f"/viewset/users/{usuario.id}/cantantes_favoritos/anyadir/",
+        {"cantantes_favoritos": ["Adele"]},
+        format="json",
+        HTTP_AUTHORIZATION="1234"
+    )
+    modificada = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Se verifica...
+    assert respuesta.status_code == 200
+    assert etag.startswith('"') and not etag.startswith('W/')  # ETag fuerte.
+    assert no_modificada.status_code == 304
+    assert no_modificada.content == b""
+    assert no_modificada.headers["ETag"] == etag
+    assert modificada.status_code == 200
+    assert modificada.headers["ETag"] != etag
+    assert "Adele" in modificada.json()["cantantes_favoritos"]
+
+    # El usuario también tiene su ETag, que cambia al modificarlo.
+    etag_usuario = client.get(f"/viewset/users/{usuario.id}/").headers["ETag"]
+    assert client.get(f"/viewset/users/{usuario.id}/", HTTP_IF_NONE_MATCH=etag_usuario).status_code == 304
+    client.put(f"/viewset/users/{usuario.id}/", {"nombre": "Dolores"}, format="json", HTTP_AUTHORIZATION="1234")
+    assert client.get(f"/viewset/users/{usuario.id}/", HTTP_IF_NONE_MATCH=etag_usuario).status_code == 200
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_GET_CANTANTES_FAVORITOS_SE_SIRVE_DESDE_LA_CACHE_E_INVALIDA_AL_ESCRIBIR
+# Se comprueba que la segunda lectura no consulta los favoritos y que cualquier escritura
+# (endpoint, modelo o eliminación del usuario) invalida la lista.
+#-------------------------------------------------------------------------------------------
+def test_get_cantantes_favoritos_se_sirve_desde_la_cache_e_invalida_al_escribir(django_assert_num_queries):
+    from viewset_users.favoritos_cache import cache_favoritos
+
+    usuario = Usuario.objects.create(nombre="Lola")
+    usuario.cantantes_favoritos.create(nombre="Melendi")
+    client = APIClient()
+    url = f"/viewset/users/{usuario.id}/cantantes_favoritos/"
+    antes = cache_favoritos.estadisticas()
+
+    client.get(url)
+    # Segunda lectura: solo se consulta el usuario.
+    with django_assert_num_queries(1):
+        respuesta = client.get(url)
+    assert "Melendi" in respuesta.json()["cantantes_favoritos"]
+
+    # Escritura por el endpoint.
+    client.post(
+        f"/viewset/users/{usuario.id}/cantantes_favoritos/anyadir/",
+        {"cantantes_favoritos": ["Adele"]},
+        format="json",
+        HTTP_AUTHORIZATION="1234"
+    )
+    assert "Adele" in client.get(url).json()["cantantes_favoritos"]
+
+    # Borrado por el endpoint (un solo DELETE en bloque, sin señales por fila).
+    # Usuario + SAVEPOINT + DELETE + versión + RELEASE + lista final
+    with django_assert_num_queries(6):
+        client.delete(f"{url}eliminar/?cantante=Melendi", HTTP_AUTHORIZATION="1234")
+    assert "Melendi" not in client.get(url).json()["cantantes_favoritos"]
+
+    # Escritura directa sobre el modelo (sin pasar por la API).
+    usuario.cantantes_favoritos.remove(Cantante.objects.get(nombre="Adele"))
+    assert "Adele" not in client.get(url).json()["cantantes_favoritos"]
+
+    despues = cache_favoritos.estadisticas()
+
+    # Se verifica...
+    assert despues["aciertos"] - antes["aciertos"] == 1
+    assert despues["fallos"] - antes["fallos"] == 4
+    assert despues["invalidaciones"] > antes["invalidaciones"]
+    assert despues["edad_maxima"] >= 0
+    usuario_id = usuario.id
+    usuario.delete()
+    assert cache_favoritos.cache.get(cache_favoritos.clave(CantanteFavorito, usuario_id)) is None
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_USUARIO_CON_ID_REUTILIZADO_NO_RECIBE_LA_CACHE_NI_EL_ETAG_DEL_ANTERIOR
+# Se comprueba que, si se borra un usuario y otro nuevo recibe su ID, ni la lista que
+# otro worker tenga en su caché ni el ETag que guarde un cliente valen para el nuevo.
+#-------------------------------------------------------------------------------------------
+def test_usuario_con_id_reutilizado_no_recibe_la_cache_ni_el_etag_del_anterior():
+    from viewset_users.favoritos_cache import cache_favoritos
+
+    usuario = Usuario.objects.create(nombre="Lola")
+    usuario.cantantes_favoritos.create(nombre="Melendi")
+    client = APIClient()
+    url = f"/viewset/users/{usuario.id}/cantantes_favoritos/"
+    etag = client.get(url).headers["ETag"]
+    clave = cache_favoritos.clave(CantanteFavorito, usuario.id)
+    entrada = cache_favoritos.cache.get(clave)
+
+    usuario_id = usuario.id
+    usuario.delete()
+    cache_favoritos.cache.set(clave, entrada) # La entrada que sigue en la caché de otro worker.
+    Usuario.objects.create(id=usuario_id, nombre="Pepe")
+
+    respuesta = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Se verifica...
+    assert respuesta.status_code == 200
+    assert respuesta.json()["cantantes_favoritos"] == []
+    assert respuesta.headers["ETag"] != etag
+
+
 ############################################################################################
 ############################################################################################
 
@@ -330,8 +652,8 @@ def test_get_canciones_favoritas_devuelve_lista_y_200():
     usuario = Usuario.objects.create(nombre="Lola")
 
     # Se añaden dos canciones favoritas para el usuario.
-    CancionFavorita.objects.create(usuario=usuario, nombre="Tocado y Hundido")
-    CancionFavorita.objects.create(usuario=usuario, nombre="La bachata")
+    usuario.canciones_favoritas.create(nombre="Tocado y Hundido")
+    usuario.canciones_favoritas.create(nombre="La bachata")
 
     client = APIClient()
 
@@ -410,7 +732,7 @@ def test_put_canciones_favoritas_reemplaza_lista_y_devuelve_200():
     usuario = Usuario.objects.create(nombre="Lola")
     
     # Se añade una canción favorita para el usuario.
-    CancionFavorita.objects.create(usuario=usuario, nombre="Tocado y Hundido")
+    usuario.canciones_favoritas.create(nombre="Tocado y Hundido")
     client = APIClient()
 
     # Body
@@ -426,8 +748,9 @@ def test_put_canciones_favoritas_reemplaza_lista_y_devuelve_200():
 
     # Se verifica...
     assert respuesta.status_code == 200, respuesta.content
-    nombres = list(CancionFavorita.objects.filter(usuario=usuario).values_list("nombre", flat=True))
+    nombres = list(CancionFavorita.objects.filter(usuario=usuario).values_list("cancion__nombre", flat=True))
     assert sorted(nombres) == ["La bachata", "La llorona"] # Están las canciones "La bachata" y "La llorona" en su lista de canciones favoritas.
+    assert respuesta.json()["canciones_favoritas"] == ["La llorona", "La bachata"] # En el orden del body.
 
 
 #-------------------------------------------------------------------------------------------
@@ -439,8 +762,8 @@ def test_delete_cancion_favorita_elimina_y_devuelve_200():
     usuario = Usuario.objects.create(nombre="Lola")
 
     # Se añaden dos canciones favoritas para el usuario.
-    CancionFavorita.objects.create(usuario=usuario, nombre="La bachata")
-    CancionFavorita.objects.create(usuario=usuario, nombre="La llorona")
+    usuario.canciones_favoritas.create(nombre="La bachata")
+    usuario.canciones_favoritas.create(nombre="La llorona")
     client = APIClient()
 
     # Se realiza petición "DELETE" para eliminar la canción "La bachata" de sus canciones favoritas.
@@ -451,6 +774,971 @@ def test_delete_cancion_favorita_elimina_y_devuelve_200():
 
     # Se verifica...
     assert respuesta.status_code == 200
-    assert not CancionFavorita.objects.filter(usuario=usuario, nombre="La bachata").exists() # "La bachata" no es su canción favorita.
-    assert CancionFavorita.objects.filter(usuario=usuario, nombre="La llorona").exists() # "La llorona" es su canción favorita.
+    assert not CancionFavorita.objects.filter(usuario=usuario, cancion__nombre="La bachata").exists() # "La bachata" no es su canción favorita.
+    assert CancionFavorita.objects.filter(usuario=usuario, cancion__nombre="La llorona").exists() # "La llorona" es su canción favorita.
     assert CancionFavorita.objects.count() == 1 # Solo existe una canción favorita.
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_GET_FAVORITOS_DE_VARIOS_USUARIOS_CON_CONSULTAS_FIJAS
+# Se comprueba que los favoritos de muchos usuarios se obtienen con 3 consultas, en el orden
+# en que se piden, y que se indican los usuarios que no existen.
+#-------------------------------------------------------------------------------------------
+def test_get_favoritos_de_varios_usuarios_con_consultas_fijas(django_assert_num_queries):
+    usuarios = Usuario.objects.bulk_create([Usuario(nombre=f"Usuario {i}") for i in range(100)])
+    adele = Cantante.objects.create(nombre="Adele")
+    melendi = Cantante.objects.create(nombre="Melendi")
+    hello = Cancion.objects.create(nombre="Hello")
+    for usuario in usuarios:
+        CantanteFavorito.objects.create(usuario=usuario, cantante=melendi)
+        CantanteFavorito.objects.create(usuario=usuario, cantante=adele)
+        CancionFavorita.objects.create(usuario=usuario, cancion=hello)
+    ids = [usuario.id for usuario in reversed(usuarios)] + [999999]
+    client = APIClient()
+
+    with django_assert_num_queries(3):
+        respuesta = client.get(f"/viewset/users/favoritos/?ids={','.join(map(str, ids))}")
+
+    # Se verifica...
+    assert respuesta.status_code == 200
+    data = respuesta.json()
+    assert [usuario["id"] for usuario in data["users"]] == ids[:-1]
+    assert data["users"][0]["cantantes_favoritos"] == ["Melendi", "Adele"]
+    assert data["users"][0]["canciones_favoritas"] == ["Hello"]
+    assert data["no_encontrados"] == [999999]
+    assert client.get("/viewset/users/favoritos/?ids=a,b").status_code == 400
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_EXPORTAR_USUARIOS_EN_NDJSON_POR_STREAMING
+# Se comprueba que el endpoint y el comando de exportación devuelven un usuario por línea
+# con sus favoritos, leyendo la base de datos por bloques.
+#-------------------------------------------------------------------------------------------
+def test_exportar_usuarios_en_ndjson_por_streaming(settings):
+    import io
+    import json
+    from django.core.management import call_command
+
+    settings.EXPORTACION_CHUNK_SIZE = 2 # Varios bloques con pocos usuarios.
+    for nombre in ["Lola", "Pepe", "Ana"]:
+        usuario = Usuario.objects.create(nombre=nombre)
+        usuario.cantantes_favoritos.create(nombre=f"Cantante de {nombre}")
+    client = APIClient()
+
+    respuesta = client.get("/viewset/users/exportar/", HTTP_AUTHORIZATION="1234")
+    lineas = b"".join(respuesta.streaming_content).decode().splitlines()
+    salida = io.StringIO()
+    call_command("exportar_usuarios", stdout=salida, stderr=io.StringIO())
+
+    # Se verifica...
+    assert respuesta.status_code == 200
+    assert respuesta.streaming
+    usuarios = [json.loads(linea) for linea in lineas]
+    assert [u["nombre"] for u in usuarios] == ["Lola", "Pepe", "Ana"]
+    assert usuarios[1]["cantantes_favoritos"] == ["Cantante de Pepe"]
+    assert usuarios[1]["canciones_favoritas"] == []
+    assert salida.getvalue().splitlines() == lineas
+    assert client.get("/viewset/users/exportar/").status_code == 401
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_IMPORTAR_USUARIOS_POR_BLOQUES_Y_CONTINUAR_DESDE_EL_CHECKPOINT
+# Se comprueba que el comando de importación valida las filas, guarda las válidas con sus
+# favoritos y, con un checkpoint, no vuelve a importar lo que ya se había importado.
+#-------------------------------------------------------------------------------------------
+def test_importar_usuarios_por_bloques_y_continuar_desde_el_checkpoint(tmp_path):
+    import io
+    import json
+    from django.core.management import call_command
+    from viewset_users.models import ProgresoImportacion
+
+    fichero = tmp_path / "usuarios.ndjson"
+    fichero.write_text("\n".join([
+        json.dumps({"nombre": "Lola", "cantantes_favoritos": ["Adele", "Melendi"]}),
+        json.dumps({"nombre": "  "}), # No válida: nombre vacío
+        json.dumps({"nombre": "Pepe", "cantantes_favoritos": ["Adele"], "canciones_favoritas": ["Hello"]}),
+        "esto no es JSON",
+        json.dumps({"nombre": "Ana"}),
+    ]), encoding="utf-8")
+    csv = tmp_path / "usuarios.csv"
+    csv.write_text("nombre,cantantes_favoritos,canciones_favoritas\nLuis,Adele|Shakira,\n", encoding="utf-8")
+
+    salida = io.StringIO()
+    call_command("importar_usuarios", str(fichero), batch_size=2, checkpoint="importacion",
+                 stdout=salida, stderr=io.StringIO())
+    # Se vuelve a lanzar: el checkpoint indica que ya está todo importado.
+    call_command("importar_usuarios", str(fichero), batch_size=2, checkpoint="importacion",
+                 stdout=io.StringIO(), stderr=io.StringIO())
+    call_command("importar_usuarios", str(csv), stdout=io.StringIO(), stderr=io.StringIO())
+
+    # Se verifica...
+    assert "3 usuarios importados (2 filas no válidas)" in salida.getvalue()
+    assert sorted(Usuario.objects.values_list("nombre", flat=True)) == ["Ana", "Lola", "Luis", "Pepe"]
+    assert ProgresoImportacion.objects.get(nombre="importacion").filas == 5
+    assert sorted(Cantante.objects.get(nombre="Adele").fans.values_list("nombre", flat=True)) == ["Lola", "Luis", "Pepe"]
+    assert list(Usuario.objects.get(nombre="Pepe").canciones_favoritas.values_list("nombre", flat=True)) == ["Hello"]
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_IMPORTAR_USUARIOS_GUARDA_EL_CHECKPOINT_EN_LA_TRANSACCION_DEL_BLOQUE
+# Se comprueba que, si falla el guardado del progreso de un bloque, tampoco se guardan sus
+# usuarios: al continuar no se duplican.
+#-------------------------------------------------------------------------------------------
+def test_importar_usuarios_guarda_el_checkpoint_en_la_transaccion_del_bloque(tmp_path, monkeypatch):
+    import io
+    import json
+    from django.core.management import call_command
+    from viewset_users.models import ProgresoImportacion
+
+    fichero = tmp_path / "usuarios.ndjson"
+    fichero.write_text("\n".join(json.dumps({"nombre": n}) for n in ["Lola", "Pepe", "Ana"]), encoding="utf-8")
+    guardar = ProgresoImportacion.save
+    guardados = []
+
+    def guardar_y_fallar_en_el_segundo(progreso, *args, **kwargs):
+        if kwargs.get("update_fields"):
+            guardados.append(progreso.filas)
+        if len(guardados) == 2:
+            raise RuntimeError("El proceso muere en mitad del segundo bloque")
+        return guardar(progreso, *args, **kwargs)
+
+    monkeypatch.setattr(ProgresoImportacion, "save", guardar_y_fallar_en_el_segundo)
+    with pytest.raises(RuntimeError):
+        call_command("importar_usuarios", str(fichero), batch_size=2, checkpoint="importacion",
+                     stdout=io.StringIO(), stderr=io.StringIO())
+    monkeypatch.setattr(ProgresoImportacion, "save", guardar)
+    call_command("importar_usuarios", str(fichero), batch_size=2, checkpoint="importacion",
+                 stdout=io.StringIO(), stderr=io.StringIO())
+
+    # Se verifica que el segundo bloque se deshizo entero y que al continuar no hay duplicados.
+    assert sorted(Usuario.objects.values_list("nombre", flat=True)) == ["Ana", "Lola", "Pepe"]
+    assert ProgresoImportacion.objects.get(nombre="importacion").filas == 3
+
+
+############################################################################################
+############################################################################################
+
+#                                       SPOTIFY
+
+############################################################################################
+############################################################################################
+
+# Respuesta falsa de "requests" para no llamar a Spotify durante los tests.
+class RespuestaFalsa:
+    def __init__(self, json_data, status_code=200, headers=None):
+        self._json = json_data
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return self._json
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"HTTP {self.status_code}")
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_CLIENTE_SPOTIFY_REUTILIZA_LA_SESION_Y_EL_POOL
+# Se comprueba que el token y las búsquedas pasan por la misma sesión (pool de conexiones).
+#-------------------------------------------------------------------------------------------
+def test_cliente_spotify_reutiliza_la_sesion_y_el_pool(monkeypatch, tmp_path):
+    from spotify.spotify_cache import CacheTTL
+    from spotify.spotify_request import SpotifyClient
+
+    cliente = SpotifyClient("id", "secret", pool_connections=2, pool_maxsize=7, cache=CacheTTL(),
+                            ruta_token=tmp_path / "token.json")
+    llamadas = []
+
+    def post_falso(url, **kwargs):
+        llamadas.append(("POST", url))
+        return RespuestaFalsa({"access_token": "abc", "expires_in": 3600})
+
+    def get_falso(url, **kwargs):
+        llamadas.append(("GET", kwargs["params"]["type"]))
+        return RespuestaFalsa({"artists": {"items": []}})
+
+    monkeypatch.setattr(cliente.session, "post", post_falso)
+    monkeypatch.setattr(cliente.session, "get", get_falso)
+
+    cliente.search_artist("Adele")
+    cliente.search_artist("Melendi")
+
+    # Se verifica...
+    assert [m for m, _ in llamadas].count("POST") == 1 # El token se pide una sola vez.
+    assert llamadas.count(("GET", "artist")) == 2
+    adapter = cliente.session.get_adapter("https://api.spotify.com/v1/search")
+    assert adapter._pool_maxsize == 7 # Límite de conexiones por host.
+    assert adapter._pool_connections == 2
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_BUSCAR_EN_PARALELO_CONSERVA_EL_ORDEN_Y_AISLA_LOS_FALLOS
+# Se comprueba que las búsquedas en paralelo devuelven los resultados en el orden de las
+# consultas y que una búsqueda fallida no impide obtener el resto.
+#-------------------------------------------------------------------------------------------
+def test_buscar_en_paralelo_conserva_el_orden_y_aisla_los_fallos():
+    import time
+    from spotify.spotify_request import buscar_en_paralelo
+
+    def busqueda(consulta):
+        if consulta == "falla":
+            raise RuntimeError("Spotify no responde")
+        time.sleep(0.05 if consulta == "lenta" else 0)
+        return consulta.upper()
+
+    resultados = buscar_en_paralelo(busqueda, ["lenta", "falla", "rapida"], max_concurrencia=3)
+
+    # Se verifica...
+    assert resultados == ["LENTA", None, "RAPIDA"]
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_GET_CANCIONES_SPOTIFY_SALTA_BUSQUEDAS_FALLIDAS_Y_DEVUELVE_200
+# Se comprueba que si Spotify no devuelve nada para una canción, el resto se muestra igual.
+#-------------------------------------------------------------------------------------------
+def test_get_canciones_spotify_salta_busquedas_fallidas_y_devuelve_200(monkeypatch):
+    usuario = Usuario.objects.create(nombre="Lola")
+    usuario.canciones_favoritas.create(nombre="La bachata")
+    usuario.canciones_favoritas.create(nombre="Sin conexion")
+
+    def search_track_song_falso(cancion):
+        if cancion == "Sin conexion":
+            return None # Como si Spotify hubiese fallado.
+        return {"tracks": {"items": [{"id": "t1", "name": cancion, "album": {}, "artists": []}]}}
+
+    monkeypatch.setattr("viewset_users.views.search_track_song", search_track_song_falso)
+    client = APIClient()
+
+    respuesta = client.get(f"/viewset/users/{usuario.id}/canciones_spotify/")
+
+    # Se verifica...
+    assert respuesta.status_code == 200
+    data = respuesta.json()
+    assert data["canciones_favoritas"] == ["La bachata"]
+    assert data["resultado_spotify"][0]["id"] == "t1"
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_BUSCAR_EN_PARALELO_ASYNC_LIMITA_LAS_BUSQUEDAS_EN_VUELO
+# Se comprueba que el fan-out asíncrono respeta el semáforo y conserva el orden.
+#-------------------------------------------------------------------------------------------
+def test_buscar_en_paralelo_async_limita_las_busquedas_en_vuelo():
+    import asyncio
+    from spotify.spotify_async import buscar_en_paralelo_async
+
+    en_vuelo = {"actual": 0, "maximo": 0}
+
+    async def busqueda(consulta):
+        en_vuelo["actual"] += 1
+        en_vuelo["maximo"] = max(en_vuelo["maximo"], en_vuelo["actual"])
+        await asyncio.sleep(0.01)
+        en_vuelo["actual"] -= 1
+        if consulta == 3:
+            raise RuntimeError("Spotify no responde")
+        return consulta * 10
+
+    resultados = asyncio.run(buscar_en_paralelo_async(busqueda, range(10), max_concurrencia=4))
+
+    # Se verifica...
+    assert resultados == [0, 10, 20, None, 40, 50, 60, 70, 80, 90]
+    assert en_vuelo["maximo"] == 4
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_GET_ARTISTAS_SPOTIFY_ASYNC_DEVUELVE_INFORMACION_Y_200
+# Se comprueba que la vista asíncrona devuelve lo mismo que la versión síncrona.
+#-------------------------------------------------------------------------------------------
+def test_get_artistas_spotify_async_devuelve_informacion_y_200(monkeypatch):
+    usuario = Usuario.objects.create(nombre="Lola")
+    usuario.cantantes_favoritos.create(nombre="Adele")
+
+    from spotify.spotify_async import SpotifyAsyncClient
+
+    clientes = []
+
+    async def search_artist_falso(cliente, cantante):
+        clientes.append(cliente)
+        return {"artists": {"items": [{"id": "a1", "name": cantante, "followers": {"total": 5}}]}}
+
+    monkeypatch.setattr(SpotifyAsyncClient, "search_artist", search_artist_falso)
+    client = APIClient()
+
+    respuesta = client.get(f"/viewset/users/{usuario.id}/artistas_spotify_async/")
+    respuesta_404 = client.get("/viewset/users/999999/artistas_spotify_async/")
+
+    # Se verifica...
+    assert respuesta.status_code == 200
+    data = respuesta.json()
+    assert data["cantantes_favoritos"] == ["Adele"]
+    assert data["resultado_spotify"][0]["seguidores"] == 5
+    assert respuesta_404.status_code == 404
+    assert all(cliente.http.is_closed for cliente in clientes) # El cliente de la petición se cierra.
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_CACHE_TTL_CADUCA_EXPULSA_Y_CUENTA
+# Se comprueba que la caché caduca las entradas (TTL), expulsa la menos usada (LRU) y
+# lleva la cuenta de aciertos, fallos y expulsiones.
+#-------------------------------------------------------------------------------------------
+def test_cache_ttl_caduca_expulsa_y_cuenta():
+    from spotify.spotify_cache import CacheTTL, clave_busqueda
+
+    ahora = {"t": 0}
+    cache = CacheTTL(max_entradas=2, ttl=10, reloj=lambda: ahora["t"])
+
+    cache.set(clave_busqueda("artist", "Adele"), {"a": 1})
+    cache.set(clave_busqueda("artist", "Melendi"), {"m": 1})
+    assert cache.get(clave_busqueda("artist", "  ADELE ")) == {"a": 1} # Misma consulta normalizada.
+    cache.set(clave_busqueda("track", "Adele"), {"t": 1}) # Se expulsa "Melendi" (la menos usada).
+    assert cache.get(clave_busqueda("artist", "Melendi")) is None
+
+    ahora["t"] = 11 # Pasa el TTL.
+    assert cache.get(clave_busqueda("artist", "Adele")) is None
+
+    # Se verifica...
+    estadisticas = cache.estadisticas()
+    assert estadisticas["aciertos"] == 1
+    assert estadisticas["fallos"] == 2
+    assert estadisticas["expulsiones"] == 1
+    assert estadisticas["caducadas"] == 1
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_CLIENTE_SPOTIFY_SIRVE_BUSQUEDAS_REPETIDAS_DESDE_LA_CACHE
+# Se comprueba que la misma búsqueda solo llega una vez a Spotify.
+#-------------------------------------------------------------------------------------------
+def test_cliente_spotify_sirve_busquedas_repetidas_desde_la_cache(monkeypatch):
+    from spotify.spotify_cache import CacheTTL
+    from spotify.spotify_request import SpotifyClient
+
+    cliente = SpotifyClient("id", "secret", cache=CacheTTL())
+    busquedas = []
+    monkeypatch.setattr(cliente, "get_token", lambda force_refresh=False: "abc")
+
+    def get_falso(url, **kwargs):
+        busquedas.append(kwargs["params"]["q"])
+        return RespuestaFalsa({"artists": {"items": [{"id": "a1"}]}})
+
+    monkeypatch.setattr(cliente.session, "get", get_falso)
+
+    primera = cliente.search_artist("Adele")
+    segunda = cliente.search_artist("adele ")
+
+    # Se verifica...
+    assert primera == segunda
+    assert busquedas == ["Adele"] # Solo una petición a Spotify.
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_CACHE_SQLITE_SE_COMPARTE_ENTRE_INSTANCIAS_Y_CADUCA
+# Se comprueba que dos cachés sobre el mismo fichero (como dos workers) ven las mismas
+# entradas y que las caducadas se purgan.
+#-------------------------------------------------------------------------------------------
+def test_cache_sqlite_se_comparte_entre_instancias_y_caduca(tmp_path):
+    from spotify.spotify_cache import CacheEnCapas, CacheSQLite, CacheTTL
+
+    ruta = tmp_path / "spotify_cache.sqlite3"
+    worker_1 = CacheEnCapas(CacheTTL(), CacheSQLite(ruta))
+    worker_2 = CacheEnCapas(CacheTTL(), CacheSQLite(ruta))
+
+    worker_1.set("artist:adele", {"artists": {"items": [{"id": "a1"}]}})
+    worker_1.disco.set("artist:melendi", {"artists": {"items": []}}, ttl=-1) # Ya caducada.
+
+    # Se verifica...
+    assert worker_2.get("artist:adele") == {"artists": {"items": [{"id": "a1"}]}}
+    assert worker_2.memoria.get("artist:adele") is not None # Se ha subido a memoria.
+    assert worker_2.get("artist:melendi") is None
+    worker_2.disco.purgar()
+    assert worker_2.disco.estadisticas()["purgadas"] == 1
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_CLIENTE_ASYNC_NO_USA_LA_CACHE_EN_DISCO_DESDE_EL_EVENT_LOOP
+# Se comprueba que el cliente asíncrono lee y escribe la caché SQLite en otro hilo y que
+# los aciertos en memoria se sirven sin salir del event loop.
+#-------------------------------------------------------------------------------------------
+def test_cliente_async_no_usa_la_cache_en_disco_desde_el_event_loop(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+    from spotify.spotify_async import SpotifyAsyncClient
+    from spotify.spotify_cache import CacheEnCapas, CacheSQLite, CacheTTL
+
+    cache = CacheEnCapas(CacheTTL(), CacheSQLite(tmp_path / "spotify_cache.sqlite3"))
+    cliente = SpotifyAsyncClient(cache=cache)
+    hilos_disco = []
+    get_con_ttl, set_disco = cache.disco.get_con_ttl, cache.disco.set
+
+    def get_con_ttl_falso(clave):
+        hilos_disco.append(threading.get_ident())
+        return get_con_ttl(clave)
+
+    def set_falso(clave, valor, ttl=None):
+        hilos_disco.append(threading.get_ident())
+        return set_disco(clave, valor, ttl=ttl)
+
+    async def get_falso(url, params):
+        return {"artists": {"items": [{"id": "a1"}]}}
+
+    monkeypatch.setattr(cache.disco, "get_con_ttl", get_con_ttl_falso)
+    monkeypatch.setattr(cache.disco, "set", set_falso)
+    monkeypatch.setattr(cliente, "_get", get_falso)
+
+    async def buscar():
+        async with cliente:
+            primera = await cliente.search_artist("Adele")
+            segunda = await cliente.search_artist("Adele") # Acierto en memoria.
+        return threading.get_ident(), primera, segunda
+
+    hilo_loop, primera, segunda = asyncio.run(buscar())
+
+    # Se verifica que solo se va a disco en el fallo (dos lecturas, antes y después de quedarse con la
+    # búsqueda, y una escritura) y nunca desde el hilo del event loop.
+    assert primera == segunda == {"artists": {"items": [{"id": "a1"}]}}
+    assert len(hilos_disco) == 3
+    assert hilo_loop not in hilos_disco
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_CLIENTE_ASYNC_VUELVE_A_MIRAR_LA_CACHE_AL_HACER_LA_BUSQUEDA
+# Se comprueba que la corrutina que se queda con la búsqueda vuelve a mirar la caché: si la
+# búsqueda anterior terminó justo después del primer fallo, no se vuelve a llamar a Spotify.
+#-------------------------------------------------------------------------------------------
+def test_cliente_async_vuelve_a_mirar_la_cache_al_hacer_la_busqueda(monkeypatch):
+    import asyncio
+    from spotify.spotify_async import SpotifyAsyncClient
+    from spotify.spotify_cache import CacheTTL, clave_busqueda
+
+    cliente = SpotifyAsyncClient(cache=CacheTTL())
+    peticiones = []
+    cache_get = cliente._cache_get
+
+    async def cache_get_con_carrera(clave):
+        json_data = await cache_get(clave)
+        # La búsqueda anterior deja el resultado en la caché justo después de este fallo.
+        cliente.cache.set(clave, {"artists": {"items": [{"id": "a1"}]}})
+        return json_data
+
+    async def get_falso(url, params):
+        peticiones.append(params["q"])
+        return {"artists": {"items": [{"id": "otro"}]}}
+
+    monkeypatch.setattr(cliente, "_cache_get", cache_get_con_carrera)
+    monkeypatch.setattr(cliente, "_get", get_falso)
+
+    async def buscar():
+        async with cliente:
+            return await cliente.search_artist("Adele")
+
+    resultado = asyncio.run(buscar())
+
+    # Se verifica...
+    assert peticiones == []
+    assert resultado == {"artists": {"items": [{"id": "a1"}]}}
+    assert cliente.cache.get(clave_busqueda("artist", "Adele")) == resultado
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_GET_ARTISTAS_SPOTIFY_GUARDA_EL_RESULTADO_Y_NO_VUELVE_A_BUSCAR
+# Se comprueba que un cantante resuelto queda guardado en la base de datos y que la
+# siguiente petición no lo vuelve a buscar en Spotify.
+#-------------------------------------------------------------------------------------------
+def test_get_artistas_spotify_guarda_el_resultado_y_no_vuelve_a_buscar(monkeypatch):
+    from viewset_users.models import ArtistaSpotify
+
+    usuario = Usuario.objects.create(nombre="Lola")
+    usuario.cantantes_favoritos.create(nombre="Adele")
+    busquedas = []
+
+    def search_artist_falso(cantante):
+        busquedas.append(cantante)
+        return {"artists": {"items": [{
+            "id": "4dpARuHxo51G3z768sgnrY", "name": "Adele", "popularity": 90,
+            "followers": {"total": 1000}, "genres": ["pop"],
+            "external_urls": {"spotify": "https://open.spotify.com/artist/4dpARuHxo51G3z768sgnrY"},
+        }]}}
+
+    monkeypatch.setattr("viewset_users.views.search_artist", search_artist_falso)
+    client = APIClient()
+
+    primera = client.get(f"/viewset/users/{usuario.id}/artistas_spotify/")
+    segunda = client.get(f"/viewset/users/{usuario.id}/artistas_spotify/")
+
+    # Se verifica...
+    assert primera.status_code == 200 and segunda.status_code == 200
+    assert primera.json() == segunda.json()
+    assert busquedas == ["Adele"] # Solo se ha buscado la primera vez.
+    assert segunda.json()["resultado_spotify"][0]["generos"] == ["pop"]
+    assert CantanteFavorito.objects.get(usuario=usuario).cantante.artista_spotify == ArtistaSpotify.objects.get()
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_GUARDAR_ARTISTAS_ACTUALIZA_E_INSERTA_SIN_UPSERT_CON_UNIQUE_FIELDS
+# Se comprueba que los artistas resueltos se guardan también en bases de datos que no
+# admiten "unique_fields" en un upsert (MySQL): el existente se actualiza y el nuevo se crea.
+#-------------------------------------------------------------------------------------------
+def test_guardar_artistas_actualiza_e_inserta_sin_upsert_con_unique_fields(monkeypatch):
+    from django.db import connection
+    from viewset_users.enriquecimiento import guardar_artistas
+    from viewset_users.models import ArtistaSpotify
+
+    monkeypatch.setattr(type(connection.features), "supports_update_conflicts_with_target", False)
+    adele = ArtistaSpotify.objects.create(spotify_id="a1", nombre="Adele", seguidores=10)
+    cantantes = [Cantante.objects.create(nombre="Adele"), Cantante.objects.create(nombre="Melendi")]
+    jsons = [
+        {"artists": {"items": [{"id": "a1", "name": "Adele", "followers": {"total": 20}}]}},
+        {"artists": {"items": [{"id": "m1", "name": "Melendi", "followers": {"total": 5}}]}},
+    ]
+
+    guardar_artistas(cantantes, jsons)
+
+    # Se verifica...
+    assert ArtistaSpotify.objects.get(pk=adele.pk).seguidores == 20 # Se actualiza sin crear otro.
+    assert ArtistaSpotify.objects.count() == 2
+    assert Cantante.objects.get(nombre="Melendi").artista_spotify.spotify_id == "m1"
+    assert Cantante.objects.get(nombre="Adele").artista_spotify_id == adele.pk
+
+
+# Sesión falsa que cuenta las peticiones de token a Spotify.
+class SesionTokenFalsa:
+    def __init__(self, espera=0):
+        self.espera = espera
+        self.peticiones = 0
+
+    def post(self, url, **kwargs):
+        import time
+        self.peticiones += 1
+        time.sleep(self.espera)
+        return RespuestaFalsa({"access_token": f"token-{self.peticiones}", "expires_in": 3600})
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_GESTOR_TOKEN_SOLO_PIDE_UN_TOKEN_AUNQUE_LO_PIDAN_MUCHOS_HILOS
+# Se comprueba que si muchos hilos piden el token a la vez, solo uno llega a Spotify.
+#-------------------------------------------------------------------------------------------
+def test_gestor_token_solo_pide_un_token_aunque_lo_pidan_muchos_hilos(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from spotify.spotify_token import GestorTokenSpotify
+
+    sesion = SesionTokenFalsa(espera=0.05)
+    gestor = GestorTokenSpotify("id", "secret", session=sesion, ruta=tmp_path / "token.json",
+                                refresco_en_segundo_plano=False)
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        tokens = list(executor.map(lambda _: gestor.get_token(), range(10)))
+
+    # Se verifica...
+    assert tokens == ["token-1"] * 10
+    assert sesion.peticiones == 1
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_GESTOR_TOKEN_SE_COMPARTE_ENTRE_WORKERS_Y_SOLO_RENUEVA_UNA_VEZ_TRAS_401
+# Se comprueba que un segundo worker reutiliza el token del fichero compartido y que
+# varios 401 con el mismo token solo provocan una renovación.
+#-------------------------------------------------------------------------------------------
+def test_gestor_token_se_comparte_entre_workers_y_solo_renueva_una_vez_tras_401(tmp_path):
+    from spotify.spotify_token import GestorTokenSpotify
+
+    ruta = tmp_path / "token.json"
+    sesion_1 = SesionTokenFalsa()
+    sesion_2 = SesionTokenFalsa()
+    worker_1 = GestorTokenSpotify("id", "secret", session=sesion_1, ruta=ruta, refresco_en_segundo_plano=False)
+    worker_2 = GestorTokenSpotify("id", "secret", session=sesion_2, ruta=ruta, refresco_en_segundo_plano=False)
+
+    token = worker_1.get_token()
+    assert worker_2.get_token() == token # Lo lee del fichero compartido.
+    assert sesion_2.peticiones == 0
+
+    # Dos peticiones reciben 401 con el mismo token: solo se renueva una vez.
+    nuevo = worker_1.get_token(force_refresh=True, token_caducado=token)
+    otra_vez = worker_1.get_token(force_refresh=True, token_caducado=token)
+
+    # Se verifica...
+    assert nuevo == otra_vez == "token-2"
+    assert sesion_1.peticiones == 2
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_GESTOR_TOKEN_PARA_EL_HILO_SI_SPOTIFY_RECHAZA_LAS_CREDENCIALES
+# Se comprueba que, si Spotify responde 4xx, el hilo de renovación se para en lugar de
+# reintentar para siempre, y que los fallos de Spotify se reintentan cada vez más tarde.
+#-------------------------------------------------------------------------------------------
+def test_gestor_token_para_el_hilo_si_spotify_rechaza_las_credenciales(tmp_path):
+    from spotify.spotify_token import GestorTokenSpotify
+
+    class SesionRechazada(SesionTokenFalsa):
+        def post(self, url, **kwargs):
+            self.peticiones += 1
+            return RespuestaFalsa({"error": "invalid_client"}, status_code=400)
+
+    sesion = SesionRechazada()
+    gestor = GestorTokenSpotify("id", "mal", session=sesion, ruta=tmp_path / "token.json", espera_maxima=60)
+
+    token = gestor.get_token()
+    gestor._hilo.join(timeout=2)
+    peticiones = sesion.peticiones
+    gestor.asegurar_hilo()
+
+    # Se verifica...
+    assert token is None
+    assert gestor.credenciales_rechazadas
+    assert not gestor._hilo.is_alive()
+    assert sesion.peticiones == peticiones # No se vuelve a arrancar el hilo.
+    assert [gestor.espera_tras_fallos(fallos) for fallos in range(1, 7)] == [5, 10, 20, 40, 60, 60]
+    assert GestorTokenSpotify(None, None, session=sesion, refresco_en_segundo_plano=False).get_token() is None
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_CLIENTE_ASYNC_ARRANCA_EL_HILO_DE_RENOVACION_CON_TOKEN_EN_MEMORIA
+# Se comprueba que el cliente asíncrono arranca el hilo de renovación aunque ya haya un
+# token válido (por ejemplo, leído del fichero compartido).
+#-------------------------------------------------------------------------------------------
+def test_cliente_async_arranca_el_hilo_de_renovacion_con_token_en_memoria(tmp_path):
+    import asyncio
+    import time
+    from spotify.spotify_async import SpotifyAsyncClient
+    from spotify.spotify_token import GestorTokenSpotify
+
+    gestor = GestorTokenSpotify("id", "secret", session=SesionTokenFalsa(), ruta=tmp_path / "token.json")
+    gestor._token, gestor._expires_at = "token-fichero", time.time() + 3600
+    cliente = SpotifyAsyncClient(tokens=gestor)
+
+    async def pedir():
+        async with cliente:
+            return await cliente.get_token()
+
+    token = asyncio.run(pedir())
+
+    # Se verifica...
+    assert token == "token-fichero"
+    assert gestor._hilo is not None and gestor._hilo.is_alive()
+    gestor.parar()
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_GET_ARTISTS_PIDE_LOS_IDS_DE_50_EN_50_Y_CONSERVA_EL_ORDEN
+# Se comprueba que 120 IDs se piden en 3 peticiones y que el resultado sigue el orden.
+#-------------------------------------------------------------------------------------------
+def test_get_artists_pide_los_ids_de_50_en_50_y_conserva_el_orden(monkeypatch, tmp_path):
+    from spotify.spotify_cache import CacheTTL
+    from spotify.spotify_request import SpotifyClient
+
+    cliente = SpotifyClient("id", "secret", cache=CacheTTL(), ruta_token=tmp_path / "token.json")
+    monkeypatch.setattr(cliente, "get_token", lambda force_refresh=False, token_caducado=None: "abc")
+    peticiones = []
+
+    def get_falso(url, **kwargs):
+        ids = kwargs["params"]["ids"].split(",")
+        peticiones.append(len(ids))
+        return RespuestaFalsa({"artists": [{"id": spotify_id} for spotify_id in ids]})
+
+    monkeypatch.setattr(cliente.session, "get", get_falso)
+    ids = [f"id{i}" for i in range(120)]
+
+    artistas = cliente.get_artists(ids)
+
+    # Se verifica...
+    assert sorted(peticiones) == [20, 50, 50]
+    assert [artista["id"] for artista in artistas] == ids
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_GET_ARTISTAS_SPOTIFY_REFRESCAR_ACTUALIZA_POR_ID_SIN_BUSCAR
+# Se comprueba que "?refrescar=true" actualiza los artistas ya resueltos pidiéndolos por
+# ID, sin volver a buscarlos por nombre.
+#-------------------------------------------------------------------------------------------
+def test_get_artistas_spotify_refrescar_actualiza_por_id_sin_buscar(monkeypatch):
+    from viewset_users.models import ArtistaSpotify
+
+    usuario = Usuario.objects.create(nombre="Lola")
+    adele = ArtistaSpotify.objects.create(spotify_id="a1", nombre="Adele", seguidores=10)
+    usuario.cantantes_favoritos.create(nombre="Adele", artista_spotify=adele)
+
+    def search_artist_falso(cantante):
+        raise AssertionError("No se debería buscar por nombre")
+
+    monkeypatch.setattr("viewset_users.views.search_artist", search_artist_falso)
+    monkeypatch.setattr(
+        "viewset_users.views.get_artists",
+        lambda ids: [{"id": spotify_id, "name": "Adele", "followers": {"total": 99}} for spotify_id in ids],
+    )
+    client = APIClient()
+
+    respuesta = client.get(f"/viewset/users/{usuario.id}/artistas_spotify/?refrescar=true")
+
+    # Se verifica...
+    assert respuesta.status_code == 200
+    assert respuesta.json()["resultado_spotify"][0]["seguidores"] == 99
+    adele.refresh_from_db()
+    assert adele.seguidores == 99
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_CLIENTE_SPOTIFY_REINTENTA_TRAS_429_RESPETANDO_RETRY_AFTER
+# Se comprueba que, tras un 429, el cliente espera lo que indica "Retry-After" y reintenta.
+#-------------------------------------------------------------------------------------------
+def test_cliente_spotify_reintenta_tras_429_respetando_retry_after(monkeypatch):
+    from spotify.spotify_cache import CacheTTL
+    from spotify.spotify_limites import CircuitBreaker, LimitadorTokenBucket
+    from spotify.spotify_request import SpotifyClient
+
+    cliente = SpotifyClient("id", "secret", cache=CacheTTL(), limitador=LimitadorTokenBucket(),
+                            circuito=CircuitBreaker(umbral=5, reloj=lambda: 0.0))
+    monkeypatch.setattr(cliente, "get_token", lambda force_refresh=False, token_caducado=None: "abc")
+    esperas = []
+    monkeypatch.setattr("spotify.spotify_request.time.sleep", esperas.append)
+    respuestas = [
+        RespuestaFalsa({}, status_code=429, headers={"Retry-After": "2"}),
+        RespuestaFalsa({"artists": {"items": [{"id": "a1"}]}}),
+    ]
+    monkeypatch.setattr(cliente.session, "get", lambda url, **kwargs: respuestas.pop(0))
+    # El reloj del circuito no avanza: se deja pasar la pausa pedida por Spotify.
+    monkeypatch.setattr(cliente.circuito, "permitir", lambda: True)
+
+    json_artistas = cliente.search_artist("Adele")
+
+    # Se verifica...
+    assert json_artistas["artists"]["items"][0]["id"] == "a1"
+    assert len(esperas) == 1 and 2 <= esperas[0] <= 2.5 # "Retry-After" + jitter.
+    assert cliente.circuito.estado == "cerrado"
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_LIMITADOR_Y_CIRCUITO_SPOTIFY
+# Se comprueba que el limitador reparte las peticiones según la tasa y que el circuito se
+# abre tras varios fallos seguidos (las peticiones fallan al momento) y se recupera.
+#-------------------------------------------------------------------------------------------
+def test_limitador_y_circuito_spotify():
+    from spotify.spotify_limites import CircuitBreaker, LimitadorTokenBucket
+
+    ahora = [0.0]
+    limitador = LimitadorTokenBucket(tasa=2, capacidad=2, reloj=lambda: ahora[0])
+    circuito = CircuitBreaker(umbral=2, pausa=30, reloj=lambda: ahora[0])
+
+    esperas = [limitador.reservar(espera_maxima=0.75) for _ in range(4)]
+    for _ in range(2):
+        circuito.registrar_fallo()
+
+    # Se verifica...
+    assert esperas == [0.0, 0.0, 0.5, None] # Ráfaga de 2 y después una cada 0,5 s.
+    assert circuito.estado == "abierto" and not circuito.permitir()
+    ahora[0] = 31.0
+    assert circuito.permitir() # Petición de prueba.
+    assert not circuito.permitir() # Solo una a la vez.
+    circuito.registrar_exito()
+    assert circuito.estado == "cerrado" and circuito.permitir()
+
+
+#-------------------------------------------------------------------------------------------
+#           TEST_BUSQUEDAS_IGUALES_A_LA_VEZ_SOLO_LLEGAN_UNA_VEZ_A_SPOTIFY
+# Se comprueba que, si muchos hilos (o corrutinas) buscan el mismo artista a la vez, solo
+# uno hace la petición a Spotify y el resto recibe su resultado.
+#-------------------------------------------------------------------------------------------
+def test_busquedas_iguales_a_la_vez_solo_llegan_una_vez_a_spotify(monkeypatch):
+    import asyncio
+    import threading
+    import time
+    from spotify.spotify_async import SpotifyAsyncClient
+    from spotify.spotify_cache import CacheTTL
+    from spotify.spotify_request import SpotifyClient, buscar_en_paralelo
+
+    # Hilos (cliente síncrono)
+    cliente = SpotifyClient("id", "secret", cache=CacheTTL())
+    peticiones = []
+    lock = threading.Lock()
+
+    def get_falso(url, params):
+        with lock:
+            peticiones.append(params["q"])
+        time.sleep(0.1) # Spotify tarda: el resto de hilos llega mientras tanto.
+        return {"artists": {"items": [{"id": "a1"}]}}
+
+    monkeypatch.setattr(cliente, "_get", get_falso)
+    resultados = buscar_en_paralelo(cliente.search_artist, ["Adele", "adele", " ADELE "] * 3, max_concurrencia=9)
+
+    # Corrutinas (cliente asíncrono)
+    cliente_async = SpotifyAsyncClient(cache=CacheTTL())
+    peticiones_async = []
+
+    async def get_falso_async(url, params):
+        peticiones_async.append(params["q"])
+        await asyncio.sleep(0.05)
+        return {"artists": {"items": [{"id": "a1"}]}}
+
+    monkeypatch.setattr(cliente_async, "_get", get_falso_async)
+
+    async def buscar():
+        async with cliente_async:
+            return await asyncio.gather(*[cliente_async.search_artist("Adele") for _ in range(10)])
+
+    resultados_async = asyncio.run(buscar())
+
+    # Se verifica...
+    assert len(peticiones) == 1
+    assert all(resultado["artists"]["items"][0]["id"] == "a1" for resultado in resultados)
+    assert cliente.agrupador.agrupadas >= 1
+    assert len(peticiones_async) == 1
+    assert cliente_async.agrupador.agrupadas == 9
+    assert all(resultado == resultados_async[0] for resultado in resultados_async)
+
+
+############################################################################################
+############################################################################################
+
+#                                   PLANES DE CONSULTA
+
+############################################################################################
+############################################################################################
+
+#-------------------------------------------------------------------------------------------
+#           TEST_LAS_CONSULTAS_DE_LOS_ENDPOINTS_NO_RECORREN_TABLAS_ENTERAS
+# Se ejecutan los endpoints de usuarios y favoritos y se pide a SQLite el plan de cada
+# consulta (EXPLAIN QUERY PLAN). Falla si alguna recorre una tabla entera sin índice
+# ("SCAN <tabla>"), por ejemplo si se borra un índice o una consulta deja de usarlo.
+#-------------------------------------------------------------------------------------------
+def test_las_consultas_de_los_endpoints_no_recorren_tablas_enteras():
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    if connection.vendor != "sqlite":
+        pytest.skip("El plan de consulta se comprueba con SQLite")
+
+    usuarios = Usuario.objects.bulk_create([Usuario(nombre=f"Usuario {i}") for i in range(50)])
+    usuario = usuarios[0]
+    adele = Cantante.objects.create(nombre="Adele")
+    hello = Cancion.objects.create(nombre="Hello")
+    CantanteFavorito.objects.bulk_create([CantanteFavorito(usuario=u, cantante=adele) for u in usuarios])
+    CancionFavorita.objects.bulk_create([CancionFavorita(usuario=u, cancion=hello) for u in usuarios])
+    client = APIClient()
+    cabecera = {"HTTP_AUTHORIZATION": "1234"}
+
+    with CaptureQueriesContext(connection) as consultas:
+        siguiente = client.get("/viewset/users/?page_size=10").json()["next"]
+        client.get(f"/viewset/users/?page_size=10&cursor={siguiente}")
+        client.get("/viewset/users/?nombre=usuario 7")
+        client.get(f"/viewset/users/favoritos/?ids={usuario.id},{usuarios[2].id}")
+        for tipo, campo in [("cantantes_favoritos", "cantantes_favoritos"), ("canciones_favoritas", "canciones_favoritas")]:
+            client.get(f"/viewset/users/{usuario.id}/{tipo}/")
+            client.post(f"/viewset/users/{usuario.id}/{tipo}/anyadir/", {campo: ["Melendi"]}, format="json", **cabecera)
+            client.put(f"/viewset/users/{usuario.id}/{tipo}/modificar/", {campo: ["Melendi", "Shakira"]}, format="json", **cabecera)
+        client.delete(f"/viewset/users/{usuario.id}/cantantes_favoritos/eliminar/?cantante=Shakira", **cabecera)
+        client.delete(f"/viewset/users/delete-by-query/?id={usuarios[1].id}")
+
+    tablas = {modelo._meta.db_table for modelo in (Usuario, CantanteFavorito, CancionFavorita)}
+    recorridos = []
+    with connection.cursor() as cursor:
+        for consulta in consultas.captured_queries:
+            sql = consulta["sql"]
+            if not sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            for fila in cursor.fetchall():
+                detalle = fila[-1]
+                if re.match(r"SCAN (\w+)$", detalle) and detalle.split()[1] in tablas:
+                    recorridos.append((detalle, sql))
+
+    # Se verifica...
+    assert len(consultas.captured_queries) > 10
+    assert recorridos == []
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_CONEXION_SQLITE_APLICA_LOS_PRAGMAS_CONFIGURADOS
+# Se comprueba que cada conexión nueva a SQLite aplica los PRAGMAs de settings (la base de
+# datos de los tests está en memoria, así que WAL y mmap no aplican) y que las conexiones
+# son persistentes.
+#-------------------------------------------------------------------------------------------
+def test_conexion_sqlite_aplica_los_pragmas_configurados(settings):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA synchronous")
+        synchronous = cursor.fetchone()[0]
+        cursor.execute("PRAGMA busy_timeout")
+        busy_timeout = cursor.fetchone()[0]
+
+    # Se verifica...
+    assert synchronous == 1 # NORMAL
+    assert busy_timeout == int(settings.SQLITE_PRAGMAS["busy_timeout"])
+    assert settings.DATABASES["default"]["CONN_MAX_AGE"] == settings.DB_CONN_MAX_AGE > 0
+    assert settings.DATABASES["default"]["CONN_HEALTH_CHECKS"] is True
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_ROUTER_LEE_DE_LAS_REPLICAS_Y_ESCRIBE_EN_LA_PRINCIPAL
+# Se comprueba que las lecturas se reparten entre las réplicas y que, en cuanto una petición
+# escribe (o si es un POST/PUT/DELETE, o dentro de una transacción), lee de la principal.
+# "transaction=True" para que el test no esté dentro de una transacción.
+#-------------------------------------------------------------------------------------------
+@pytest.mark.django_db(transaction=True)
+def test_router_lee_de_las_replicas_y_escribe_en_la_principal():
+    from django.db import transaction
+    from django.test import RequestFactory
+    from api_server.db_router import PrimariaFijaMiddleware, RouterReplicas
+
+    router = RouterReplicas(replicas=["replica_1", "replica_2"], seleccion="rotatoria")
+
+    def vista_que_escribe(request):
+        lecturas = [router.db_for_read(Usuario), router.db_for_read(Usuario)]
+        escritura = router.db_for_write(Usuario)
+        return lecturas, escritura, router.db_for_read(Usuario)
+
+    def vista_que_lee(request):
+        return [router.db_for_read(Usuario)]
+
+    factory = RequestFactory()
+    lecturas, escritura, tras_escribir = PrimariaFijaMiddleware(vista_que_escribe)(factory.get("/"))
+    siguiente = PrimariaFijaMiddleware(vista_que_lee)(factory.get("/"))
+    post = PrimariaFijaMiddleware(vista_que_lee)(factory.post("/"))
+    with transaction.atomic():
+        en_transaccion = PrimariaFijaMiddleware(vista_que_lee)(factory.get("/"))
+
+    # Se verifica...
+    assert lecturas == ["replica_1", "replica_2"] # Por turnos.
+    assert escritura == "default"
+    assert tras_escribir == "default"             # Lee lo que acaba de escribir.
+    assert siguiente == ["replica_1"]             # La siguiente petición vuelve a las réplicas.
+    assert post == ["default"]
+    assert en_transaccion == ["default"]
+    assert RouterReplicas(replicas=[]).db_for_read(Usuario) == "default"
+    assert not router.allow_migrate("replica_1", "viewset_users")
+
+
+#-------------------------------------------------------------------------------------------
+#          TEST_JSON_RAPIDO_DEVUELVE_LO_MISMO_QUE_DRF
+# Se comprueba que el renderer con orjson genera exactamente los mismos bytes que el de DRF
+# para los tipos que devuelve la API, y que el parser da los mismos datos y los mismos errores.
+#-------------------------------------------------------------------------------------------
+def test_json_rapido_devuelve_lo_mismo_que_drf():
+    import datetime
+    import decimal
+    import io
+    import uuid
+    from rest_framework.exceptions import ParseError
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from api_server.renderers import JSONRapidoParser, JSONRapidoRenderer
+
+    datos = {
+        "users": [{"id": 6, "nombre": "Paula"}, {"id": 7, "nombre": "Jasmine ñ  "}],
+        "next": None,
+        "resultado_spotify": [{"generos": ["pop", "soul"], "popularidad": 90, "spotify_url": None}],
+        "fecha": datetime.datetime(2026, 10, 17, 20, 30, 0, 123456, tzinfo=datetime.timezone.utc),
+        "dia": datetime.date(2026, 10, 17),
+        "precio": decimal.Decimal("1.50"),
+        "uuid": uuid.UUID(int=1),
+        1: "clave entera",
+    }
+
+    # Se verifica...
+    assert JSONRapidoRenderer().render(datos) == JSONRenderer().render(datos)
+    assert JSONRapidoRenderer().render(datos, "application/json; indent=4") == JSONRenderer().render(datos, "application/json; indent=4")
+    assert JSONRapidoRenderer().render({"grande": 2 ** 70}) == JSONRenderer().render({"grande": 2 ** 70}) # orjson no lo admite
+    cuerpo = '{"users": [{"nombre": "Lola ñ"}]}'.encode()
+    assert JSONRapidoParser().parse(io.BytesIO(cuerpo)) == JSONParser().parse(io.BytesIO(cuerpo))
+    with pytest.raises(ParseError):
+        JSONRapidoParser().parse(io.BytesIO(b'{"users": '))
+    respuesta = APIClient().post("/viewset/users/", {"users": [{"nombre": "Lola"}]}, format="json")
+    assert respuesta.status_code == 201
@@ -1,7 +1,13 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
+from .async_views import get_info_artistas_spotify_async, get_info_canciones_spotify_async
 from .views import UsuarioViewSet
 
-router = DefaultRouter() 
+router = DefaultRouter()
 router.register(r'users', UsuarioViewSet, basename='user') # Registrar en el router los endpoints que queremos
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls + [
+    # Versiones asíncronas (ASGI) de los endpoints de Spotify
+    path('users/<int:pk>/artistas_spotify_async/', get_info_artistas_spotify_async, name='user-artistas-spotify-async'),
+    path('users/<int:pk>/canciones_spotify_async/', get_info_canciones_spotify_async, name='user-canciones-spotify-async'),
+]
@@ -1,12 +1,51 @@
-from django.http import Http404
+from django.conf import settings
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.http import Http404, StreamingHttpResponse
+from django.utils.http import parse_etags
 from rest_framework import viewsets
 from .models import Usuario, CancionFavorita, CantanteFavorito
 from rest_framework.decorators import action
-from .serializer import CancionesFavoritasSerializer, CantantesFavoritosSerializer, ListaUsuariosSerializer, UsuarioSerializer
+from .serializer import CancionesFavoritasSerializer, CantantesFavoritosSerializer, ListaUsuariosSerializer, UsuarioSerializer, usuarios_a_json
 from rest_framework import status 
 from rest_framework.response import Response
-from spotify.spotify_request import search_artist, search_track_song
-
+from .enriquecimiento import (
+    actualizar_artistas,
+    actualizar_canciones,
+    es_verdadero,
+    guardar_artistas,
+    guardar_canciones,
+    info_artista,
+    info_cancion,
+    resueltos,
+)
+from .favoritos_cache import cache_favoritos
+from .exportacion import con_favoritos, lineas_ndjson, usuario_con_favoritos
+from .pagination import PaginacionUsuarios
+from .operaciones import (
+    actualizar_usuario,
+    anyadir_favoritos,
+    crear_usuarios,
+    eliminar_favorito,
+    nombres_favoritos,
+    reemplazar_favoritos,
+)
+from spotify.spotify_request import buscar_en_paralelo, get_artists, get_tracks, search_artist, search_track_song
+
+
+# ETag de un recurso del usuario: cambia cada vez que cambia su versión.
+#     ETag: "7-cantantes_favoritos-9f1c2e4b7a0d4c3e8b5a6f7d8e9c0b1a"
+def _etag(usuario, recurso):
+    return f'"{usuario.pk}-{recurso}-{usuario.version}"'
+
+# ¿El cliente ya tiene esta versión? (cabecera "If-None-Match")
+def _no_modificado(request, etag):
+    etags = parse_etags(request.headers.get("If-None-Match", ""))
+    return "*" in etags or etag in etags
+
+# 304: el cliente puede seguir usando lo que tiene; no se lee nada más de la base de datos.
+def _respuesta_no_modificada(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
 
 # Create your views here.
@@ -14,6 +53,7 @@ from spotify.spotify_request import search_artist, search_track_song
 class UsuarioViewSet(viewsets.ModelViewSet):
     queryset = Usuario.objects.all().order_by('nombre') #Obtener la informacion 
     serializer_class = UsuarioSerializer 
+    pagination_class = PaginacionUsuarios
     lookup_field = 'pk'
 #                                       UsuarioViewSet
 # ----------------------------------------------------------------------------------------------
@@ -33,12 +73,19 @@ class UsuarioViewSet(viewsets.ModelViewSet):
 #               }
 #           ]
 # }
+# Los usuarios se devuelven por páginas (ver pagination.py): "next" es el cursor de la
+# siguiente página --> /users/?cursor=<next>
+# Con "?nombre=" se filtra por nombre sin distinguir mayúsculas (usa el índice LOWER(nombre)).
     def list(self, request, *args, **kwargs):
         usuarios = self.get_queryset()
-        serializer = self.get_serializer(usuarios, many=True)
+        nombre = request.query_params.get("nombre")
+        if nombre:
+            usuarios = usuarios.alias(nombre_normalizado=Lower("nombre")).filter(nombre_normalizado=Lower(Value(nombre)))
+        # Solo se leen los campos del serializer, como tuplas (sin crear un Usuario por fila).
+        usuarios = self.paginate_queryset(usuarios.values_list("id", "nombre"))
 
-        # Devuelvo {"users": {id:... , nombre: ...}, {id:..., nombre:... }}
-        return Response({"users": serializer.data}, status=status.HTTP_200_OK)
+        # Devuelvo {"users": [{id:... , nombre: ...}, {id:..., nombre:... }], "next": ...}
+        return self.get_paginated_response(usuarios_a_json(usuarios))
 
 
 
@@ -57,12 +104,9 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                 lista_usuarios.errors,
                 status=status.HTTP_400_BAD_REQUEST
             )
-        inserted_ids = []
-        # Se insertan los usuarios.
+        # Se insertan los usuarios en bloque y en una sola transacción.
         # Aquí no se comprueba que se recibe el campo "nombre" porque ya se hace en el SERIALIZER.
-        for user in lista_usuarios.validated_data["users"]:
-            obj_usuario = Usuario.objects.create(nombre=user["nombre"])
-            inserted_ids.append(obj_usuario.id)
+        inserted_ids = crear_usuarios([user["nombre"] for user in lista_usuarios.validated_data["users"]])
 
         return Response(
             {
@@ -73,6 +117,20 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         )
     
 
+# ----------------------------------------------------------------------------------------------
+#                                   GET (obtener un usuario)
+# endpoint: /users/<id>
+# ----------------------------------------------------------------------------------------------
+# Se devuelve con su ETag. Si el cliente manda "If-None-Match" con ese mismo ETag, se
+# responde 304 sin cuerpo.
+    def retrieve(self, request, *args, **kwargs):
+        usuario = self.get_object()
+        etag = _etag(usuario, "usuario")
+        if _no_modificado(request, etag):
+            return _respuesta_no_modificada(etag)
+        serializer = self.get_serializer(usuario)
+        return Response(serializer.data, headers={"ETag": etag})
+
 # ----------------------------------------------------------------------------------------------
 #                                               PUT
 #
@@ -106,7 +164,7 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         # partial = FALSE porque vamos a reemplazar todo
         serializer = UsuarioSerializer(usuario, data=request.data, partial=False)
         if serializer.is_valid():
-            serializer.save()
+            actualizar_usuario(serializer)
             return Response(
                 {
                     "message": f"Usuarios '{pk}' actualizado correctamente",
@@ -144,6 +202,79 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_200_OK) 
     
 
+# ----------------------------------------------------------------------------------------------
+#                                   GET (favoritos de varios usuarios)
+# endpoint: /users/favoritos/?ids=1,2,3
+# ----------------------------------------------------------------------------------------------
+# Devuelve cada usuario con sus cantantes y canciones favoritas en una sola llamada.
+# Son siempre 3 consultas (usuarios + cantantes + canciones) pidas los usuarios que pidas.
+# {
+#  "users": [
+#     {"id": 6, "nombre": "Paula", "cantantes_favoritos": ["Adele"], "canciones_favoritas": ["Hello"]}
+#  ],
+#  "no_encontrados": [8]
+# }
+    @action(detail=False, methods=["get"], url_path="favoritos")
+    def favoritos(self, request):
+        # 1. Se leen los IDs de la URL (?ids=1,2,3)
+        try:
+            ids = list(dict.fromkeys(int(valor) for valor in request.query_params.get("ids", "").split(",") if valor.strip()))
+        except ValueError:
+            return Response(
+                            {"message": "El parámetro 'ids' debe ser una lista de números separados por comas"},
+                            status=status.HTTP_400_BAD_REQUEST
+                            )
+        if not ids:
+            return Response(
+                            {"message": "Falta el parámetro 'ids'"},
+                            status=status.HTTP_400_BAD_REQUEST
+                            )
+        if len(ids) > settings.USUARIOS_PAGE_SIZE_MAX:
+            return Response(
+                            {"message": f"Como mucho se pueden pedir {settings.USUARIOS_PAGE_SIZE_MAX} usuarios"},
+                            status=status.HTTP_400_BAD_REQUEST
+                            )
+
+        # 2. Usuarios y sus favoritos (en el orden en que se añadieron) con 3 consultas.
+        usuarios = con_favoritos(Usuario.objects.filter(pk__in=ids))
+        por_id = {usuario.id: usuario for usuario in usuarios}
+
+        # 3. Se devuelven en el mismo orden en que se han pedido.
+        resultado = []
+        for pk in ids:
+            usuario = por_id.get(pk)
+            if usuario is None:
+                continue
+            resultado.append(usuario_con_favoritos(usuario))
+
+        return Response(
+            {
+                "users": resultado,
+                "no_encontrados": [pk for pk in ids if pk not in por_id],
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+# ----------------------------------------------------------------------------------------------
+#                                   GET (exportar)
+# endpoint: /users/exportar/
+# ----------------------------------------------------------------------------------------------
+# Descarga todos los usuarios con sus favoritos en NDJSON (un usuario por línea, ver
+# exportacion.py). La respuesta se envía según se lee de la base de datos.
+    @action(detail=False, methods=["get"], url_path="exportar")
+    def exportar(self, request):
+        authorization = request.headers.get('Authorization')
+        if authorization != "1234":
+            return Response(
+                            {"message": "Sin autorización"}, 
+                            status=status.HTTP_401_UNAUTHORIZED
+                            )
+        respuesta = StreamingHttpResponse(lineas_ndjson(), content_type="application/x-ndjson; charset=utf-8")
+        respuesta["Content-Disposition"] = 'attachment; filename="usuarios.ndjson"'
+        return respuesta
+
+
 # ##############################################################################################
 #                                      Cantantes favoritos
 # ##############################################################################################
@@ -164,10 +295,13 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                             {"message": f"Usuario '{pk}' no encontrado"}, 
                             status=status.HTTP_404_NOT_FOUND
                             )
-        # 2. Se recorren todas las filas del usuario para ver su cantante favorito
-        cantantes_favoritos = []
-        for cantante_fav in CantanteFavorito.objects.filter(usuario=usuario):
-            cantantes_favoritos.append(cantante_fav.nombre)
+        # 1.1 Si el cliente ya tiene esta versión de la lista, no hace falta leerla.
+        etag = _etag(usuario, "cantantes_favoritos")
+        if _no_modificado(request, etag):
+            return _respuesta_no_modificada(etag)
+
+        # 2. Se obtiene la lista de cantantes favoritos (de la caché si está al día)
+        cantantes_favoritos = cache_favoritos.leer(CantanteFavorito, usuario)
         
         # 3. El cantante existe pero no tiene ningún cantante favorito
         if not cantantes_favoritos:
@@ -176,7 +310,8 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                     "message": f"El usuario '{pk}' ({usuario.nombre}) no tiene ningún cantante favorito",
                     "cantantes_favoritos": []
                 },
-                status=status.HTTP_200_OK
+                status=status.HTTP_200_OK,
+                headers={"ETag": etag}
             )
         
         # 4. El cantante existe y tiene cantantes favoritos
@@ -187,7 +322,8 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                     f"son '{cantantes_favoritos}'"
                 )
             },
-        status=status.HTTP_200_OK
+        status=status.HTTP_200_OK,
+        headers={"ETag": etag}
     )
 
 # ----------------------------------------------------------------------------------------------
@@ -219,27 +355,10 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         # 3. Se obtiene los datos del JSON.
         new_cantantes_favoritas = new_cantantes_favoritas.validated_data["cantantes_favoritos"]
 
-        existentes = set()
-        # 4. Obtener cantantes favoritos ya existentes para ese usuario para no repetir cantantes en el futuro.
-        for c in CantanteFavorito.objects.filter(usuario=usuario):
-            existentes.add(c.nombre) # --> ["Robbie Williams", "Melendi"]
-    
-        cantantes_agregados = []
-        cantantes_existentes = []
-
-        # 5. Recorrer los nuevos cantantes y decidir si insertar o marcar como repetidos
-        for cantante in new_cantantes_favoritas:
-            if cantante in existentes: # ¿El cantante ya está en sus cantantes favoritos?
-                cantantes_existentes.append(cantante)
-            else:
-                CantanteFavorito.objects.create(usuario=usuario, nombre=cantante)  # Añade el cantante a su lista de cantantes favoritos.
-                cantantes_agregados.append(cantante)
-                existentes.add(cantante) # Actualizamos los cantantes existentes con los que se han agregado.
-
-        # 6. Obtener la lista final de cantantes favoritos
-        lista_final = []
-        for fila in CantanteFavorito.objects.filter(usuario=usuario):
-            lista_final.append(fila.nombre)
+        # 4. Se añaden de una vez los cantantes que todavía no estaban (sin repetir cantantes).
+        cantantes_agregados, cantantes_existentes, lista_final = anyadir_favoritos(
+            CantanteFavorito, usuario, new_cantantes_favoritas
+        )
 
         if cantantes_agregados:
             return Response(
@@ -289,17 +408,8 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                             {"message": f"Usuario '{pk}' no encontrado"}, 
                             status=status.HTTP_404_NOT_FOUND)
 
-        # 4. Se eliminan los cantantes favoritos del usuario para reemplazarlos por la nueva lista.
-        CantanteFavorito.objects.filter(usuario=usuario).delete()
-
-        # 5. Se añaden los nuevos cantantes favoritos.
-        for cantante in mod_cantantes_favoritos.validated_data["cantantes_favoritos"]:
-            CantanteFavorito.objects.create(usuario=usuario, nombre=cantante)
-
-        # 6. Se obtiene la lista con los cantantes favoritos.
-        lista_final = []
-        for fila in CantanteFavorito.objects.filter(usuario=usuario):
-            lista_final.append(fila.nombre)
+        # 4. Se reemplaza la lista: solo se borran los que sobran y se añaden los que faltan.
+        lista_final = reemplazar_favoritos(CantanteFavorito, usuario, mod_cantantes_favoritos.validated_data["cantantes_favoritos"])
 
         return Response(
             {
@@ -340,19 +450,14 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_404_NOT_FOUND
                             )
 
-        # 3. Se eliminan los cantantes favoritos del usuario para reemplazarlos por la nueva lista.
-        cantantes_fav = CantanteFavorito.objects.filter(usuario=usuario, nombre=nombre_cantante)
-        if not cantantes_fav.exists():
+        # 3. Se elimina el cantante de los favoritos del usuario (y cambia su versión).
+        if not eliminar_favorito(CantanteFavorito, usuario, nombre_cantante):
             return Response(
                 {"message": f"El usuario '{pk}' no tiene al cantante '{nombre_cantante}' entre sus favoritos"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        cantantes_fav.delete()
-
-        lista_final = []
-        for fila in CantanteFavorito.objects.filter(usuario=usuario):
-            lista_final.append(fila.nombre)
+        lista_final = nombres_favoritos(CantanteFavorito, usuario)
 
         return Response(
             {
@@ -383,10 +488,13 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                             {"message": f"Usuario '{pk}' no encontrado"}, 
                             status=status.HTTP_404_NOT_FOUND
                             )
-        # 2. Se recorren todas las filas del usuario para ver su canción favorita
-        canciones_favoritas = []
-        for cancion_fav in CancionFavorita.objects.filter(usuario=usuario):
-            canciones_favoritas.append(cancion_fav.nombre)
+        # 1.1 Si el cliente ya tiene esta versión de la lista, no hace falta leerla.
+        etag = _etag(usuario, "canciones_favoritas")
+        if _no_modificado(request, etag):
+            return _respuesta_no_modificada(etag)
+
+        # 2. Se obtiene la lista de canciones favoritas (de la caché si está al día)
+        canciones_favoritas = cache_favoritos.leer(CancionFavorita, usuario)
         
         # 3. La canción existe pero no tiene ninguna canción favorita el usuario
         if not canciones_favoritas:
@@ -395,7 +503,8 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                     "message": f"El usuario '{pk}' ({usuario.nombre}) no tiene ninguna canción favorita",
                     "canciones_favoritas": []
                 },
-                status=status.HTTP_200_OK
+                status=status.HTTP_200_OK,
+                headers={"ETag": etag}
             )
         
         # 4. La canción existe existe y tiene canciones favoritas
@@ -406,7 +515,8 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                     f"son '{canciones_favoritas}'"
                 )
             },
-        status=status.HTTP_200_OK
+        status=status.HTTP_200_OK,
+        headers={"ETag": etag}
     )
 
 # ----------------------------------------------------------------------------------------------
@@ -438,27 +548,10 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         # 3. Se obtiene los datos del JSON.
         new_canciones_favoritas = new_canciones_favoritas.validated_data["canciones_favoritas"]
 
-        existentes = set()
-        # 4. Obtener canciones favoritos ya existentes para ese usuario para no repetir canciones en el futuro.
-        for fila in CancionFavorita.objects.filter(usuario=usuario):
-            existentes.add(fila.nombre) # --> ["Leave the Door Open", "Tocado y Hundido"]
-    
-        canciones_agregadas = []
-        canciones_existentes = []
-
-        # 5. Recorrer las nuevas canciones y añadirla en caso de no estar repetida.
-        for cancion in new_canciones_favoritas:
-            if cancion in existentes: #  # ¿La canción ya está en sus canciones favoritas?
-                canciones_existentes.append(cancion)
-            else:
-                CancionFavorita.objects.create(usuario=usuario, nombre=cancion)  # Añade la canción favorita a su lista de cantantes favoritos.
-                canciones_agregadas.append(cancion)
-                existentes.add(cancion) # Actualizamos las canciones existentes con los que se han agregado.
-
-        # 6. Obtener la lista final de canciones favoritas
-        lista_final = []
-        for fila in CancionFavorita.objects.filter(usuario=usuario):
-            lista_final.append(fila.nombre)
+        # 4. Se añaden de una vez las canciones que todavía no estaban (sin repetir canciones).
+        canciones_agregadas, canciones_existentes, lista_final = anyadir_favoritos(
+            CancionFavorita, usuario, new_canciones_favoritas
+        )
 
         if canciones_agregadas:
             return Response(
@@ -510,17 +603,8 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                             {"message": f"Usuario '{pk}' no encontrado"}, 
                             status=status.HTTP_404_NOT_FOUND)
 
-        # 4. Se eliminan las canciones favoritas del usuario para reemplazarlos por la nueva lista.
-        CancionFavorita.objects.filter(usuario=usuario).delete()
-
-        # 5. Se añaden las nuevas canciones favoritas.
-        for cancion in mod_canciones_favoritas.validated_data["canciones_favoritas"]:
-            CancionFavorita.objects.create(usuario=usuario, nombre=cancion)
-
-        # 6. Se obtiene la lista con las canciones favoritas.
-        lista_final = []
-        for fila in CancionFavorita.objects.filter(usuario=usuario):
-            lista_final.append(fila.nombre)
+        # 4. Se reemplaza la lista: solo se borran los que sobran y se añaden los que faltan.
+        lista_final = reemplazar_favoritos(CancionFavorita, usuario, mod_canciones_favoritas.validated_data["canciones_favoritas"])
 
         return Response(
             {
@@ -556,19 +640,14 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_404_NOT_FOUND
                             )
 
-        # 3. Se eliminan las canciones favoritas del usuario para reemplazarlos por la nueva lista.
-        canciones_fav = CancionFavorita.objects.filter(usuario=usuario, nombre=nombre_cancion)
-        if not canciones_fav.exists():
+        # 3. Se elimina la canción de los favoritos del usuario (y cambia su versión).
+        if not eliminar_favorito(CancionFavorita, usuario, nombre_cancion):
             return Response(
                 {"message": f"El usuario '{pk}' no tiene la canción '{nombre_cancion}' entre sus favoritos"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        canciones_fav.delete()
-
-        lista_final = []
-        for fila in CancionFavorita.objects.filter(usuario=usuario):
-            lista_final.append(fila.nombre)
+        lista_final = nombres_favoritos(CancionFavorita, usuario)
 
         return Response(
             {
@@ -598,43 +677,36 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_404_NOT_FOUND
                             )
 
-        # 3. Obtener cantantes favoritos ya existentes para el usuario y recorrerlas una a una para buscar
-        cantantes_usuario = []
-        for fila in CantanteFavorito.objects.filter(usuario=usuario):
-            cantantes_usuario.append(fila.nombre)
-
-        cantantes_usuario = list(set(cantantes_usuario))
+        # 2. Obtener los cantantes favoritos del usuario (del catálogo) junto con su artista de Spotify (una consulta)
+        favoritos = [
+            favorito.cantante for favorito in
+            CantanteFavorito.objects.filter(usuario=usuario).select_related("cantante__artista_spotify").order_by("id")
+        ]
+
+        # 3. Solo se buscan en Spotify (en paralelo) los cantantes que todavía no se han resuelto.
+        #    El resultado se guarda para no tener que buscarlos en la próxima petición.
+        pendientes = [favorito for favorito in favoritos if favorito.artista_spotify_id is None]
+        if pendientes:
+            jsons_artistas = buscar_en_paralelo(search_artist, [favorito.nombre for favorito in pendientes])
+            guardar_artistas(pendientes, jsons_artistas)
+
+        # 3.1 Con "?refrescar=true" se actualizan popularidad, seguidores... de los artistas ya
+        #     resueltos, pidiéndolos por ID de 50 en 50 (200 favoritos = 4 peticiones).
+        if es_verdadero(request.query_params.get("refrescar")):
+            artistas = resueltos(favoritos, "artista_spotify")
+            if artistas:
+                elementos = get_artists([artista.spotify_id for artista in artistas])
+                actualizar_artistas(favoritos, artistas, elementos)
 
         resultado_spotify = []
         cantantes_favoritos = []
 
-        # 4. Recorremos cada cantante favorito del usuario para encontrar información acerca de ellos.
-        for cantante in cantantes_usuario:
-
-            # Devuelve el diccionario de artistas y obten el array de "items"
-            json_artistas = search_artist(cantante)
-
-          
-            if not json_artistas: # Si es None no continua
-                continue
-            
-              # 5. Obtenemos información del artista
-            contenido_artista = json_artistas.get("artists", {}).get("items", [])
-            if contenido_artista:
-                # Devuelve el primer elemento de Spotify
-                artista = contenido_artista[0]
-                info_artista = {
-                    "gusto_original": cantante,
-                    "nombre": artista.get("name"),
-                    "id": artista.get("id"),
-                    "popularidad": artista.get("popularity"),
-                    "seguidores": artista.get("followers", {}).get("total"),
-                    "generos": artista.get("genres", []),
-                    "spotify_url": artista.get("external_urls", {}).get("spotify"),
-                }
-                resultado_spotify.append(info_artista)
-                cantantes_favoritos.append(info_artista["nombre"])
-
+        # 4. Obtenemos información de cada artista
+        for favorito in favoritos:
+            if favorito.artista_spotify_id is not None:
+                info = info_artista(favorito)
+                resultado_spotify.append(info)
+                cantantes_favoritos.append(info["nombre"])
 
         if not resultado_spotify:
             mensaje = f"No se han encontrado artistas en Spotify para los gustos del usuario '{pk}'"
@@ -665,51 +737,37 @@ class UsuarioViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_404_NOT_FOUND
                             )
 
-        # 2. Obtener canciones favoritos ya existentes para el usuario y recorrerlas una a una para buscar
-        # información.
-        canciones_usuario = []
-        for fila in CancionFavorita.objects.filter(usuario=usuario):
-            canciones_usuario.append(fila.nombre)
-
-        canciones_usuario = list(set(canciones_usuario))
+        # 2. Obtener las canciones favoritas del usuario junto con su canción de Spotify (una consulta)
+        favoritos = [
+            favorito.cancion for favorito in
+            CancionFavorita.objects.filter(usuario=usuario).select_related("cancion__cancion_spotify").order_by("id")
+        ]
+
+        # 3. Solo se buscan en Spotify (en paralelo) las canciones que todavía no se han resuelto.
+        #    Si una búsqueda falla (None), se salta esa canción sin afectar al resto.
+        pendientes = [favorito for favorito in favoritos if favorito.cancion_spotify_id is None]
+        if pendientes:
+            jsons_canciones = buscar_en_paralelo(search_track_song, [favorito.nombre for favorito in pendientes])
+            guardar_canciones(pendientes, jsons_canciones)
+
+        # 3.1 Con "?refrescar=true" se actualiza la popularidad... de las canciones ya resueltas,
+        #     pidiéndolas por ID de 50 en 50.
+        if es_verdadero(request.query_params.get("refrescar")):
+            canciones = resueltos(favoritos, "cancion_spotify")
+            if canciones:
+                elementos = get_tracks([cancion.spotify_id for cancion in canciones])
+                actualizar_canciones(favoritos, canciones, elementos)
 
         resultado_spotify = []
         canciones_favoritas = []
 
-        # 3. Recorremos cada canción favorita del usuario para encontrar información acerca de la ella.
-        for cancion in canciones_usuario:
-            # Devuelve el diccionario de canciones y obten el array de "items"
-            json_canciones = search_track_song(cancion)
+        # 4. Obtenemos información de cada canción
+        for favorito in favoritos:
+            if favorito.cancion_spotify_id is not None:
+                info = info_cancion(favorito)
+                resultado_spotify.append(info)
+                canciones_favoritas.append(info["nombre"])
 
-            # 4. Obtenemos información de la canción
-            contenido_cancion = json_canciones.get("tracks", {}).get("items", [])
-
-            if not contenido_cancion: # Si es None no continua
-                continue
-            if contenido_cancion:
-                canc = contenido_cancion[0]
-
-                cantantes_nombres = []
-                for art in canc.get("artists", []):
-                    cantantes_nombres.append(art.get("name"))
-
-                info_cancion = {
-                    "nombre": cancion,
-                    "nombre_album": canc.get("album", {}).get("name"),
-                    "tipo_album": canc.get("album", {}).get("album_type"),
-                    "cantantes": cantantes_nombres,
-                    "id": canc.get("id"),
-                    "popularidad": canc.get("popularity"),
-                    "numero_cancion": canc.get("track_number"),
-                    "duracion": canc.get("duration_ms"),
-                    "fecha_lanzamiento": canc.get("album", {}).get("release_date"),
-                    "spotify_url": canc.get("external_urls", {}).get("spotify"),
-                }
-
-                resultado_spotify.append(info_cancion)
-                canciones_favoritas.append(info_cancion["nombre"])
-
-        
         if not resultado_spotify:
             mensaje = f"No se han encontrado canciones en Spotify para los gustos del usuario '{pk}'"
         else: